@@ -1,14 +1,13 @@
 # app/__init__.py
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from config import Config
 import os
 
 db = SQLAlchemy()
-migrate = Migrate()
 jwt = JWTManager()
 cors = CORS()
 
@@ -16,12 +15,55 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # orjson-backed JSON encoding when available
+    from app.utils.json_provider import init_json_provider
+    init_json_provider(app)
+    
     # Initialize extensions
+    from app.utils.db_pool import configure_pool
+    configure_pool(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_migrate(app)
     jwt.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
     
+    # Pub/sub broker for the real-time message stream
+    from app.utils.realtime import init_broker, verify_token_scope
+    init_broker(app)
+    jwt.token_verification_loader(verify_token_scope)
+    
+    # Per-user home feed timelines
+    from app.utils.timeline import init_timelines
+    init_timelines(app)
+    
+    # Process pool for resizing uploaded images
+    from app.utils.image_processing import init_image_processor
+    init_image_processor(app)
+    
+    # Read-through cache for anonymous GET responses
+    from app.utils.cache import init_cache
+    init_cache(app)
+    
+    # Bounded executor for password hashing
+    from app.utils.passwords import init_password_hasher
+    init_password_hasher(app)
+    
+    # Cache of JWT public_id -> user id/type lookups
+    from app.utils.identity import init_identity_cache
+    init_identity_cache(app)
+    
+    # Optional write-coalescing of like counters
+    from app.utils.like_buffer import init_like_buffer
+    init_like_buffer(app)
+    
+    # Latency, response size and SQL usage per endpoint, served at /metrics
+    from app.utils.request_metrics import init_request_metrics
+    init_request_metrics(app)
+    
+    # Opt-in N+1 query detector for development and tests
+    from app.utils.query_detector import init_query_detector
+    init_query_detector(app)
+    
     # Create upload directory
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
@@ -38,6 +80,8 @@ def create_app(config_class=Config):
     from app.routes.messages import messages_bp
     from app.routes.follows import follows_bp
     from app.routes.communities import communities_bp
+    from app.routes.uploads import uploads_bp
+    from app.routes.metrics import metrics_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(users_bp, url_prefix='/api/users')
@@ -46,14 +90,47 @@ def create_app(config_class=Config):
     app.register_blueprint(messages_bp, url_prefix='/api/messages')
     app.register_blueprint(follows_bp, url_prefix='/api/follows')
     app.register_blueprint(communities_bp, url_prefix='/api/communities')
+    app.register_blueprint(uploads_bp, url_prefix='/uploads')
+    app.register_blueprint(metrics_bp, url_prefix='/metrics')
     
-    # Create tables and add test data
-    with app.app_context():
-        db.create_all()
-        create_test_data(app)
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # Development convenience; production runs `flask init-db` and
+    # `flask seed` once per deploy so workers boot without touching the DB
+    if app.config.get('AUTO_INIT_DB'):
+        with app.app_context():
+            db.create_all()
+            create_test_data(app)
     
     return app
 
+def init_migrate(app):
+    """
+    Set up Flask-Migrate only when the app is loaded by the flask CLI
+
+    Importing it pulls in alembic, which is a large share of a web
+    worker's import time and is only needed by the `flask db` commands.
+    """
+    if click.get_current_context(silent=True) is None:
+        return
+    
+    from flask_migrate import Migrate
+    Migrate(app, db, include_object=include_in_migrations)
+
+def include_in_migrations(object, name, type_, reflected, compare_to):
+    """
+    Keep autogenerate away from the full-text search tables
+
+    The SQLite FTS5 tables and their shadow tables are created by
+    app.utils.search, not the models, and would otherwise be dropped.
+    """
+    if type_ == 'table' and reflected and compare_to is None:
+        from app.utils.search import SEARCH_INDEXES
+        return not any(name.startswith(index.fts_table) for index in SEARCH_INDEXES)
+    return True
+
 def create_test_data(app):
     """Create test data if database is empty"""
     from app.models import User
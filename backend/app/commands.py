@@ -0,0 +1,100 @@
+import click
+
+def register_commands(app):
+    """
+    Register the app's maintenance commands with the flask CLI
+    """
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create all tables and search indexes that do not exist yet."""
+        from app import db
+
+        db.create_all()
+        click.echo('Database initialized')
+
+    @app.cli.command('seed')
+    def seed_command():
+        """Add the test user if the database has no users."""
+        from app import create_test_data
+
+        create_test_data(app)
+
+    @app.cli.command('reconcile-counters')
+    @click.option('--batch-size', default=5000, show_default=True,
+                  help='Number of user or post ids recomputed per UPDATE')
+    def reconcile_counters_command(batch_size):
+        """Recompute denormalized user and post counters from their rows."""
+        from app.utils.counters import reconcile_user_counters, reconcile_post_counters
+
+        updated = reconcile_user_counters(batch_size=batch_size)
+        click.echo(f'Reconciled counters for {updated} users')
+        try:
+            updated = reconcile_post_counters(batch_size=batch_size)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Repaired like/comment counters on {updated} posts')
+
+    @app.cli.command('rebuild-conversations')
+    def rebuild_conversations_command():
+        """Rebuild the conversations inbox table from messages."""
+        from app.utils.conversations import rebuild_conversations
+
+        count = rebuild_conversations()
+        click.echo(f'Rebuilt {count} conversations')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Create missing full-text indexes and repopulate them."""
+        from app.utils.search import SEARCH_INDEXES
+
+        for index in SEARCH_INDEXES:
+            index.rebuild()
+            click.echo(f'Rebuilt search index for {index.table}')
+
+    @app.cli.command('import-members')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+                  help='Defaults to the file extension')
+    @click.option('--batch-size', type=int, default=None,
+                  help='Rows per INSERT and commit [default: BULK_IMPORT_BATCH_SIZE]')
+    @click.option('--workers', type=int, default=None,
+                  help='Password hashing processes [default: CPU count]')
+    @click.option('--user-type', default='farmer', show_default=True,
+                  help='user_type for rows that do not set one')
+    @click.option('--checkpoint', type=click.Path(dir_okay=False), default=None,
+                  help='Progress file [default: PATH.checkpoint.json]')
+    @click.option('--restart', is_flag=True, help='Ignore an existing checkpoint')
+    def import_members_command(path, fmt, batch_size, workers, user_type, checkpoint, restart):
+        """Import a CSV or NDJSON member list, resuming where a previous run stopped."""
+        import json
+        import os
+        from app.utils.member_import import (
+            MemberImporter, ImportFormatError, detect_format, read_members,
+            load_checkpoint, save_checkpoint
+        )
+
+        try:
+            fmt = fmt or detect_format(path)
+        except ImportFormatError as e:
+            raise click.UsageError(str(e))
+
+        source = os.path.abspath(path)
+        checkpoint = checkpoint or f'{path}.checkpoint.json'
+        start_line = 0 if restart else load_checkpoint(checkpoint, source)
+        if start_line:
+            click.echo(f'Resuming after line {start_line}')
+
+        def on_batch(line, report):
+            save_checkpoint(checkpoint, source, line, report)
+            click.echo(f"Line {line}: {report['imported']} imported, "
+                       f"{report['duplicates']} duplicates, {report['invalid']} invalid")
+
+        try:
+            importer = MemberImporter(app, batch_size=batch_size, workers=workers, default_user_type=user_type)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--user-type')
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            report = importer.run(read_members(f, fmt), start_line=start_line, on_batch=on_batch)
+
+        click.echo(json.dumps(report, indent=2))
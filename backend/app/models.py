@@ -1,5 +1,8 @@
 from datetime import datetime
 from app import db
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import object_session
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
 
@@ -21,6 +24,11 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized counters, maintained by the Post/Follow mapper events below
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -47,9 +55,20 @@ class User(db.Model):
             'location': self.location,
             'expertise_area': self.expertise_area,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'post_count': len(self.posts),
-            'follower_count': Follow.query.filter_by(following_id=self.id).count(),
-            'following_count': Follow.query.filter_by(follower_id=self.id).count()
+            'post_count': self.post_count or 0,
+            'follower_count': self.follower_count or 0,
+            'following_count': self.following_count or 0
+        }
+    
+    def summary(self):
+        # Compact form embedded in posts, comments and messages on request
+        return {
+            'id': self.id,
+            'public_id': self.public_id,
+            'username': self.username,
+            'full_name': self.full_name,
+            'profile_image': self.profile_image,
+            'user_type': self.user_type
         }
 
 class Post(db.Model):
@@ -63,25 +82,40 @@ class Post(db.Model):
     category = db.Column(db.String(50))
     tags = db.Column(db.JSON)  # Store as JSON array
     image_urls = db.Column(db.JSON)  # Store as JSON array
+    image_variants = db.Column(db.JSON)  # Per-image thumbnail/medium/full URLs
+    image_status = db.Column(db.String(20), default='none')  # none, pending, ready, failed
     like_count = db.Column(db.Integer, default=0)
     comment_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Keyset pagination orders by (created_at, id) within each filter
+    __table_args__ = (
+        db.Index('ix_posts_created', 'created_at', 'id'),
+        db.Index('ix_posts_author_created', 'author_id', 'created_at', 'id'),
+        db.Index('ix_posts_category_created', 'category', 'created_at', 'id'),
+    )
+    
     # Relationships
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='post', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
+    def to_dict(self, author=None):
+        # author lets batch serializers pass a pre-serialized author dict
+        if author is None and self.author:
+            author = self.author.to_dict()
+        
         return {
             'id': self.id,
             'public_id': self.public_id,
             'title': self.title,
             'content': self.content,
-            'author': self.author.to_dict() if self.author else None,
+            'author': author,
             'category': self.category,
             'tags': self.tags or [],
             'image_urls': self.image_urls or [],
+            'image_variants': self.image_variants or [],
+            'image_status': self.image_status or 'none',
             'like_count': self.like_count,
             'comment_count': self.comment_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -99,12 +133,18 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
+    __table_args__ = (db.Index('ix_comments_post_created', 'post_id', 'created_at', 'id'),)
+    
+    def to_dict(self, user=None):
+        # user lets batch serializers pass a pre-serialized user dict
+        if user is None and self.user:
+            user = self.user.to_dict()
+        
         return {
             'id': self.id,
             'public_id': self.public_id,
             'post_id': self.post_id,
-            'user': self.user.to_dict() if self.user else None,
+            'user': user,
             'content': self.content,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -127,10 +167,20 @@ class Follow(db.Model):
     following_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    __table_args__ = (db.UniqueConstraint('follower_id', 'following_id', name='unique_follow'),)
+    __table_args__ = (
+        db.UniqueConstraint('follower_id', 'following_id', name='unique_follow'),
+        db.Index('ix_follows_follower_created', 'follower_id', 'created_at', 'id'),
+        db.Index('ix_follows_following_created', 'following_id', 'created_at', 'id'),
+    )
     
-    follower = db.relationship('User', foreign_keys=[follower_id], backref='following')
-    following = db.relationship('User', foreign_keys=[following_id], backref='followers')
+    follower = db.relationship(
+        'User', foreign_keys=[follower_id],
+        backref=db.backref('following', cascade='all, delete-orphan')
+    )
+    following = db.relationship(
+        'User', foreign_keys=[following_id],
+        backref=db.backref('followers', cascade='all, delete-orphan')
+    )
 
 class Community(db.Model):
     __tablename__ = 'communities'
@@ -145,19 +195,26 @@ class Community(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (db.Index('ix_communities_created', 'created_at'),)
+    
     admin = db.relationship('User', foreign_keys=[admin_id])
     members = db.relationship('CommunityMember', backref='community', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
+    def to_dict(self, admin=None, member_count=None):
+        # Batch serializers pass the admin dict and member count they loaded
+        if admin is None and self.admin:
+            admin = self.admin.to_dict()
+        if member_count is None:
+            member_count = len(self.members)
         return {
             'id': self.id,
             'public_id': self.public_id,
             'name': self.name,
             'description': self.description,
-            'admin': self.admin.to_dict() if self.admin else None,
+            'admin': admin,
             'image_url': self.image_url,
             'is_public': self.is_public,
-            'member_count': len(self.members),
+            'member_count': member_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -169,7 +226,11 @@ class CommunityMember(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    __table_args__ = (db.UniqueConstraint('community_id', 'user_id', name='unique_membership'),)
+    __table_args__ = (
+        db.UniqueConstraint('community_id', 'user_id', name='unique_membership'),
+        db.Index('ix_community_members_community_joined', 'community_id', 'joined_at', 'id'),
+        db.Index('ix_community_members_user', 'user_id', 'community_id'),
+    )
     
     user = db.relationship('User', backref='community_memberships')
 
@@ -184,13 +245,244 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
+    # Threads are read as two (sender, receiver) ranges ordered by time;
+    # marking a thread read looks up only the unread rows of one direction
+    __table_args__ = (
+        db.Index('ix_messages_pair_created', 'sender_id', 'receiver_id', 'created_at', 'id'),
+        db.Index('ix_messages_pair_unread', 'sender_id', 'receiver_id', 'is_read'),
+    )
+    
+    def to_dict(self, sender=None, receiver=None):
+        # Batch serializers pass pre-serialized sender and receiver dicts
+        if sender is None and self.sender:
+            sender = self.sender.to_dict()
+        if receiver is None and self.receiver:
+            receiver = self.receiver.to_dict()
+        
         return {
             'id': self.id,
             'public_id': self.public_id,
-            'sender': self.sender.to_dict() if self.sender else None,
-            'receiver': self.receiver.to_dict() if self.receiver else None,
+            'sender': sender,
+            'receiver': receiver,
             'content': self.content,
             'is_read': self.is_read,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class Conversation(db.Model):
+    __tablename__ = 'conversations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Participants are stored ordered so each pair has exactly one row
+    user_a_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_b_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('messages.id'))
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    unread_a = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    unread_b = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_a_id', 'user_b_id', name='unique_conversation'),
+        db.Index('ix_conversations_user_a_updated', 'user_a_id', 'last_updated', 'id'),
+        db.Index('ix_conversations_user_b_updated', 'user_b_id', 'last_updated', 'id'),
+    )
+    
+    last_message = db.relationship('Message', foreign_keys=[last_message_id])
+    
+    @staticmethod
+    def pair(user_id, other_id):
+        return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+    
+    @classmethod
+    def get_or_create(cls, user_id, other_id):
+        user_a_id, user_b_id = cls.pair(user_id, other_id)
+        conversation = cls.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).first()
+        if conversation:
+            return conversation
+        
+        # Another request may create the same pair concurrently
+        try:
+            with db.session.begin_nested():
+                conversation = cls(user_a_id=user_a_id, user_b_id=user_b_id)
+                db.session.add(conversation)
+        except IntegrityError:
+            conversation = cls.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).one()
+        return conversation
+    
+    def unread_column(self, user_id):
+        return Conversation.unread_a if user_id == self.user_a_id else Conversation.unread_b
+    
+    def unread_for(self, user_id):
+        return self.unread_a if user_id == self.user_a_id else self.unread_b
+    
+    def other_user_id(self, user_id):
+        return self.user_b_id if user_id == self.user_a_id else self.user_a_id
+    
+    @classmethod
+    def record_message(cls, message):
+        """Point the conversation at a newly flushed message and bump the receiver's unread count"""
+        conversation = cls.get_or_create(message.sender_id, message.receiver_id)
+        unread = conversation.unread_column(message.receiver_id)
+        cls.query.filter_by(id=conversation.id).update({
+            cls.last_message_id: message.id,
+            cls.last_updated: message.created_at,
+            unread: unread + 1
+        }, synchronize_session=False)
+        return conversation
+    
+    @classmethod
+    def mark_read(cls, reader_id, other_id):
+        user_a_id, user_b_id = cls.pair(reader_id, other_id)
+        unread = cls.unread_a if reader_id == user_a_id else cls.unread_b
+        cls.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).update(
+            {unread: 0}, synchronize_session=False
+        )
+    
+    @classmethod
+    def remove_message(cls, message):
+        """Update the conversation before a message is deleted"""
+        user_a_id, user_b_id = cls.pair(message.sender_id, message.receiver_id)
+        conversation = cls.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).first()
+        if not conversation:
+            return
+        
+        if not message.is_read:
+            unread = conversation.unread_column(message.receiver_id)
+            cls.query.filter_by(id=conversation.id).update(
+                {unread: db.case((unread > 0, unread - 1), else_=0)},
+                synchronize_session=False
+            )
+        
+        if conversation.last_message_id == message.id:
+            previous = Message.query.filter(
+                ((Message.sender_id == user_a_id) & (Message.receiver_id == user_b_id)) |
+                ((Message.sender_id == user_b_id) & (Message.receiver_id == user_a_id)),
+                Message.id != message.id
+            ).order_by(Message.created_at.desc(), Message.id.desc()).first()
+            
+            if previous:
+                conversation.last_message_id = previous.id
+                conversation.last_updated = previous.created_at
+            else:
+                conversation.last_message_id = None
+    
+    @classmethod
+    def total_unread(cls, user_id):
+        return db.session.query(
+            db.func.coalesce(db.func.sum(
+                db.case((cls.user_a_id == user_id, cls.unread_a), else_=cls.unread_b)
+            ), 0)
+        ).filter((cls.user_a_id == user_id) | (cls.user_b_id == user_id)).scalar()
+    
+    def to_dict(self, viewer_id, other_user=None):
+        other_user = other_user or User.query.get(self.other_user_id(viewer_id))
+        return {
+            'id': self.id,
+            'user': other_user.to_dict() if other_user else None,
+            'last_message': self.last_message.to_dict() if self.last_message else None,
+            'unread_count': self.unread_for(viewer_id),
+            'last_updated': self.last_updated.isoformat() if self.last_updated else None
+        }
+
+class StoredImage(db.Model):
+    __tablename__ = 'stored_images'
+    
+    # Uploads are stored once per distinct content and shared by reference
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    extension = db.Column(db.String(10), nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, ready, failed
+    variants = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def raw_filename(self):
+        return f'raw_{self.content_hash}.{self.extension}'
+    
+    def url(self, variant='medium', fmt='jpg'):
+        return f'/uploads/{self.content_hash}_{variant}.{fmt}'
+    
+    def variant_urls(self):
+        if self.variants:
+            return self.variants
+        return {
+            name: {'jpeg': self.url(name, 'jpg'), 'webp': self.url(name, 'webp')}
+            for name in ('thumbnail', 'medium', 'full')
+        }
+
+def _adjust_user_counter(connection, user_id, column, delta):
+    """
+    Atomically add delta to one of the counters on a users row
+
+    updated_at keeps its value (it would otherwise get its onupdate
+    default) as the time of the last profile edit; validators that
+    cover counters include them directly.
+    """
+    users = User.__table__
+    connection.execute(
+        users.update()
+        .where(users.c.id == user_id)
+        .values({column: users.c[column] + delta, 'updated_at': users.c.updated_at})
+    )
+
+def _adjust_post_counter(connection, post_id, column, delta):
+    """
+    Atomically add delta to one of the counters on a posts row
+
+    updated_at keeps its value (it would otherwise get its onupdate
+    default): Post.to_dict returns it as the time of the last edit, so
+    validators that cover counters include them directly.
+    """
+    posts = Post.__table__
+    connection.execute(
+        posts.update()
+        .where(posts.c.id == post_id)
+        .values({column: posts.c[column] + delta, 'updated_at': posts.c.updated_at})
+    )
+
+def _count_like(connection, target, delta):
+    from app.utils.like_buffer import get_like_buffer
+
+    buffer = get_like_buffer()
+    if buffer is None:
+        _adjust_post_counter(connection, target.post_id, 'like_count', delta)
+    else:
+        # Applied in a batch after commit instead of locking the post row now
+        buffer.stage(object_session(target), target.post_id, delta)
+
+# Counter maintenance runs inside the flush, so it commits or rolls back
+# together with the row that caused it.
+@event.listens_for(Post, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    _adjust_user_counter(connection, target.author_id, 'post_count', 1)
+
+@event.listens_for(Post, 'after_delete')
+def _post_deleted(mapper, connection, target):
+    _adjust_user_counter(connection, target.author_id, 'post_count', -1)
+
+@event.listens_for(Follow, 'after_insert')
+def _follow_inserted(mapper, connection, target):
+    _adjust_user_counter(connection, target.follower_id, 'following_count', 1)
+    _adjust_user_counter(connection, target.following_id, 'follower_count', 1)
+
+@event.listens_for(Follow, 'after_delete')
+def _follow_deleted(mapper, connection, target):
+    _adjust_user_counter(connection, target.follower_id, 'following_count', -1)
+    _adjust_user_counter(connection, target.following_id, 'follower_count', -1)
+
+@event.listens_for(Like, 'after_insert')
+def _like_inserted(mapper, connection, target):
+    _count_like(connection, target, 1)
+
+@event.listens_for(Like, 'after_delete')
+def _like_deleted(mapper, connection, target):
+    _count_like(connection, target, -1)
+
+@event.listens_for(Comment, 'after_insert')
+def _comment_inserted(mapper, connection, target):
+    _adjust_post_counter(connection, target.post_id, 'comment_count', 1)
+
+@event.listens_for(Comment, 'after_delete')
+def _comment_deleted(mapper, connection, target):
+    _adjust_post_counter(connection, target.post_id, 'comment_count', -1)
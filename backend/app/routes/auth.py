@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required
 from app import db
 from app.models import User
 from app.utils.validators import validate_email, validate_password
+from app.utils.identity import current_identity, current_user
+from app.utils.passwords import hash_password, verify_password, PasswordHasherBusy
 from datetime import datetime
 import uuid
 
@@ -24,8 +26,8 @@ def register():
             return jsonify({'error': 'Invalid email address'}), 400
         
         # Validate password
-        password_error = validate_password(data['password'])
-        if password_error:
+        password_valid, password_error = validate_password(data['password'])
+        if not password_valid:
             return jsonify({'error': password_error}), 400
         
         # Check if user exists
@@ -44,7 +46,7 @@ def register():
             bio=data.get('bio', ''),
             location=data.get('location', '')
         )
-        user.set_password(data['password'])
+        user.password_hash = hash_password(data['password'])
         
         db.session.add(user)
         db.session.commit()
@@ -60,6 +62,8 @@ def register():
             'refresh_token': refresh_token
         }), 201
         
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f'Registration error: {str(e)}')
@@ -79,8 +83,8 @@ def login():
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
         
-        # Check password
-        if not user.check_password(data['password']):
+        # Check password off the request thread; outdated hashes are upgraded
+        if not verify_password(user, data['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Check if user is active
@@ -102,6 +106,8 @@ def login():
             'refresh_token': refresh_token
         }), 200
         
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
         current_app.logger.error(f'Login error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
@@ -110,13 +116,12 @@ def login():
 @jwt_required(refresh=True)
 def refresh():
     try:
-        current_user = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user).first()
+        user = current_identity()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        new_access_token = create_access_token(identity=current_user)
+        new_access_token = create_access_token(identity=user.public_id)
         
         return jsonify({
             'access_token': new_access_token
@@ -137,8 +142,7 @@ def logout():
 @jwt_required()
 def get_current_user():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
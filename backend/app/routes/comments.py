@@ -1,11 +1,27 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
 from app.models import User, Post, Comment
+from app.utils.pagination import paginate, InvalidCursor
+from app.utils.cache import invalidate
+from app.utils.conditional import conditional
+from app.utils.identity import current_identity
+from app.utils.serializers import serialize_comments
 
 comments_bp = Blueprint('comments', __name__)
 
+def _comments_validator(post_id):
+    post = db.session.query(Post.id, Post.comment_count).filter(Post.public_id == post_id).first()
+    if post is None:
+        return None
+    # Comment edits and the profiles embedded in each comment
+    latest = db.session.query(
+        db.func.max(Comment.updated_at), db.func.max(User.updated_at)
+    ).join(User, Comment.user_id == User.id).filter(Comment.post_id == post.id).first()
+    return (*post, *latest)
+
 @comments_bp.route('/post/<string:post_id>', methods=['GET'])
+@conditional(_comments_validator)
 def get_comments(post_id):
     try:
         post = Post.query.filter_by(public_id=post_id).first()
@@ -13,21 +29,18 @@ def get_comments(post_id):
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        
-        comments = Comment.query.filter_by(post_id=post.id).order_by(
-            Comment.created_at.asc()
-        ).paginate(page=page, per_page=per_page, error_out=False)
+        comments, page_info = paginate(
+            Comment.query.filter_by(post_id=post.id),
+            Comment.created_at, Comment.id, descending=False, per_page=50
+        )
         
         return jsonify({
-            'comments': [comment.to_dict() for comment in comments.items],
-            'total': comments.total,
-            'page': comments.page,
-            'per_page': comments.per_page,
-            'pages': comments.pages
+            'comments': serialize_comments(comments),
+            **page_info
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         current_app.logger.error(f'Get comments error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
@@ -36,8 +49,7 @@ def get_comments(post_id):
 @jwt_required()
 def create_comment(post_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
         post = Post.query.filter_by(public_id=post_id).first()
         
         if not user or not post:
@@ -54,11 +66,10 @@ def create_comment(post_id):
             content=data['content']
         )
         
-        # Update comment count on post
-        post.comment_count += 1
-        
+        # comment_count is incremented atomically when the row is inserted
         db.session.add(comment)
         db.session.commit()
+        invalidate(f'post:{post_id}')
         
         return jsonify({
             'message': 'Comment added successfully',
@@ -73,8 +84,10 @@ def create_comment(post_id):
 @jwt_required()
 def update_comment(comment_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         comment = Comment.query.filter_by(public_id=comment_id).first()
         
         if not comment:
@@ -106,8 +119,10 @@ def update_comment(comment_id):
 @jwt_required()
 def delete_comment(comment_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         comment = Comment.query.filter_by(public_id=comment_id).first()
         
         if not comment:
@@ -117,13 +132,12 @@ def delete_comment(comment_id):
         if comment.user_id != user.id and user.user_type != 'admin':
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Update comment count on post
-        post = Post.query.get(comment.post_id)
-        if post:
-            post.comment_count = max(0, post.comment_count - 1)
+        # comment_count is decremented atomically when the row is deleted
+        post = comment.post
         
         db.session.delete(comment)
         db.session.commit()
+        invalidate(f'post:{post.public_id}')
         
         return jsonify({'message': 'Comment deleted successfully'}), 200
         
@@ -1,11 +1,19 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
 from app.models import User, Community, CommunityMember, Post
+from app.utils.serializers import serialize_posts, serialize_users_by_id, serialize_communities
+from app.utils.pagination import paginate, InvalidCursor
+from app.utils.timeline import invalidate_timeline
+from app.utils.cache import cached_response, add_cache_tags, invalidate
+from app.utils.conditional import conditional
+from app.utils.identity import current_identity
+from app.utils.loaders import loader
 
 communities_bp = Blueprint('communities', __name__)
 
 @communities_bp.route('/', methods=['GET'])
+@cached_response(tags=lambda: ['communities'])
 def get_communities():
     try:
         search = request.args.get('search', '')
@@ -25,8 +33,13 @@ def get_communities():
             page=page, per_page=per_page, error_out=False
         )
         
+        communities_data = serialize_communities(communities.items)
+        # The admins are embedded, so profile edits must drop this page
+        admins = loader(User).load_many({community.admin_id for community in communities.items})
+        add_cache_tags(*[f'user:{admin.public_id}' for admin in admins])
+        
         return jsonify({
-            'communities': [community.to_dict() for community in communities.items],
+            'communities': communities_data,
             'total': communities.total,
             'page': communities.page,
             'per_page': communities.per_page,
@@ -41,8 +54,7 @@ def get_communities():
 @jwt_required()
 def create_community():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -59,12 +71,19 @@ def create_community():
         
         # Handle image upload
         image_url = None
+        images = []
         if 'image' in request.files:
+            from app.utils.image_processing import get_image_processor
+            if not get_image_processor().accepting():
+                return jsonify({'error': 'Image processing is busy, please retry'}), 503, {'Retry-After': '5'}
             file = request.files['image']
-            from app.utils.helpers import save_image, allowed_file
+            from app.utils.helpers import allowed_file
+            from app.utils.image_store import store_upload
             if file and allowed_file(file.filename):
-                filename = save_image(file)
-                image_url = f'/uploads/{filename}'
+                image = store_upload(file, current_app.config['UPLOAD_FOLDER'])
+                if image:
+                    image_url = image.url()
+                    images.append(image)
         
         community = Community(
             name=data['name'],
@@ -84,6 +103,10 @@ def create_community():
         db.session.add(membership)
         
         db.session.commit()
+        invalidate('communities')
+        
+        from app.utils.image_processing import process_new_images
+        process_new_images(images)
         
         return jsonify({
             'message': 'Community created successfully',
@@ -95,7 +118,27 @@ def create_community():
         current_app.logger.error(f'Create community error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
     
+def _community_validator(community_id):
+    community = db.session.query(
+        Community.id, Community.name, Community.updated_at, User.updated_at,
+        db.select(db.func.count(CommunityMember.id))
+        .where(CommunityMember.community_id == Community.id)
+        .scalar_subquery()
+    ).join(User, Community.admin_id == User.id).filter(
+        Community.public_id == community_id
+    ).first()
+    if community is None:
+        return None
+    recent_posts = db.session.query(
+        Post.id, Post.updated_at, Post.like_count, Post.comment_count, User.updated_at
+    ).join(
+        User, Post.author_id == User.id
+    ).filter(Post.category == community.name).order_by(Post.created_at.desc()).limit(10).all()
+    return (*community, *[value for row in recent_posts for value in row])
+
 @communities_bp.route('/<string:community_id>', methods=['GET'])
+@conditional(_community_validator)
+@cached_response(tags=lambda community_id: [f'community:{community_id}'])
 def get_community(community_id):
     try:
         community = Community.query.filter_by(public_id=community_id).first()
@@ -108,14 +151,10 @@ def get_community(community_id):
             Post.created_at.desc()
         ).limit(10).all()
         
-        # Get member count
-        member_count = CommunityMember.query.filter_by(
-            community_id=community.id
-        ).count()
+        add_cache_tags(f'category:{community.name}', *[f'post:{post.public_id}' for post in posts])
         
-        community_data = community.to_dict()
-        community_data['recent_posts'] = [post.to_dict() for post in posts]
-        community_data['member_count'] = member_count
+        community_data = serialize_communities([community])[0]
+        community_data['recent_posts'] = serialize_posts(posts)
         
         return jsonify({'community': community_data}), 200
         
@@ -127,8 +166,7 @@ def get_community(community_id):
 @jwt_required()
 def join_community(community_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
         community = Community.query.filter_by(public_id=community_id).first()
         
         if not user or not community:
@@ -156,6 +194,8 @@ def join_community(community_id):
             is_member = True
         
         db.session.commit()
+        invalidate_timeline(user.id)
+        invalidate(f'community:{community_id}', 'communities')
         
         return jsonify({
             'message': f'Successfully {action} {community.name}',
@@ -174,27 +214,20 @@ def get_community_members(community_id):
         if not community:
             return jsonify({'error': 'Community not found'}), 404
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        
-        members = CommunityMember.query.filter_by(
-            community_id=community.id
-        ).paginate(page=page, per_page=per_page, error_out=False)
+        members, page_info = paginate(
+            CommunityMember.query.filter_by(community_id=community.id),
+            CommunityMember.joined_at, CommunityMember.id, per_page=50
+        )
         
-        member_users = []
-        for member in members.items:
-            user = User.query.get(member.user_id)
-            if user:
-                member_users.append(user.to_dict())
+        member_users = serialize_users_by_id([member.user_id for member in members])
         
         return jsonify({
             'members': member_users,
-            'total': members.total,
-            'page': members.page,
-            'per_page': members.per_page,
-            'pages': members.pages
+            **page_info
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         current_app.logger.error(f'Get community members error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
@@ -202,8 +235,10 @@ def get_community_members(community_id):
 @jwt_required()
 def get_user_communities():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
@@ -212,11 +247,9 @@ def get_user_communities():
             user_id=user.id
         ).paginate(page=page, per_page=per_page, error_out=False)
         
-        communities = []
-        for membership in memberships.items:
-            community = Community.query.get(membership.community_id)
-            if community:
-                communities.append(community.to_dict())
+        communities = serialize_communities(
+            loader(Community).load_many([membership.community_id for membership in memberships.items])
+        )
         
         return jsonify({
             'communities': communities,
@@ -1,7 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
 from app.models import User, Follow
+from app.utils.pagination import paginate, InvalidCursor
+from app.utils.serializers import serialize_users_by_id
+from app.utils.timeline import invalidate_timeline
+from app.utils.cache import invalidate
+from app.utils.identity import current_identity, resolve_identity
 
 follows_bp = Blueprint('follows', __name__)
 
@@ -9,8 +14,7 @@ follows_bp = Blueprint('follows', __name__)
 @jwt_required()
 def follow_user(user_id):
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.filter_by(public_id=current_user_id).first()
+        current_user = current_identity()
         target_user = User.query.filter_by(public_id=user_id).first()
         
         if not current_user or not target_user:
@@ -41,11 +45,13 @@ def follow_user(user_id):
             is_following = True
         
         db.session.commit()
+        invalidate_timeline(current_user.id)
+        invalidate(f'user:{current_user.public_id}', f'user:{target_user.public_id}')
         
         return jsonify({
             'message': f'Successfully {action} {target_user.username}',
             'is_following': is_following,
-            'follower_count': Follow.query.filter_by(following_id=target_user.id).count()
+            'follower_count': target_user.follower_count
         }), 200
         
     except Exception as e:
@@ -57,31 +63,26 @@ def follow_user(user_id):
 @jwt_required()
 def get_following():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
         # Get following users
-        following = Follow.query.filter_by(follower_id=user.id).paginate(
-            page=page, per_page=per_page, error_out=False
+        following, page_info = paginate(
+            Follow.query.filter_by(follower_id=user.id),
+            Follow.created_at, Follow.id, per_page=20
         )
         
-        following_users = []
-        for follow in following.items:
-            following_user = User.query.get(follow.following_id)
-            if following_user:
-                following_users.append(following_user.to_dict())
+        following_users = serialize_users_by_id([follow.following_id for follow in following])
         
         return jsonify({
             'following': following_users,
-            'total': following.total,
-            'page': following.page,
-            'per_page': following.per_page,
-            'pages': following.pages
+            **page_info
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         current_app.logger.error(f'Get following error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
@@ -90,31 +91,26 @@ def get_following():
 @jwt_required()
 def get_followers():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
         # Get followers
-        followers = Follow.query.filter_by(following_id=user.id).paginate(
-            page=page, per_page=per_page, error_out=False
+        followers, page_info = paginate(
+            Follow.query.filter_by(following_id=user.id),
+            Follow.created_at, Follow.id, per_page=20
         )
         
-        follower_users = []
-        for follow in followers.items:
-            follower_user = User.query.get(follow.follower_id)
-            if follower_user:
-                follower_users.append(follower_user.to_dict())
+        follower_users = serialize_users_by_id([follow.follower_id for follow in followers])
         
         return jsonify({
             'followers': follower_users,
-            'total': followers.total,
-            'page': followers.page,
-            'per_page': followers.per_page,
-            'pages': followers.pages
+            **page_info
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         current_app.logger.error(f'Get followers error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
@@ -122,9 +118,8 @@ def get_followers():
 @jwt_required()
 def check_follow(user_id):
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.filter_by(public_id=current_user_id).first()
-        target_user = User.query.filter_by(public_id=user_id).first()
+        current_user = current_identity()
+        target_user = resolve_identity(user_id)
         
         if not current_user or not target_user:
             return jsonify({'error': 'User not found'}), 404
@@ -1,7 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app, Response
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
-from app.models import User, Message
+from app.models import User, Message, Conversation
+from app.utils.pagination import paginate, InvalidCursor
+from app.utils.realtime import get_broker, publish, format_sse, create_stream_token
+from app.utils.identity import current_identity, resolve_identity
+from app.utils.serializers import serialize_messages
+from sqlalchemy.orm import contains_eager
 from datetime import datetime
 import json
 
@@ -11,51 +16,44 @@ messages_bp = Blueprint('messages', __name__)
 @jwt_required()
 def get_conversations():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
-        
-        # Get all unique users the current user has conversations with
-        sent_to = db.session.query(Message.receiver_id).filter_by(
-            sender_id=user.id
-        ).distinct()
-        
-        received_from = db.session.query(Message.sender_id).filter_by(
-            receiver_id=user.id
-        ).distinct()
-        
-        # Combine and get unique user IDs
-        user_ids = set([id[0] for id in sent_to] + [id[0] for id in received_from])
-        
-        conversations = []
-        for user_id in user_ids:
-            if user_id != user.id:
-                other_user = User.query.get(user_id)
-                if other_user:
-                    # Get last message
-                    last_message = Message.query.filter(
-                        ((Message.sender_id == user.id) & (Message.receiver_id == other_user.id)) |
-                        ((Message.sender_id == other_user.id) & (Message.receiver_id == user.id))
-                    ).order_by(Message.created_at.desc()).first()
-                    
-                    # Count unread messages
-                    unread_count = Message.query.filter_by(
-                        sender_id=other_user.id,
-                        receiver_id=user.id,
-                        is_read=False
-                    ).count()
-                    
-                    conversations.append({
-                        'user': other_user.to_dict(),
-                        'last_message': last_message.to_dict() if last_message else None,
-                        'unread_count': unread_count,
-                        'last_updated': last_message.created_at.isoformat() if last_message else None
-                    })
-        
-        # Sort by last message time
-        conversations.sort(key=lambda x: x['last_updated'] or '', reverse=True)
-        
-        return jsonify({'conversations': conversations}), 200
+        user = current_identity()
         
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # One query: conversations joined with the other participant and the
+        # last message, sorted and paginated by the database
+        other_id = db.case(
+            (Conversation.user_a_id == user.id, Conversation.user_b_id),
+            else_=Conversation.user_a_id
+        )
+        query = db.session.query(Conversation, User).join(
+            User, User.id == other_id
+        ).outerjoin(
+            Message, Message.id == Conversation.last_message_id
+        ).options(
+            contains_eager(Conversation.last_message)
+        ).filter(
+            (Conversation.user_a_id == user.id) | (Conversation.user_b_id == user.id)
+        )
+        
+        rows, page_info = paginate(
+            query, Conversation.last_updated, Conversation.id, cursor_only=True,
+            row_key=lambda row: (row[0].last_updated, row[0].id)
+        )
+        
+        conversations = [
+            conversation.to_dict(user.id, other_user=other_user)
+            for conversation, other_user in rows
+        ]
+        
+        return jsonify({
+            'conversations': conversations,
+            **page_info
+        }), 200
+        
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         current_app.logger.error(f'Get conversations error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
@@ -63,21 +61,18 @@ def get_conversations():
 @jwt_required()
 def get_messages(user_id):
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.filter_by(public_id=current_user_id).first()
-        other_user = User.query.filter_by(public_id=user_id).first()
+        current_user = current_identity()
+        other_user = resolve_identity(user_id)
         
         if not current_user or not other_user:
             return jsonify({'error': 'User not found'}), 404
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        
-        messages = Message.query.filter(
-            ((Message.sender_id == current_user.id) & (Message.receiver_id == other_user.id)) |
-            ((Message.sender_id == other_user.id) & (Message.receiver_id == current_user.id))
-        ).order_by(Message.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        messages, page_info = paginate(
+            Message.query.filter(
+                ((Message.sender_id == current_user.id) & (Message.receiver_id == other_user.id)) |
+                ((Message.sender_id == other_user.id) & (Message.receiver_id == current_user.id))
+            ),
+            Message.created_at, Message.id, per_page=50
         )
         
         # Mark messages as read
@@ -90,16 +85,27 @@ def get_messages(user_id):
         for msg in unread_messages:
             msg.is_read = True
         
+        if unread_messages:
+            Conversation.mark_read(current_user.id, other_user.id)
+        
         db.session.commit()
         
+        if unread_messages:
+            publish(other_user.public_id, 'read', {
+                'reader_id': current_user.public_id,
+                'message_ids': [msg.public_id for msg in unread_messages]
+            })
+            publish(current_user.public_id, 'unread_count', {
+                'unread_count': Conversation.total_unread(current_user.id)
+            })
+        
         return jsonify({
-            'messages': [msg.to_dict() for msg in reversed(messages.items)],  # Oldest first
-            'total': messages.total,
-            'page': messages.page,
-            'per_page': messages.per_page,
-            'pages': messages.pages
+            'messages': serialize_messages(list(reversed(messages))),  # Oldest first
+            **page_info
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         current_app.logger.error(f'Get messages error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
@@ -107,8 +113,10 @@ def get_messages(user_id):
 @jwt_required()
 def send_message():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
         data = request.get_json()
         
@@ -118,7 +126,7 @@ def send_message():
         if not data.get('content'):
             return jsonify({'error': 'Message content is required'}), 400
         
-        receiver = User.query.filter_by(public_id=data['receiver_id']).first()
+        receiver = resolve_identity(data['receiver_id'])
         
         if not receiver:
             return jsonify({'error': 'Receiver not found'}), 404
@@ -133,14 +141,21 @@ def send_message():
         )
         
         db.session.add(message)
+        db.session.flush()
+        Conversation.record_message(message)
         db.session.commit()
         
-        # Here you would typically send a real-time notification
-        # For now, we'll just return the message
+        # Notify both participants (the sender may have other tabs open)
+        message_data = message.to_dict()
+        publish(receiver.public_id, 'message', message_data)
+        publish(user.public_id, 'message', message_data)
+        publish(receiver.public_id, 'unread_count', {
+            'unread_count': Conversation.total_unread(receiver.id)
+        })
         
         return jsonify({
             'message': 'Message sent successfully',
-            'message_data': message.to_dict()
+            'message_data': message_data
         }), 201
         
     except Exception as e:
@@ -151,8 +166,10 @@ def send_message():
 @jwt_required()
 def delete_message(message_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         message = Message.query.filter_by(public_id=message_id).first()
         
         if not message:
@@ -162,9 +179,21 @@ def delete_message(message_id):
         if message.sender_id != user.id:
             return jsonify({'error': 'Unauthorized'}), 403
         
+        receiver = message.receiver
+        was_unread = not message.is_read
+        deleted_event = {'message_id': message.public_id}
+        
+        Conversation.remove_message(message)
         db.session.delete(message)
         db.session.commit()
         
+        publish(receiver.public_id, 'message_deleted', deleted_event)
+        publish(user.public_id, 'message_deleted', deleted_event)
+        if was_unread:
+            publish(receiver.public_id, 'unread_count', {
+                'unread_count': Conversation.total_unread(receiver.id)
+            })
+        
         return jsonify({'message': 'Message deleted successfully'}), 200
         
     except Exception as e:
@@ -175,16 +204,66 @@ def delete_message(message_id):
 @jwt_required()
 def get_unread_count():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
         
-        unread_count = Message.query.filter_by(
-            receiver_id=user.id,
-            is_read=False
-        ).count()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        unread_count = Conversation.total_unread(user.id)
         
         return jsonify({'unread_count': unread_count}), 200
         
     except Exception as e:
         current_app.logger.error(f'Get unread count error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
+@messages_bp.route('/stream-token', methods=['POST'])
+@jwt_required()
+def get_stream_token():
+    try:
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({'stream_token': create_stream_token(user.public_id)}), 200
+        
+    except Exception as e:
+        current_app.logger.error(f'Stream token error: {str(e)}')
+        return jsonify({'error': 'Internal server error'}), 500
+@messages_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['query_string'])
+def stream():
+    # EventSource cannot set headers, so a stream token is passed as ?jwt=
+    try:
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        initial_unread = Conversation.total_unread(user.id)
+        heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+        broker = get_broker()
+        subscription = broker.subscribe(user.public_id)
+        
+    except Exception as e:
+        current_app.logger.error(f'Message stream error: {str(e)}')
+        return jsonify({'error': 'Internal server error'}), 500
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            yield format_sse({'id': 0, 'event': 'unread_count', 'data': {'unread_count': initial_unread}})
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    # Comment frame keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_sse(event)
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,16 @@
+import hmac
+from flask import Blueprint, request, current_app, Response, abort
+from app.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    # Keep /metrics off the public internet, or set METRICS_TOKEN
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token and current_app.config.get('METRICS_REQUIRE_TOKEN'):
+        abort(403)
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
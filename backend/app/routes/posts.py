@@ -1,8 +1,21 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from app import db
 from app.models import User, Post, Like, Comment
-from app.utils.helpers import save_image, allowed_file
+from app.utils.helpers import allowed_file
+from app.utils.image_processing import process_new_images, get_image_processor
+from app.utils.image_store import store_upload, post_image_status
+from app.utils.serializers import serialize_posts, serialize_post
+from app.utils.pagination import paginate, encode_cursor, decode_cursor, InvalidCursor
+from app.utils.timeline import fan_out_post, get_feed_page
+from app.utils.search import post_index, tokenize, render_highlight, make_snippet
+from app.utils.cache import cached_response, add_cache_tags, invalidate
+from app.utils.conditional import conditional
+from app.utils.like_buffer import get_like_buffer
+from app.utils.identity import current_identity
+from datetime import datetime, timedelta
 import os
 
 posts_bp = Blueprint('posts', __name__)
@@ -10,8 +23,6 @@ posts_bp = Blueprint('posts', __name__)
 @posts_bp.route('/', methods=['GET'])
 def get_posts():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         category = request.args.get('category')
         user_id = request.args.get('user_id')
         
@@ -22,28 +33,127 @@ def get_posts():
         if user_id:
             query = query.filter_by(author_id=user_id)
         
-        posts = query.order_by(Post.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        posts, page_info = paginate(query, Post.created_at, Post.id, per_page=20)
         
         return jsonify({
-            'posts': [post.to_dict() for post in posts.items],
-            'total': posts.total,
-            'page': posts.page,
-            'per_page': posts.per_page,
-            'pages': posts.pages
+            'posts': serialize_posts(posts),
+            **page_info
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         current_app.logger.error(f'Get posts error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
 
+@posts_bp.route('/feed', methods=['GET'])
+@jwt_required()
+def get_feed():
+    try:
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+        after = request.args.get('after')
+        
+        entries, has_more = get_feed_page(
+            user.id, per_page, before=decode_cursor(after) if after else None
+        )
+        
+        # Timeline entries may point at deleted posts, which are skipped
+        post_ids = [post_id for _, post_id in entries]
+        posts_by_id = {
+            post.id: post for post in Post.query.filter(Post.id.in_(post_ids))
+        } if post_ids else {}
+        posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+        
+        return jsonify({
+            'posts': serialize_posts(posts),
+            'per_page': per_page,
+            'next_cursor': encode_cursor(*entries[-1]) if has_more else None,
+            'has_more': has_more
+        }), 200
+        
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except Exception as e:
+        current_app.logger.error(f'Get feed error: {str(e)}')
+        return jsonify({'error': 'Internal server error'}), 500
+
+@posts_bp.route('/search', methods=['GET'])
+def search_posts():
+    try:
+        terms = tokenize(request.args.get('q', ''))
+        
+        if not terms:
+            return jsonify({'error': 'Search query required'}), 400
+        
+        category = request.args.get('category')
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 50))
+        
+        try:
+            date_from = datetime.fromisoformat(date_from) if date_from else None
+            date_to = datetime.fromisoformat(date_to) if date_to else None
+        except ValueError:
+            return jsonify({'error': 'Dates must be ISO 8601, e.g. 2024-05-31'}), 400
+        
+        highlights = post_index.highlights(terms)
+        columns = [highlights[name] for name in ('title', 'content') if name in highlights]
+        query = db.session.query(Post, *columns)
+        
+        if category:
+            query = query.filter(Post.category == category)
+        if date_from:
+            query = query.filter(Post.created_at >= date_from)
+        if date_to:
+            # A bare date includes the whole day
+            if len(request.args['to']) == 10:
+                date_to += timedelta(days=1)
+            query = query.filter(Post.created_at < date_to)
+        
+        rows = post_index.search(query, terms).offset(
+            (page - 1) * per_page
+        ).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        # Without highlight columns the query yields bare Post objects
+        rows = [row if columns else (row,) for row in rows[:per_page]]
+        
+        posts = [row[0] for row in rows]
+        results = serialize_posts(posts)
+        for result, row in zip(results, rows):
+            if columns:
+                result['highlight'] = {
+                    'title': render_highlight(row[1]),
+                    'content': render_highlight(row[2])
+                }
+            else:
+                result['highlight'] = {
+                    'title': make_snippet(row[0].title, terms, width=200),
+                    'content': make_snippet(row[0].content, terms)
+                }
+        
+        return jsonify({
+            'posts': results,
+            'count': len(results),
+            'page': page,
+            'per_page': per_page,
+            'has_more': has_more
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f'Search posts error: {str(e)}')
+        return jsonify({'error': 'Internal server error'}), 500
+
 @posts_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_post():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -54,15 +164,17 @@ def create_post():
         if not data.get('title') or not data.get('content'):
             return jsonify({'error': 'Title and content are required'}), 400
         
-        # Handle image uploads
-        image_urls = []
+        # Store uploads by content; new images are resized in the worker pool
+        images = []
         if 'images' in request.files:
+            if not get_image_processor().accepting():
+                return jsonify({'error': 'Image processing is busy, please retry'}), 503, {'Retry-After': '5'}
             files = request.files.getlist('images')
             for file in files:
                 if file and allowed_file(file.filename):
-                    filename = save_image(file)
-                    image_url = f'/uploads/{filename}'
-                    image_urls.append(image_url)
+                    image = store_upload(file, current_app.config['UPLOAD_FOLDER'])
+                    if image:
+                        images.append(image)
         
         # Create post
         post = Post(
@@ -71,12 +183,19 @@ def create_post():
             author_id=user.id,
             category=data.get('category'),
             tags=data.get('tags', '').split(',') if data.get('tags') else [],
-            image_urls=image_urls
+            image_urls=[image.url() for image in images],
+            image_variants=[image.variant_urls() for image in images],
+            image_status=post_image_status(images)
         )
         
         db.session.add(post)
         db.session.commit()
         
+        process_new_images(images)
+        
+        fan_out_post(post)
+        invalidate(f'user:{user.public_id}', f'category:{post.category}')
+        
         return jsonify({
             'message': 'Post created successfully',
             'post': post.to_dict()
@@ -86,7 +205,14 @@ def create_post():
         db.session.rollback()
         current_app.logger.error(f'Create post error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
+def _post_validator(post_id):
+    return db.session.query(
+        Post.updated_at, Post.like_count, Post.comment_count, Post.image_status, User.updated_at
+    ).join(User, Post.author_id == User.id).filter(Post.public_id == post_id).first()
+
 @posts_bp.route('/<string:post_id>', methods=['GET'])
+@conditional(_post_validator)
+@cached_response(tags=lambda post_id: [f'post:{post_id}'])
 def get_post(post_id):
     try:
         post = Post.query.filter_by(public_id=post_id).first()
@@ -94,18 +220,41 @@ def get_post(post_id):
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        return jsonify({'post': post.to_dict()}), 200
+        # The embedded author summary changes with the author's profile
+        add_cache_tags(f'user:{post.author.public_id}')
+        
+        return jsonify({'post': serialize_post(post)}), 200
         
     except Exception as e:
         current_app.logger.error(f'Get post error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
 
+@posts_bp.route('/<string:post_id>/images', methods=['GET'])
+def get_post_images(post_id):
+    try:
+        post = Post.query.filter_by(public_id=post_id).first()
+        
+        if not post:
+            return jsonify({'error': 'Post not found'}), 404
+        
+        return jsonify({
+            'image_status': post.image_status or 'none',
+            'image_urls': post.image_urls or [],
+            'image_variants': post.image_variants or []
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f'Get post images error: {str(e)}')
+        return jsonify({'error': 'Internal server error'}), 500
+
 @posts_bp.route('/<string:post_id>', methods=['PUT'])
 @jwt_required()
 def update_post(post_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         post = Post.query.filter_by(public_id=post_id).first()
         
         if not post:
@@ -122,12 +271,14 @@ def update_post(post_id):
             post.title = data['title']
         if 'content' in data:
             post.content = data['content']
+        old_category = post.category
         if 'category' in data:
             post.category = data['category']
         if 'tags' in data:
             post.tags = data['tags']
         
         db.session.commit()
+        invalidate(f'post:{post_id}', f'category:{old_category}', f'category:{post.category}')
         
         return jsonify({
             'message': 'Post updated successfully',
@@ -143,8 +294,10 @@ def update_post(post_id):
 @jwt_required()
 def delete_post(post_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         post = Post.query.filter_by(public_id=post_id).first()
         
         if not post:
@@ -154,8 +307,12 @@ def delete_post(post_id):
         if post.author_id != user.id and user.user_type != 'admin':
             return jsonify({'error': 'Unauthorized'}), 403
         
+        author_public_id = post.author.public_id
+        category = post.category
+        
         db.session.delete(post)
         db.session.commit()
+        invalidate(f'post:{post_id}', f'user:{author_public_id}', f'category:{category}')
         
         return jsonify({'message': 'Post deleted successfully'}), 200
         
@@ -168,34 +325,45 @@ def delete_post(post_id):
 @jwt_required()
 def toggle_like(post_id):
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         post = Post.query.filter_by(public_id=post_id).first()
         
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        # Check if already liked
-        existing_like = Like.query.filter_by(post_id=post.id, user_id=user.id).first()
-        
-        if existing_like:
-            # Unlike
-            db.session.delete(existing_like)
-            post.like_count -= 1
-            liked = False
-        else:
-            # Like
-            new_like = Like(post_id=post.id, user_id=user.id)
-            db.session.add(new_like)
-            post.like_count += 1
-            liked = True
-        
-        db.session.commit()
+        # Check if already liked; like_count follows the Like rows atomically
+        post_pk = post.id
+        existing_like = Like.query.filter_by(post_id=post_pk, user_id=user.id).first()
+        
+        try:
+            if existing_like:
+                # Unlike
+                db.session.delete(existing_like)
+                liked = False
+            else:
+                # Like
+                db.session.add(Like(post_id=post_pk, user_id=user.id))
+                liked = True
+            
+            db.session.commit()
+        except (IntegrityError, StaleDataError):
+            # A concurrent request from the same user got there first
+            db.session.rollback()
+        
+        invalidate(f'post:{post_id}')
+        
+        like_count = db.session.query(Post.like_count).filter_by(id=post_pk).scalar()
+        buffer = get_like_buffer()
+        if buffer is not None:
+            like_count += buffer.pending(post_pk)
         
         return jsonify({
             'message': 'Post liked' if liked else 'Post unliked',
             'liked': liked,
-            'like_count': post.like_count
+            'like_count': like_count
         }), 200
         
     except Exception as e:
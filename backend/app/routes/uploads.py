@@ -0,0 +1,65 @@
+import mimetypes
+import os
+import re
+from flask import Blueprint, request, current_app, send_file, abort, Response
+from werkzeug.security import safe_join
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# Variants named after their content hash never change once written
+CONTENT_NAMED = re.compile(r'^([0-9a-f]{64})_[a-z]+\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def _etag(filename, stat):
+    match = CONTENT_NAMED.match(filename)
+    if match:
+        return filename.rsplit('.', 1)[0]
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+def _max_age(filename):
+    if CONTENT_NAMED.match(filename):
+        return IMMUTABLE_MAX_AGE
+    return current_app.config.get('UPLOADS_MAX_AGE', 3600)
+
+def _cache_headers(response, filename):
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = _max_age(filename)
+    if CONTENT_NAMED.match(filename):
+        response.cache_control.immutable = True
+    return response
+
+@uploads_bp.route('/<path:filename>', methods=['GET', 'HEAD'])
+def serve_upload(filename):
+    # Raw uploads are only inputs to the image pool, never served
+    basename = os.path.basename(filename)
+    if basename.startswith('raw_') or basename.endswith('.tmp'):
+        abort(404)
+
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    path = safe_join(upload_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    stat = os.stat(path)
+    etag = _etag(basename, stat)
+    offload = current_app.config.get('UPLOADS_OFFLOAD')
+
+    if offload == 'x-accel':
+        # nginx serves the bytes (including Range) from an internal location
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(mimetype=mimetypes.guess_type(basename)[0] or 'application/octet-stream')
+            prefix = current_app.config.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads')
+            response.headers['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{filename}"
+        response.set_etag(etag)
+        return _cache_headers(response, basename)
+
+    # Werkzeug answers If-None-Match, If-Modified-Since and Range here, and
+    # emits X-Sendfile instead of the body when USE_X_SENDFILE is enabled
+    response = send_file(
+        path, conditional=True, etag=etag, last_modified=stat.st_mtime,
+        max_age=_max_age(basename)
+    )
+    return _cache_headers(response, basename)
@@ -1,8 +1,19 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
 from app.models import User, Post, Follow
-from app.utils.helpers import save_image, allowed_file
+from app.utils.helpers import allowed_file
+from app.utils.image_processing import process_new_images, get_image_processor
+from app.utils.image_store import store_upload
+from app.utils.serializers import serialize_posts, serialize_users
+from app.utils.search import user_index, tokenize
+from app.utils.cache import cached_response, add_cache_tags, invalidate
+from app.utils.conditional import conditional
+from app.utils.identity import current_user, current_identity
+from app.utils.member_import import (
+    MemberImporter, ImportFormatError, detect_format, read_members, text_stream
+)
+from app.utils.passwords import get_password_hasher, PasswordHasherBusy
 
 users_bp = Blueprint('users', __name__)
 
@@ -10,8 +21,7 @@ users_bp = Blueprint('users', __name__)
 @jwt_required()
 def update_profile():
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.filter_by(public_id=current_user_id).first()
+        user = current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -29,13 +39,22 @@ def update_profile():
             user.expertise_area = data['expertise_area']
         
         # Handle profile image upload
+        images = []
         if 'profile_image' in request.files:
+            if not get_image_processor().accepting():
+                return jsonify({'error': 'Image processing is busy, please retry'}), 503, {'Retry-After': '5'}
             file = request.files['profile_image']
             if file and allowed_file(file.filename):
-                filename = save_image(file)
-                user.profile_image = f'/uploads/{filename}'
+                image = store_upload(file, current_app.config['UPLOAD_FOLDER'])
+                if image:
+                    # The previous picture's reference is released on flush
+                    user.profile_image = image.url()
+                    images.append(image)
         
         db.session.commit()
+        invalidate(f'user:{user.public_id}')
+        
+        process_new_images(images)
         
         return jsonify({
             'message': 'Profile updated successfully',
@@ -47,7 +66,69 @@ def update_profile():
         current_app.logger.error(f'Update profile error: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
 
+@users_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_members():
+    try:
+        user = current_identity()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        if user.user_type != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        # A multipart 'file' upload, or the list as the raw request body
+        upload = request.files.get('file')
+        try:
+            if upload:
+                fmt = detect_format(upload.filename, upload.mimetype)
+                stream = upload.stream
+            else:
+                fmt = detect_format(None, request.mimetype)
+                stream = request.stream
+        except ImportFormatError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            importer = MemberImporter(
+                current_app,
+                default_user_type=request.args.get('user_type', 'farmer'),
+                hasher=get_password_hasher()
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        report = importer.run(
+            read_members(text_stream(stream), fmt),
+            max_rows=current_app.config.get('BULK_IMPORT_MAX_ROWS', 1000)
+        )
+        
+        return jsonify(report), 200
+    
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Import members error: {str(e)}')
+        return jsonify({'error': 'Internal server error'}), 500
+
+def _user_validator(user_id):
+    user = db.session.query(
+        User.id, User.updated_at, User.post_count, User.follower_count, User.following_count
+    ).filter(User.public_id == user_id).first()
+    if user is None:
+        return None
+    # The embedded recent posts, with the counters they display
+    recent_posts = db.session.query(
+        Post.id, Post.updated_at, Post.like_count, Post.comment_count
+    ).filter(Post.author_id == user.id).order_by(Post.created_at.desc()).limit(10).all()
+    return (*user, *[value for row in recent_posts for value in row])
+
 @users_bp.route('/<string:user_id>', methods=['GET'])
+@conditional(_user_validator)
+@cached_response(tags=lambda user_id: [f'user:{user_id}'])
 def get_user(user_id):
     try:
         user = User.query.filter_by(public_id=user_id).first()
@@ -58,8 +139,10 @@ def get_user(user_id):
         # Get user's posts
         posts = Post.query.filter_by(author_id=user.id).order_by(Post.created_at.desc()).limit(10).all()
         
+        add_cache_tags(*[f'post:{post.public_id}' for post in posts])
+        
         user_data = user.to_dict()
-        user_data['recent_posts'] = [post.to_dict() for post in posts]
+        user_data['recent_posts'] = serialize_posts(posts)
         
         return jsonify({'user': user_data}), 200
         
@@ -77,27 +160,35 @@ def search_users():
         if not query and not user_type and not location:
             return jsonify({'error': 'Search query required'}), 400
         
-        search_query = User.query.filter(User.is_active == True)
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 50))
         
-        if query:
-            search_query = search_query.filter(
-                (User.username.ilike(f'%{query}%')) |
-                (User.full_name.ilike(f'%{query}%')) |
-                (User.bio.ilike(f'%{query}%')) |
-                (User.expertise_area.ilike(f'%{query}%'))
-            )
+        search_query = User.query.filter(User.is_active == True)
         
+        # Filters are part of the same indexed query, not applied afterwards
         if user_type:
-            search_query = search_query.filter_by(user_type=user_type)
+            search_query = search_query.filter(User.user_type == user_type)
         
         if location:
             search_query = search_query.filter(User.location.ilike(f'%{location}%'))
         
-        users = search_query.limit(50).all()
+        terms = tokenize(query)
+        if terms:
+            search_query = user_index.search(search_query, terms)
+        else:
+            search_query = search_query.order_by(User.id.desc())
+        
+        # Fetch one extra row instead of running a COUNT
+        users = search_query.offset((page - 1) * per_page).limit(per_page + 1).all()
+        has_more = len(users) > per_page
+        users = users[:per_page]
         
         return jsonify({
-            'users': [user.to_dict() for user in users],
-            'count': len(users)
+            'users': serialize_users(users),
+            'count': len(users),
+            'page': page,
+            'per_page': per_page,
+            'has_more': has_more
         }), 200
         
     except Exception as e:
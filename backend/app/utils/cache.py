@@ -0,0 +1,211 @@
+import functools
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from flask import current_app, request, g, Response
+from werkzeug.utils import import_string
+
+class CacheBackend(ABC):
+    """
+    Storage interface for the response cache
+
+    A shared backend (e.g. Redis or memcached) can be plugged in through
+    the RESPONSE_CACHE_BACKEND setting so invalidations reach every worker.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+
+    @abstractmethod
+    def get(self, key):
+        """Return the stored value, or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        """Store a value for ttl seconds"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove a key if present"""
+
+class InProcessCache(CacheBackend):
+    """
+    LRU cache with per-entry TTL, bounded by entry count and total bytes
+    """
+
+    def __init__(self, app=None):
+        super().__init__(app)
+        config = app.config if app else {}
+        self.max_entries = config.get('RESPONSE_CACHE_MAX_ENTRIES', 2048)
+        self.max_bytes = config.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _size(value):
+        body = value.get('body') if isinstance(value, dict) else None
+        return len(body) if body else 64
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += self._size(value)
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= self._size(value)
+
+class ResponseCache:
+    """
+    Read-through cache of anonymous GET responses with tag-based invalidation
+
+    Each entry records the version of every tag it depends on (e.g.
+    'post:<public_id>'). invalidate() gives a tag a new random version, so
+    all entries depending on it miss on their next read. Versions are
+    random rather than counters so an evicted version can never match an
+    old entry again.
+    """
+
+    def __init__(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 30)
+        backend_class = app.config.get('RESPONSE_CACHE_BACKEND', InProcessCache)
+        if isinstance(backend_class, str):
+            backend_class = import_string(backend_class)
+        self.backend = backend_class(app)
+
+    def tag_version(self, tag):
+        version = self.backend.get(f'tag:{tag}')
+        if version is None:
+            version = uuid.uuid4().hex
+            self.backend.set(f'tag:{tag}', version, self.ttl * 10)
+        return version
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set(f'tag:{tag}', uuid.uuid4().hex, self.ttl * 10)
+
+    def lookup(self, key):
+        entry = self.backend.get(f'response:{key}')
+        if entry is None:
+            return None
+        for tag, version in entry['tags'].items():
+            if self.tag_version(tag) != version:
+                return None
+        return entry
+
+    def store(self, key, response, tags, versions, ttl=None):
+        self.backend.set(f'response:{key}', {
+            'body': response.get_data(),
+            'status': response.status_code,
+            'mimetype': response.mimetype,
+            'tags': {tag: versions.get(tag) or self.tag_version(tag) for tag in tags},
+        }, ttl or self.ttl)
+
+def init_cache(app):
+    app.extensions['response_cache'] = ResponseCache(app)
+
+def get_cache():
+    return current_app.extensions['response_cache']
+
+def invalidate(*tags):
+    """
+    Invalidate every cached response depending on any of the tags
+
+    Call after the write commits.
+    """
+    try:
+        get_cache().invalidate(*tags)
+    except Exception as e:
+        current_app.logger.error(f'Cache invalidation error: {str(e)}')
+
+def add_cache_tags(*tags):
+    """
+    Declare extra tags from inside a cached view, e.g. the post's author
+    """
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
+
+def cached_response(tags=None, ttl=None):
+    """
+    Cache a GET view's 200 responses for anonymous requests
+
+    The key is the endpoint plus its view and query arguments.
+    Authenticated requests bypass the cache entirely.
+
+    Args:
+        tags: Function receiving the view arguments and returning the
+            tags the response depends on
+        ttl: Seconds to keep the response, RESPONSE_CACHE_TTL by default
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if (not cache.enabled or request.method != 'GET'
+                    or request.headers.get('Authorization')):
+                return view(*args, **kwargs)
+
+            # Views behind @conditional add their validator, so a cached body
+            # can never be served under a newer ETag than the one it had
+            key = '|'.join([
+                request.endpoint,
+                repr(sorted(kwargs.items())),
+                repr(sorted(request.args.items(multi=True))),
+                g.get('validator_etag', ''),
+            ])
+
+            try:
+                entry = cache.lookup(key)
+            except Exception as e:
+                current_app.logger.error(f'Cache lookup error: {str(e)}')
+                entry = None
+
+            if entry is not None:
+                response = Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            # Read tag versions before rendering so a write that lands
+            # meanwhile makes the stored entry stale rather than current
+            static_tags = set(tags(**kwargs)) if tags else set()
+            versions = {tag: cache.tag_version(tag) for tag in static_tags}
+            g.cache_tags = set(static_tags)
+
+            response = current_app.make_response(view(*args, **kwargs))
+
+            if response.status_code == 200:
+                try:
+                    cache.store(key, response, g.cache_tags, versions, ttl)
+                except Exception as e:
+                    current_app.logger.error(f'Cache store error: {str(e)}')
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,66 @@
+import functools
+import hashlib
+from flask import request, current_app, g, Response
+
+def _etag(values):
+    digest = hashlib.sha1(repr((request.full_path, tuple(values))).encode()).hexdigest()
+    return digest[:32]
+
+def _not_modified(etag):
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+def _set_validators(response, etag):
+    response.set_etag(etag, weak=True)
+    # Clients may keep the body but must revalidate before reusing it
+    response.cache_control.no_cache = True
+    return response
+
+def conditional(validator):
+    """
+    Answer conditional GETs from a cheap validator query
+
+    The validator receives the view arguments and returns the handful of
+    column values the representation depends on (updated_at timestamps
+    and counters), or None when the resource does not exist. Their hash
+    is the weak ETag. When the client's copy is current a 304 is returned
+    without running the view, so the full rows are never loaded or
+    serialized.
+
+    No Last-Modified is sent and If-Modified-Since is ignored: counter
+    changes and deletions do not move any timestamp, so a date cannot
+    tell a stale copy from a current one.
+
+    Args:
+        validator: Function receiving the view arguments and returning a
+            sequence of values, or None
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            try:
+                values = validator(**kwargs)
+            except Exception as e:
+                current_app.logger.error(f'Validator error: {str(e)}')
+                values = None
+
+            if values is None:
+                return view(*args, **kwargs)
+
+            values = list(values)
+            etag = _etag(values)
+
+            if _not_modified(etag):
+                return _set_validators(Response(status=304), etag)
+
+            # Lets the response cache key bodies by the same validators
+            g.validator_etag = etag
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,33 @@
+from sqlalchemy import func, case, insert
+from app import db
+from app.models import Message, Conversation
+
+def rebuild_conversations():
+    """
+    Rebuild the conversations table from the messages table
+
+    Used to backfill existing databases and to repair drift. The whole
+    table is recomputed with one grouped query and one bulk insert.
+
+    Returns:
+        int: Number of conversations written
+    """
+    user_a = case((Message.sender_id < Message.receiver_id, Message.sender_id), else_=Message.receiver_id)
+    user_b = case((Message.sender_id < Message.receiver_id, Message.receiver_id), else_=Message.sender_id)
+    unread = (Message.is_read == False)  # noqa: E712
+
+    rows = db.session.query(
+        user_a.label('user_a_id'),
+        user_b.label('user_b_id'),
+        func.max(Message.id).label('last_message_id'),
+        func.max(Message.created_at).label('last_updated'),
+        func.sum(case((unread & (Message.receiver_id == user_a), 1), else_=0)).label('unread_a'),
+        func.sum(case((unread & (Message.receiver_id == user_b), 1), else_=0)).label('unread_b')
+    ).group_by(user_a, user_b).all()
+
+    db.session.query(Conversation).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(insert(Conversation), [row._asdict() for row in rows])
+    db.session.commit()
+
+    return len(rows)
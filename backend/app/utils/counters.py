@@ -0,0 +1,106 @@
+from flask import current_app
+from sqlalchemy import func, select, update
+from app import db
+from app.models import User, Post, Follow, Like, Comment
+
+def reconcile_user_counters(batch_size=5000):
+    """
+    Recompute the denormalized post/follower/following counters on users
+
+    Each batch is a single set-based UPDATE over a range of user ids, so
+    locks are held briefly even on large tables.
+
+    Args:
+        batch_size: Number of user ids covered by each UPDATE
+
+    Returns:
+        int: Number of user rows updated
+    """
+    max_id = db.session.query(func.max(User.id)).scalar()
+    if max_id is None:
+        return 0
+
+    post_count = select(func.count(Post.id)).where(
+        Post.author_id == User.id
+    ).scalar_subquery()
+    follower_count = select(func.count(Follow.id)).where(
+        Follow.following_id == User.id
+    ).scalar_subquery()
+    following_count = select(func.count(Follow.id)).where(
+        Follow.follower_id == User.id
+    ).scalar_subquery()
+
+    updated = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = db.session.execute(
+            update(User)
+            .where(User.id >= start, User.id < start + batch_size)
+            .where(db.or_(
+                func.coalesce(User.post_count, -1) != post_count,
+                func.coalesce(User.follower_count, -1) != follower_count,
+                func.coalesce(User.following_count, -1) != following_count
+            ))
+            .values(
+                post_count=post_count,
+                follower_count=follower_count,
+                following_count=following_count,
+                updated_at=User.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        updated += result.rowcount
+
+    return updated
+
+def reconcile_post_counters(batch_size=5000):
+    """
+    Recompute like_count and comment_count on posts from the Like and Comment rows
+
+    Refuses to run with LIKE_COUNTER_MODE = 'buffered': deltas still held
+    in a worker's buffer would be applied on top of the recomputed counts
+    and counted twice. Switch the workers to 'direct' first; their buffers
+    are flushed when they shut down.
+
+    Args:
+        batch_size: Number of post ids covered by each UPDATE
+
+    Returns:
+        int: Number of post rows updated
+
+    Raises:
+        RuntimeError: If like counters are buffered
+    """
+    if current_app.config.get('LIKE_COUNTER_MODE') == 'buffered':
+        raise RuntimeError(
+            "Like counters are buffered; set LIKE_COUNTER_MODE=direct on every "
+            "worker and here before reconciling post counters"
+        )
+
+    max_id = db.session.query(func.max(Post.id)).scalar()
+    if max_id is None:
+        return 0
+
+    like_count = select(func.count(Like.id)).where(
+        Like.post_id == Post.id
+    ).scalar_subquery()
+    comment_count = select(func.count(Comment.id)).where(
+        Comment.post_id == Post.id
+    ).scalar_subquery()
+
+    updated = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = db.session.execute(
+            update(Post)
+            .where(Post.id >= start, Post.id < start + batch_size)
+            .where(db.or_(
+                func.coalesce(Post.like_count, -1) != like_count,
+                func.coalesce(Post.comment_count, -1) != comment_count
+            ))
+            .values(like_count=like_count, comment_count=comment_count, updated_at=Post.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        updated += result.rowcount
+
+    return updated
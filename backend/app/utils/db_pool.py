@@ -0,0 +1,95 @@
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from app.utils.metrics import Counter, Gauge, Histogram
+
+CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting to check a connection out of the pool'
+)
+OVERFLOW_EVENTS = Counter(
+    'db_pool_overflow_events_total',
+    'Checkouts that had to open a connection beyond pool_size'
+)
+TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Checkouts that gave up after pool_timeout seconds'
+)
+
+# Pools of the engines created in this process, for the gauges below
+_pools = []
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records checkout waits, overflow and timeouts
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.append(self)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow = self.overflow()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            TIMEOUTS.inc()
+            raise
+        CHECKOUT_WAIT.observe(time.perf_counter() - started)
+        # overflow() counts up from -pool_size; only positive values are overflow
+        if self.overflow() > max(overflow, 0):
+            OVERFLOW_EVENTS.inc()
+        return connection
+
+    def dispose(self):
+        super().dispose()
+        if self in _pools:
+            _pools.remove(self)
+
+def _pool_gauge(read):
+    return lambda: {(): sum(read(pool) for pool in _pools)} if _pools else {}
+
+Gauge('db_pool_size', 'Configured number of persistent connections',
+      collect=_pool_gauge(lambda pool: pool.size()))
+Gauge('db_pool_checked_out', 'Connections currently in use',
+      collect=_pool_gauge(lambda pool: pool.checkedout()))
+Gauge('db_pool_checked_in', 'Idle connections held by the pool',
+      collect=_pool_gauge(lambda pool: pool.checkedin()))
+Gauge('db_pool_overflow', 'Connections open beyond pool_size right now',
+      collect=_pool_gauge(lambda pool: max(pool.overflow(), 0)))
+
+def configure_pool(app):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings
+
+    Call before db.init_app(). In-memory SQLite keeps Flask-SQLAlchemy's
+    single shared connection. On PostgreSQL, DB_STATEMENT_TIMEOUT_MS is
+    applied to every connection as statement_timeout.
+
+    Size pools so that workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays
+    below the server's max_connections.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+        return
+
+    options.setdefault('poolclass', InstrumentedQueuePool)
+    options.setdefault('pool_size', app.config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', app.config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_timeout', app.config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_recycle', app.config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', app.config.get('DB_POOL_PRE_PING', True))
+
+    statement_timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS')
+    if statement_timeout and uri.startswith('postgres'):
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args['options'] = (
+            f"{connect_args.get('options', '')} -c statement_timeout={int(statement_timeout)}".strip()
+        )
+        options['connect_args'] = connect_args
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
@@ -0,0 +1,63 @@
+from flask import request, has_request_context
+
+class FieldSelection:
+    """
+    Sparse fieldsets requested through ?fields= and ?expand=
+
+    ?fields=title,author,like_count keeps only those top-level keys of
+    each item (public_id is always kept). ?expand= names the nested
+    objects (author, user, sender, receiver, admin) to embed in full; once
+    expand is given, nested objects it does not name are embedded as
+    compact summaries, so ?expand= on its own shrinks every nested user
+    to a summary. Without either parameter responses are unchanged.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_args(cls, args):
+        def parse(name):
+            if name not in args:
+                return None
+            return {part.strip() for part in args.get(name, '').split(',') if part.strip()}
+
+        fields = parse('fields')
+        if fields is not None:
+            fields.add('public_id')
+        return cls(fields=fields, expand=parse('expand'))
+
+    def wants(self, name):
+        return self.fields is None or name in self.fields
+
+    def nested_form(self, name):
+        """'full', 'summary', or None when the nested object is left out"""
+        if not self.wants(name):
+            return None
+        if self.expand is None or name in self.expand:
+            return 'full'
+        return 'summary'
+
+    def apply(self, data):
+        if self.fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in self.fields}
+
+def field_selection():
+    """The current request's selection; the full representation elsewhere"""
+    if not has_request_context():
+        return FieldSelection()
+    return FieldSelection.from_args(request.args)
+
+def serialize_nested_users(users, form):
+    """
+    Map user id -> embedded dict in the given form
+
+    Args:
+        users: User objects
+        form: 'full' or 'summary', as returned by nested_form()
+    """
+    if form == 'summary':
+        return {user.id: user.summary() for user in users}
+    return {user.id: user.to_dict() for user in users}
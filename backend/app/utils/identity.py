@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, g
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app import db
+from app.models import User
+
+# What authorization checks need from a user, without loading the row
+Identity = namedtuple('Identity', ['id', 'public_id', 'user_type'])
+
+class IdentityCache:
+    """
+    Bounded LRU of public_id -> Identity shared across requests
+
+    Entries expire after IDENTITY_CACHE_TTL seconds, which bounds how long
+    another worker keeps honouring a user who was deactivated there.
+    Changes made through this worker are forgotten as soon as they commit.
+    """
+
+    def __init__(self, app):
+        self.max_size = app.config.get('IDENTITY_CACHE_SIZE', 10000)
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, public_id):
+        with self._lock:
+            item = self._entries.get(public_id)
+            if item is None:
+                return None
+            expires_at, identity = item
+            if expires_at < time.monotonic():
+                del self._entries[public_id]
+                return None
+            self._entries.move_to_end(public_id)
+            return identity
+
+    def set(self, identity):
+        with self._lock:
+            self._entries[identity.public_id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(identity.public_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, public_id):
+        with self._lock:
+            self._entries.pop(public_id, None)
+
+def init_identity_cache(app):
+    app.extensions['identity_cache'] = IdentityCache(app)
+
+def resolve_identity(public_id):
+    """
+    Look up an active user's id and type by public_id
+
+    Results are memoized for the request and kept in the shared LRU, so
+    repeated lookups of the same user cost no database round trip.
+
+    Returns:
+        Identity: The user's identity, or None for unknown or deactivated users
+    """
+    if not public_id:
+        return None
+
+    memo = g.setdefault('identities', {})
+    if public_id in memo:
+        return memo[public_id]
+
+    cache = current_app.extensions['identity_cache']
+    identity = cache.get(public_id)
+    if identity is None:
+        row = db.session.query(User.id, User.public_id, User.user_type).filter(
+            User.public_id == public_id, User.is_active == True
+        ).first()
+        if row is not None:
+            identity = Identity(*row)
+            cache.set(identity)
+
+    memo[public_id] = identity
+    return identity
+
+def current_identity():
+    """Identity of the user in the request's JWT"""
+    return resolve_identity(get_jwt_identity())
+
+def current_user():
+    """
+    Full User row of the user in the request's JWT, loaded once per request
+
+    Only for routes that read or modify profile fields; authorization
+    checks should use current_identity().
+    """
+    if 'current_user' not in g:
+        identity = current_identity()
+        g.current_user = db.session.get(User, identity.id) if identity else None
+    return g.current_user
+
+def forget_identity(public_id):
+    current_app.extensions['identity_cache'].discard(public_id)
+    if 'identities' in g:
+        g.identities.pop(public_id, None)
+
+# Type changes, deactivation and deletion are forgotten once they commit
+
+def _stale(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('stale_identities', set()).add(target.public_id)
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.user_type.history.has_changes() or state.attrs.is_active.history.has_changes():
+        _stale(target)
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    _stale(target)
+
+@event.listens_for(Session, 'after_commit')
+def _forget_stale_identities(session):
+    public_ids = session.info.pop('stale_identities', None)
+    if public_ids:
+        for public_id in public_ids:
+            forget_identity(public_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_identities(session):
+    session.info.pop('stale_identities', None)
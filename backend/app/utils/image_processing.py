@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from app import db
+from app.models import StoredImage
+
+# Variant name -> maximum (width, height)
+DEFAULT_VARIANTS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+    'full': (1600, 1600),
+}
+
+def process_image(raw_filename, upload_folder, variants=None):
+    """
+    Produce resized JPEG and WebP variants of a raw upload
+
+    Runs in a worker process, so it only takes and returns plain data.
+    The raw file is removed once the variants are written.
+
+    Args:
+        raw_filename: Name of the raw upload inside upload_folder
+        upload_folder: Directory holding uploads
+        variants: Mapping of variant name to maximum (width, height)
+
+    Returns:
+        dict: Variant name -> {'jpeg': url, 'webp': url, 'width': w, 'height': h}
+    """
+    from PIL import Image
+    from app.utils.helpers import flatten_image
+
+    variants = variants or DEFAULT_VARIANTS
+    raw_path = os.path.join(upload_folder, raw_filename)
+    stem = raw_filename.rsplit('.', 1)[0].replace('raw_', '', 1)
+
+    with Image.open(raw_path) as source:
+        source.load()
+        image = flatten_image(source)
+
+    result = {}
+    # Largest first so each smaller variant resamples from fewer pixels
+    for name, max_size in sorted(variants.items(), key=lambda item: -item[1][0]):
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        jpeg_name = f'{stem}_{name}.jpg'
+        webp_name = f'{stem}_{name}.webp'
+        image.save(os.path.join(upload_folder, jpeg_name), 'JPEG', quality=85, optimize=True, progressive=True)
+        image.save(os.path.join(upload_folder, webp_name), 'WEBP', quality=80, method=4)
+        result[name] = {
+            'jpeg': f'/uploads/{jpeg_name}',
+            'webp': f'/uploads/{webp_name}',
+            'width': image.width,
+            'height': image.height,
+        }
+
+    os.remove(raw_path)
+    return result
+
+def process_images(raw_filenames, upload_folder, variants=None):
+    """
+    Process several raw uploads belonging to the same object
+
+    Returns:
+        list: One variants dict per file, or None for files that failed
+    """
+    results = []
+    for raw_filename in raw_filenames:
+        try:
+            results.append(process_image(raw_filename, upload_folder, variants))
+        except Exception:
+            try:
+                os.remove(os.path.join(upload_folder, raw_filename))
+            except OSError:
+                pass
+            results.append(None)
+    return results
+
+class ImageProcessor:
+    """
+    Bounded process pool that turns raw uploads into image variants
+
+    At most IMAGE_QUEUE_SIZE jobs are handed to the pool at once; later
+    jobs wait in a backlog and are dispatched as earlier ones finish, so
+    a request never waits for an image. accepting() turns False once
+    IMAGE_BACKLOG_SIZE jobs are waiting, and upload routes then answer
+    503 rather than store more work. Clients poll image_status for the
+    result. With IMAGE_PROCESSING = 'inline' every job runs synchronously.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.mode = app.config.get('IMAGE_PROCESSING', 'background')
+        self.max_workers = app.config.get('IMAGE_WORKERS', 2)
+        self.variants = app.config.get('IMAGE_VARIANTS', DEFAULT_VARIANTS)
+        self.max_in_flight = app.config.get('IMAGE_QUEUE_SIZE', 32)
+        self.max_backlog = app.config.get('IMAGE_BACKLOG_SIZE', 1000)
+        self._in_flight = 0
+        self._backlog = deque()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so app startup does not start worker
+        # processes; spawned because forking a threaded web worker can
+        # deadlock the child
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def accepting(self):
+        """False while the backlog is full; upload routes answer 503"""
+        return self.mode == 'inline' or len(self._backlog) < self.max_backlog
+
+    def submit(self, raw_filenames, on_done):
+        """
+        Process raw uploads and call on_done(results) inside an app context
+
+        Args:
+            raw_filenames: Raw upload names for one post/profile/community
+            on_done: Callback receiving the list returned by process_images
+        """
+        if self.mode == 'inline':
+            on_done(process_images(raw_filenames, self.app.config['UPLOAD_FOLDER'], self.variants))
+            return
+
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self._backlog.append((raw_filenames, on_done))
+                return
+            self._in_flight += 1
+        self._dispatch(raw_filenames, on_done)
+
+    def _dispatch(self, raw_filenames, on_done):
+        future = self._get_executor().submit(
+            process_images, raw_filenames, self.app.config['UPLOAD_FOLDER'], self.variants
+        )
+
+        def callback(finished):
+            with self.app.app_context():
+                try:
+                    results = finished.result()
+                except Exception as e:
+                    current_app.logger.error(f'Image processing error: {str(e)}')
+                    results = [None] * len(raw_filenames)
+                try:
+                    on_done(results)
+                except Exception as e:
+                    current_app.logger.error(f'Image processing callback error: {str(e)}')
+            self._next()
+
+        future.add_done_callback(callback)
+
+    def _next(self):
+        # The finished job's slot passes to the oldest waiting job
+        with self._lock:
+            if not self._backlog:
+                self._in_flight -= 1
+                return
+            raw_filenames, on_done = self._backlog.popleft()
+        self._dispatch(raw_filenames, on_done)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+def init_image_processor(app):
+    app.extensions['image_processor'] = ImageProcessor(app)
+
+def get_image_processor():
+    return current_app.extensions['image_processor']
+
+def process_new_images(images):
+    """
+    Queue processing for stored images that were uploaded for the first time
+
+    Call after the transaction that created them commits. Images that
+    were deduplicated against an existing upload are skipped.
+
+    Args:
+        images: StoredImage objects returned by store_upload
+    """
+    for image in images:
+        if getattr(image, 'needs_processing', False):
+            image.needs_processing = False
+            _submit(image.id, image.raw_filename)
+
+def _submit(image_id, raw_filename):
+    def on_done(results):
+        from app.utils.image_store import sync_pending_posts
+
+        image = db.session.get(StoredImage, image_id)
+        if image is None:
+            return
+        image.status = 'ready' if results[0] else 'failed'
+        image.variants = results[0]
+        db.session.commit()
+        sync_pending_posts()
+
+    get_image_processor().submit([raw_filename], on_done)
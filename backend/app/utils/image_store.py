@@ -0,0 +1,275 @@
+import glob
+import hashlib
+import io
+import os
+import re
+from collections import Counter
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+from werkzeug.utils import secure_filename
+from app import db
+from app.models import User, Post, Community, StoredImage
+from app.utils.helpers import allowed_file, flatten_image
+
+# Content-named upload URLs look like /uploads/<sha256>_<variant>.<ext>
+HASH_URL = re.compile(r'/uploads/([0-9a-f]{64})_')
+
+def hashes_in(urls):
+    """
+    Extract the content hashes referenced by upload URLs
+
+    Every upload takes one reference, so a hash is returned once per URL
+    that names it: an image attached twice to a post holds two references
+    and is released twice.
+
+    Args:
+        urls: A URL, a list of URLs, or None
+
+    Returns:
+        list: Content hashes, one per matching URL, in order
+    """
+    if not urls:
+        return []
+    if isinstance(urls, str):
+        urls = [urls]
+
+    hashes = []
+    for url in urls:
+        match = HASH_URL.match(url or '')
+        if match:
+            hashes.append(match.group(1))
+    return hashes
+
+def pixel_hash(data):
+    """
+    SHA-256 of an image's normalized pixels
+
+    The image is flattened to RGB as the variants are, so copies of a
+    picture that differ only in encoding, compression or metadata share
+    a hash.
+
+    Returns:
+        str: Hex digest, or None if the bytes are not a readable image
+    """
+    # Imported here so web workers that never touch pixels skip loading PIL
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source.load()
+            image = flatten_image(source)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    digest = hashlib.sha256(f'{image.width}x{image.height}:'.encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def store_upload(file, upload_folder):
+    """
+    Store an uploaded image once per distinct content
+
+    The file is keyed by pixel_hash() of its normalized pixels. If the
+    same picture was uploaded before, the existing StoredImage gains a
+    reference and nothing is written or resized again. Otherwise the raw
+    bytes are written and the image is flagged for processing after
+    commit.
+
+    Args:
+        file: FileStorage object from request.files
+        upload_folder: Directory to save the file
+
+    Returns:
+        StoredImage: The stored image, or None if the file is not an
+            allowed, readable image
+    """
+    if not file or not allowed_file(file.filename):
+        return None
+
+    data = file.read()
+    if not data:
+        return None
+
+    digest = pixel_hash(data)
+    if digest is None:
+        return None
+    extension = secure_filename(file.filename).rsplit('.', 1)[1].lower()
+
+    image = StoredImage.query.filter_by(content_hash=digest).first()
+    if image and image.status != 'failed':
+        _acquire(image)
+        return image
+
+    _write_raw(upload_folder, f'raw_{digest}.{extension}', data)
+
+    if image:
+        # A previous attempt failed; retry with the new copy of the bytes
+        _acquire(image)
+        image.extension = extension
+        image.status = 'pending'
+    else:
+        try:
+            with db.session.begin_nested():
+                image = StoredImage(content_hash=digest, extension=extension)
+                db.session.add(image)
+        except IntegrityError:
+            # The same bytes were uploaded concurrently
+            image = StoredImage.query.filter_by(content_hash=digest).one()
+            _acquire(image)
+            return image
+
+    image.needs_processing = True
+    return image
+
+def _write_raw(upload_folder, filename, data):
+    os.makedirs(upload_folder, exist_ok=True)
+    path = os.path.join(upload_folder, filename)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _acquire(image):
+    StoredImage.query.filter_by(id=image.id).update(
+        {StoredImage.ref_count: StoredImage.ref_count + 1},
+        synchronize_session=False
+    )
+
+def release(connection, session, hashes):
+    """
+    Drop one reference per occurrence of each hash, deleting images
+    nobody references
+
+    Rows are deleted in the current transaction; files are removed only
+    after it commits.
+    """
+    images = StoredImage.__table__
+    for content_hash, count in Counter(hashes).items():
+        connection.execute(
+            images.update()
+            .where(images.c.content_hash == content_hash)
+            .values(ref_count=images.c.ref_count - count)
+        )
+        deleted = connection.execute(
+            images.delete()
+            .where(images.c.content_hash == content_hash, images.c.ref_count <= 0)
+        ).rowcount
+        if deleted and session is not None:
+            session.info.setdefault('unreferenced_images', set()).add(content_hash)
+
+def remove_files(upload_folder, content_hash):
+    """Remove the raw upload and every variant of an image"""
+    for path in glob.glob(os.path.join(upload_folder, f'*{content_hash}*')):
+        try:
+            os.remove(path)
+        except OSError as e:
+            current_app.logger.error(f'Error deleting image: {e}')
+
+def post_image_status(images):
+    if not images:
+        return 'none'
+    if all(image.status == 'ready' for image in images):
+        return 'ready'
+    return 'pending'
+
+def sync_pending_posts(limit=500):
+    """
+    Finish posts whose images were all processed
+
+    Failed images are dropped from the post and their reference released.
+    Each post is claimed with a conditional UPDATE first, so concurrent
+    runs finish it once.
+    """
+    posts = Post.query.filter_by(image_status='pending').limit(limit).all()
+    if not posts:
+        return
+
+    hashes = {content_hash for post in posts for content_hash in hashes_in(post.image_urls)}
+    images = {
+        image.content_hash: image
+        for image in StoredImage.query.filter(StoredImage.content_hash.in_(hashes))
+    } if hashes else {}
+
+    posts_table = Post.__table__
+    finished = []
+    for post in posts:
+        post_images = [images.get(content_hash) for content_hash in hashes_in(post.image_urls)]
+        if any(image is not None and image.status == 'pending' for image in post_images):
+            continue
+
+        ready = [image for image in post_images if image is not None and image.status == 'ready']
+        failed = [image.content_hash for image in post_images if image is not None and image.status == 'failed']
+
+        # Claim the post so a concurrent run (a pool callback and a
+        # request, say) cannot release its failed images a second time
+        claimed = db.session.execute(
+            posts_table.update()
+            .where(posts_table.c.id == post.id, posts_table.c.image_status == 'pending')
+            .values(
+                image_urls=[image.url() for image in ready],
+                image_variants=[image.variant_urls() for image in ready],
+                image_status='ready' if len(ready) == len(post_images) else 'failed'
+            )
+        ).rowcount
+        if not claimed:
+            continue
+
+        if failed:
+            release(db.session.connection(), db.session, failed)
+        finished.append(f'post:{post.public_id}')
+
+    db.session.commit()
+
+    from app.utils.cache import invalidate
+    invalidate(*finished)
+
+# Reference bookkeeping runs inside the flush of whatever deleted or
+# replaced the owning row, so counts commit or roll back with it.
+
+@event.listens_for(Post, 'after_delete')
+def _post_deleted(mapper, connection, target):
+    release(connection, object_session(target), hashes_in(target.image_urls))
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    release(connection, object_session(target), hashes_in(target.profile_image))
+
+@event.listens_for(Community, 'after_delete')
+def _community_deleted(mapper, connection, target):
+    release(connection, object_session(target), hashes_in(target.image_url))
+
+def _replaced_hashes(target, attribute):
+    history = db.inspect(target).attrs[attribute].history
+    replaced = Counter(hashes_in(list(history.deleted))) - Counter(hashes_in(list(history.added)))
+    return list(replaced.elements())
+
+def _same_image_set(target, value, oldvalue, initiator):
+    # Re-uploading the current picture took a reference in store_upload,
+    # but the attribute does not change, so no update releases the old one
+    session = object_session(target)
+    if session is not None and value and value == oldvalue:
+        release(session.connection(), session, hashes_in(value))
+
+event.listen(User.profile_image, 'set', _same_image_set, active_history=True)
+event.listen(Community.image_url, 'set', _same_image_set, active_history=True)
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    release(connection, object_session(target), _replaced_hashes(target, 'profile_image'))
+
+@event.listens_for(Community, 'after_update')
+def _community_updated(mapper, connection, target):
+    release(connection, object_session(target), _replaced_hashes(target, 'image_url'))
+
+@event.listens_for(Session, 'after_commit')
+def _remove_unreferenced_files(session):
+    content_hashes = session.info.pop('unreferenced_images', None)
+    if content_hashes:
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        for content_hash in content_hashes:
+            remove_files(upload_folder, content_hash)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_unreferenced_files(session):
+    session.info.pop('unreferenced_images', None)
@@ -0,0 +1,59 @@
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.utils import import_string
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used without it
+    orjson = None
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson when it is installed
+
+    Output matches the stdlib provider except that non-ASCII text is sent
+    as UTF-8 rather than \\u escapes: keys are sorted when sort_keys is
+    set, and datetimes, dates, decimals and dataclasses go through Flask's
+    default() so they serialize as before. Responses are encoded straight
+    to bytes instead of through an intermediate str. Falls back to the
+    stdlib provider when orjson is not installed.
+    """
+
+    def _options(self, sort_keys, indent):
+        # Datetimes and dataclasses are passed through to keep Flask's formats
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'sort_keys', 'indent', 'default', 'separators', 'ensure_ascii'}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(
+            obj,
+            default=kwargs.get('default', self.default),
+            option=self._options(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        ).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = None
+        if self.compact is False or (self.compact is None and self._app.debug):
+            indent = 2
+        body = orjson.dumps(obj, default=self.default, option=self._options(self.sort_keys, indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+def init_json_provider(app):
+    """Install the provider named by JSON_PROVIDER"""
+    provider = app.config.get('JSON_PROVIDER')
+    if provider:
+        app.json = import_string(provider)(app)
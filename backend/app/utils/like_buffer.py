@@ -0,0 +1,123 @@
+import atexit
+import threading
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import bindparam, event
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Post
+
+class LikeBuffer:
+    """
+    Accumulates committed like/unlike deltas per post and applies them in batches
+
+    With LIKE_COUNTER_MODE = 'buffered' a like no longer updates the hot
+    posts row in its own transaction. Each committed Like insert/delete
+    adds +1/-1 here, and a background thread applies the summed deltas
+    every LIKE_FLUSH_INTERVAL_MS in one executemany UPDATE. Like rows stay
+    the source of truth: deltas lost to a crash are repaired by the
+    reconcile-counters command.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('LIKE_FLUSH_INTERVAL_MS', 500) / 1000
+        self._lock = threading.Lock()
+        self._deltas = defaultdict(int)
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def stage(self, session, post_id, delta):
+        """Record a delta to apply once the session's transaction commits"""
+        staged = session.info.setdefault('like_deltas', defaultdict(int))
+        staged[post_id] += delta
+
+    def add(self, deltas):
+        with self._lock:
+            for post_id, delta in deltas.items():
+                self._deltas[post_id] += delta
+        self._start()
+
+    def pending(self, post_id):
+        """Delta committed for a post but not yet written to like_count"""
+        with self._lock:
+            return self._deltas.get(post_id, 0)
+
+    def _start(self):
+        # Started on first use so app startup does not spawn threads
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='like-buffer', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while not self._wakeup.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    current_app.logger.error(f'Like buffer flush error: {str(e)}')
+
+    def flush(self):
+        """
+        Apply all pending deltas in one statement
+
+        Returns:
+            int: Number of posts updated
+        """
+        with self._lock:
+            deltas = {post_id: delta for post_id, delta in self._deltas.items() if delta}
+            self._deltas.clear()
+        if not deltas:
+            return 0
+
+        posts = Post.__table__
+        statement = (
+            posts.update()
+            .where(posts.c.id == bindparam('post_id'))
+            .values(like_count=posts.c.like_count + bindparam('delta'), updated_at=posts.c.updated_at)
+        )
+        # Ordered by id so concurrent flushers lock rows in the same order
+        rows = [{'post_id': post_id, 'delta': deltas[post_id]} for post_id in sorted(deltas)]
+
+        with self.app.app_context():
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(statement, rows)
+            except Exception:
+                # Keep the deltas for the next attempt
+                self.add(deltas)
+                raise
+
+            from app.utils.cache import invalidate
+            public_ids = db.session.query(Post.public_id).filter(Post.id.in_(list(deltas))).all()
+            invalidate(*[f'post:{public_id}' for public_id, in public_ids])
+            db.session.remove()
+
+        return len(rows)
+
+    def stop(self):
+        self._wakeup.set()
+        self.flush()
+
+def init_like_buffer(app):
+    if app.config.get('LIKE_COUNTER_MODE', 'direct') == 'buffered':
+        app.extensions['like_buffer'] = LikeBuffer(app)
+
+def get_like_buffer():
+    """The app's LikeBuffer, or None when likes update like_count directly"""
+    return current_app.extensions.get('like_buffer')
+
+@event.listens_for(Session, 'after_commit')
+def _publish_like_deltas(session):
+    deltas = session.info.pop('like_deltas', None)
+    if deltas:
+        buffer = get_like_buffer()
+        if buffer is not None:
+            buffer.add(deltas)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_like_deltas(session):
+    session.info.pop('like_deltas', None)
@@ -0,0 +1,67 @@
+from flask import g
+
+# Keeps IN lists well under SQLite's and PostgreSQL's bind parameter limits
+MAX_BATCH = 500
+
+class BatchLoader:
+    """
+    Request-scoped batch loader for one model
+
+    Ids are collected with defer() while walking a page of rows, then
+    resolved together by one IN query per batch. Loaded rows are kept for
+    the rest of the request, so an object needed by several serializers
+    (e.g. a user who is both an author and a member) is fetched once.
+
+    Args:
+        model: Model class to load
+        column: Name of the unique column ids refer to, 'id' by default
+    """
+
+    def __init__(self, model, column='id'):
+        self.model = model
+        self.column = getattr(model, column)
+        self._loaded = {}
+        self._pending = set()
+
+    def defer(self, *ids):
+        """Queue ids to be loaded by the next dispatch()"""
+        for key in ids:
+            if key is not None and key not in self._loaded:
+                self._pending.add(key)
+
+    def dispatch(self):
+        """Load every queued id; ids without a row resolve to None"""
+        pending = list(self._pending)
+        self._pending.clear()
+        for start in range(0, len(pending), MAX_BATCH):
+            batch = pending[start:start + MAX_BATCH]
+            found = {
+                getattr(row, self.column.key): row
+                for row in self.model.query.filter(self.column.in_(batch))
+            }
+            for key in batch:
+                self._loaded[key] = found.get(key)
+
+    def load_many(self, ids):
+        """
+        Load several rows in one round trip
+
+        Returns:
+            list: Rows in the order of ids, without ids that have no row
+        """
+        ids = list(ids)
+        self.defer(*ids)
+        self.dispatch()
+        return [self._loaded[key] for key in ids if key is not None and self._loaded.get(key) is not None]
+
+    def load(self, key):
+        self.defer(key)
+        self.dispatch()
+        return self._loaded.get(key)
+
+def loader(model, column='id'):
+    """The current request's BatchLoader for a model"""
+    loaders = g.setdefault('batch_loaders', {})
+    if (model, column) not in loaders:
+        loaders[(model, column)] = BatchLoader(model, column)
+    return loaders[(model, column)]
@@ -0,0 +1,266 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import User
+from app.utils.validators import validate_email, validate_password
+
+REQUIRED_FIELDS = ('username', 'email', 'password')
+OPTIONAL_FIELDS = ('full_name', 'bio', 'location', 'expertise_area')
+
+# Admins are never created by an import
+USER_TYPES = ('farmer', 'expert')
+
+# Most invalid rows listed in a report; the count is always exact
+MAX_REPORTED_ERRORS = 100
+
+class ImportFormatError(ValueError):
+    """Raised for a file that is not CSV or NDJSON"""
+
+def detect_format(filename, content_type=None):
+    name = (filename or '').lower()
+    if name.endswith('.csv') or content_type == 'text/csv':
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')) or content_type in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    raise ImportFormatError('Member lists must be .csv or .ndjson')
+
+def read_members(stream, fmt):
+    """
+    Yield (line number, row dict) from a text stream, one row at a time
+
+    Blank NDJSON lines are skipped; malformed ones yield None as the row.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key.strip(): (value or '').strip() for key, value in row.items() if key}
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if isinstance(row, dict):
+                yield line_number, {key: '' if value is None else str(value).strip() for key, value in row.items()}
+            else:
+                yield line_number, None
+    else:
+        raise ImportFormatError(f'Unknown member list format: {fmt}')
+
+def validate_member(row, default_user_type='farmer', user_types=USER_TYPES):
+    """
+    Check one imported row the way /register checks a signup
+
+    Returns:
+        (member dict, None) or (None, error message)
+    """
+    if row is None:
+        return None, 'Malformed row'
+
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            return None, f'{field} is required'
+
+    if not validate_email(row['email']):
+        return None, 'Invalid email address'
+
+    password_valid, password_error = validate_password(row['password'])
+    if not password_valid:
+        return None, password_error
+
+    user_type = row.get('user_type') or default_user_type
+    if user_type not in user_types:
+        return None, f"user_type must be one of {', '.join(user_types)}"
+
+    member = {
+        'username': row['username'],
+        'email': row['email'],
+        'password': row['password'],
+        'user_type': user_type,
+    }
+    for field in OPTIONAL_FIELDS:
+        member[field] = row.get(field) or ''
+    return member, None
+
+def _hash_password(args):
+    # Runs in a worker process
+    password, method, salt_length = args
+    return generate_password_hash(password, method, salt_length)
+
+class MemberImporter:
+    """
+    Batched, resumable import of member lists
+
+    Rows are validated as they are read, then handled a batch at a time:
+    duplicates inside the batch are dropped, existing emails and usernames
+    are found with one IN query each, passwords are hashed in parallel,
+    and the new users go in as a single executemany INSERT committed per
+    batch. on_batch(line, report) runs after each commit, which is where
+    the CLI saves its checkpoint.
+
+    Pass the app's PasswordHasher as hasher inside a web worker. Without
+    one, passwords are hashed across a process pool started for the run,
+    which suits the CLI; its workers are spawned rather than forked from
+    a process that may already run threads.
+    """
+
+    def __init__(self, app, batch_size=None, workers=None, default_user_type='farmer', hasher=None):
+        self.batch_size = batch_size or app.config.get('BULK_IMPORT_BATCH_SIZE', 1000)
+        self.workers = workers or app.config.get('BULK_IMPORT_HASH_WORKERS') or os.cpu_count() or 1
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', 16)
+        self.user_types = tuple(app.config.get('BULK_IMPORT_USER_TYPES') or USER_TYPES)
+        if default_user_type not in self.user_types:
+            raise ValueError(f"user_type must be one of {', '.join(self.user_types)}")
+        self.default_user_type = default_user_type
+        self.hasher = hasher
+        self.report = {
+            'imported': 0,
+            'duplicates': 0,
+            'invalid': 0,
+            'errors': [],
+            'last_line': 0,
+        }
+
+    def _invalid(self, line_number, message):
+        self.report['invalid'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line_number, 'error': message})
+
+    def run(self, rows, start_line=0, max_rows=None, on_batch=None):
+        """
+        Import (line number, row) pairs
+
+        Args:
+            rows: Iterable from read_members()
+            start_line: Skip rows up to and including this line (resume)
+            max_rows: Stop after reading this many rows; sets 'truncated'
+            on_batch: Called as on_batch(last committed line, report)
+
+        Returns:
+            dict: The import report
+
+        Raises:
+            PasswordHasherBusy: From the hasher, if its queue is full
+        """
+        batch = []
+        seen = 0
+        if self.hasher:
+            pool = nullcontext()
+        else:
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        with pool as executor:
+            for line_number, row in rows:
+                if line_number <= start_line:
+                    continue
+                if max_rows is not None and seen >= max_rows:
+                    self.report['truncated'] = True
+                    break
+                seen += 1
+
+                member, error = validate_member(row, self.default_user_type, self.user_types)
+                if error:
+                    self._invalid(line_number, error)
+                else:
+                    batch.append(member)
+
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch, executor)
+                    batch = []
+                    self.report['last_line'] = line_number
+                    if on_batch:
+                        on_batch(line_number, self.report)
+                else:
+                    self.report['last_line'] = line_number
+
+            if batch:
+                self._write_batch(batch, executor)
+            if on_batch and self.report['last_line']:
+                on_batch(self.report['last_line'], self.report)
+        return self.report
+
+    def _new_members(self, batch):
+        emails, usernames, unique = set(), set(), []
+        for member in batch:
+            if member['email'] in emails or member['username'] in usernames:
+                continue
+            emails.add(member['email'])
+            usernames.add(member['username'])
+            unique.append(member)
+
+        existing_emails = set(db.session.scalars(select(User.email).where(User.email.in_(emails))))
+        existing_usernames = set(db.session.scalars(select(User.username).where(User.username.in_(usernames))))
+        new = [
+            member for member in unique
+            if member['email'] not in existing_emails and member['username'] not in existing_usernames
+        ]
+        return new
+
+    def _hash_passwords(self, passwords, executor):
+        if self.hasher:
+            return self.hasher.hash_many(passwords)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return executor.map(
+            _hash_password,
+            [(password, self.method, self.salt_length) for password in passwords],
+            chunksize=chunksize
+        )
+
+    def _write_batch(self, batch, executor):
+        new = self._new_members(batch)
+        if new:
+            hashes = self._hash_passwords([member['password'] for member in new], executor)
+            for member, password_hash in zip(new, hashes):
+                member['password_hash'] = password_hash
+
+            try:
+                self._insert(new)
+            except IntegrityError:
+                # Someone registered one of these meanwhile; recheck and retry once
+                db.session.rollback()
+                hashed = {member['email']: member['password_hash'] for member in new}
+                new = self._new_members(new)
+                for member in new:
+                    member['password_hash'] = hashed[member['email']]
+                self._insert(new)
+
+        self.report['imported'] += len(new)
+        self.report['duplicates'] += len(batch) - len(new)
+
+    def _insert(self, members):
+        if members:
+            db.session.execute(insert(User), [
+                {key: value for key, value in member.items() if key != 'password'}
+                for member in members
+            ])
+        db.session.commit()
+
+def load_checkpoint(path, source):
+    """Last committed line recorded for source, or 0"""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return checkpoint.get('line', 0) if checkpoint.get('source') == source else 0
+
+def save_checkpoint(path, source, line, report):
+    # Written to a temporary file first so a crash never leaves half a checkpoint
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump({'source': source, 'line': line, 'imported': report['imported']}, f)
+    os.replace(temporary, path)
+
+def text_stream(binary_stream):
+    """Wrap an upload's byte stream for read_members()"""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
@@ -0,0 +1,159 @@
+import bisect
+import threading
+import weakref
+
+# Seconds; suits both request latency and connection checkout waits
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Every metric created, in creation order
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _ShardOwner:
+    """Held only by a thread's local storage, so it dies with the thread"""
+
+    __slots__ = ('__weakref__',)
+
+class _Metric:
+    """
+    Base for metrics recorded into per-thread shards
+
+    Each thread writes only to its own shard, so recording takes no lock;
+    shards are summed when the metrics are rendered. When a thread ends
+    its shard is folded into a shared total, so thread-per-request
+    servers do not accumulate shards. Values are per worker process:
+    scrape every worker, or aggregate in Prometheus.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._shards_lock = threading.RLock()
+        REGISTRY.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            owner = _ShardOwner()
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            # Thread-locals are cleared when the thread (or greenlet) ends
+            weakref.finalize(owner, self._retire, shard).atexit = False
+            self._local.owner = owner
+            self._local.shard = shard
+        return shard
+
+    @staticmethod
+    def _add(into, shard):
+        for labels, values in list(shard.items()):
+            if labels in into:
+                into[labels] = [a + b for a, b in zip(into[labels], values)]
+            else:
+                into[labels] = list(values)
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._add(self._retired, shard)
+            self._shards.pop(id(shard), None)
+
+    def _merged(self):
+        merged = {}
+        with self._shards_lock:
+            self._add(merged, self._retired)
+            shards = list(self._shards.values())
+        for shard in shards:
+            self._add(merged, shard)
+        return merged
+
+    def _label_text(self, labels, extra=()):
+        pairs = list(zip(self.labelnames, labels)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return lines
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            shard[labels] = [amount]
+        else:
+            values[0] += amount
+
+    def samples(self):
+        return [
+            f'{self.name}{self._label_text(labels)} {values[0]}'
+            for labels, values in sorted(self._merged().items())
+        ]
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            # One slot per bucket plus +Inf, then sum and count
+            values = shard[labels] = [0] * (len(self.buckets) + 3)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def samples(self):
+        lines = []
+        for labels, values in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{self.name}_bucket{self._label_text(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{self._label_text(labels)} {values[-2]}')
+            lines.append(f'{self.name}_count{self._label_text(labels)} {values[-1]}')
+        return lines
+
+class Gauge(_Metric):
+    """
+    A value read when metrics are rendered
+
+    Args:
+        collect: Function returning {label values tuple: value}
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self):
+        return [
+            f'{self.name}{self._label_text(labels)} {value}'
+            for labels, value in sorted((self.collect() or {}).items())
+        ]
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
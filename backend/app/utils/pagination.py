@@ -0,0 +1,126 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(created_at, row_id):
+    """
+    Encode a (timestamp, id) position as an opaque cursor string
+
+    Args:
+        created_at: datetime of the row the cursor points at
+        row_id: Primary key of that row, used as a tie-breaker
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+def _keyset_filter(time_column, id_column, cursor, greater):
+    created_at, row_id = decode_cursor(cursor)
+    if greater:
+        return (time_column > created_at) | ((time_column == created_at) & (id_column > row_id))
+    return (time_column < created_at) | ((time_column == created_at) & (id_column < row_id))
+
+def _ordering(time_column, id_column, descending):
+    if descending:
+        return time_column.desc(), id_column.desc()
+    return time_column.asc(), id_column.asc()
+
+def paginate(query, time_column, id_column, descending=True, per_page=20,
+             max_per_page=100, cursor_only=False, row_key=None):
+    """
+    Paginate a query in offset mode or keyset (cursor) mode
+
+    Offset mode (?page=&per_page=) keeps the classic response with total
+    and pages. Cursor mode is used when ?after= or ?before= is given, when
+    ?pagination=cursor, or when cursor_only is set. It seeks on
+    (time_column, id_column) instead of using OFFSET, so deep pages cost
+    the same as the first one and concurrent inserts never shift rows
+    between pages. The COUNT(*) is skipped unless ?include_total=true.
+
+    Args:
+        query: Filtered query, without ordering
+        time_column: Timestamp column the listing is ordered by
+        id_column: Primary key column used as a tie-breaker
+        descending: Listing order, newest first by default
+        per_page: Default page size
+        max_per_page: Upper bound on page size in cursor mode
+        cursor_only: Disable offset mode for this listing
+        row_key: Function returning (timestamp, id) for a result row,
+            for queries that return tuples rather than model instances
+
+    Returns:
+        tuple: (items, page_info) where page_info is merged into the response
+
+    Raises:
+        InvalidCursor: If the client sent a malformed cursor
+    """
+    args = request.args
+    per_page = args.get('per_page', per_page, type=int)
+    after = args.get('after')
+    before = args.get('before')
+
+    if not (cursor_only or after or before or args.get('pagination') == 'cursor'):
+        page = args.get('page', 1, type=int)
+        pagination = query.order_by(*_ordering(time_column, id_column, descending)).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        return pagination.items, {
+            'total': pagination.total,
+            'page': pagination.page,
+            'per_page': pagination.per_page,
+            'pages': pagination.pages
+        }
+
+    per_page = max(1, min(per_page, max_per_page))
+    page_info = {'per_page': per_page}
+
+    if args.get('include_total', '').lower() == 'true':
+        page_info['total'] = query.order_by(None).count()
+
+    if before:
+        # Walk backwards from the cursor, then restore listing order
+        query = query.filter(_keyset_filter(time_column, id_column, before, greater=descending))
+        rows = query.order_by(*_ordering(time_column, id_column, not descending)).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+    else:
+        if after:
+            query = query.filter(_keyset_filter(time_column, id_column, after, greater=not descending))
+        rows = query.order_by(*_ordering(time_column, id_column, descending)).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = rows[:per_page]
+
+    if row_key is None:
+        def row_key(row):
+            return getattr(row, time_column.key), getattr(row, id_column.key)
+
+    page_info['next_cursor'] = None
+    page_info['prev_cursor'] = None
+    if items:
+        if has_more or before:
+            page_info['next_cursor'] = encode_cursor(*row_key(items[-1]))
+        if (has_more and before) or after:
+            page_info['prev_cursor'] = encode_cursor(*row_key(items[0]))
+    page_info['has_more'] = has_more
+
+    return items, page_info
@@ -0,0 +1,123 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+class PasswordHasher:
+    """
+    Bounded executor for password hashing and verification
+
+    The KDFs behind werkzeug's hashes (hashlib.pbkdf2_hmac and
+    hashlib.scrypt) release the GIL, so PASSWORD_HASH_WORKERS threads hash
+    in parallel while the rest of the worker keeps serving requests. At
+    most PASSWORD_HASH_QUEUE_SIZE calls wait for a free thread; beyond
+    that PasswordHasherBusy is raised immediately so the caller can answer
+    503 instead of letting a login burst pile up.
+    """
+
+    def __init__(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', 16)
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+        queue_size = app.config.get('PASSWORD_HASH_QUEUE_SIZE', 16)
+        self._slots = threading.BoundedSemaphore(self.max_workers + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so app startup does not spawn threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='password-hash'
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash_many(self, passwords):
+        """
+        Hash a list of passwords, several at a time
+
+        Takes the free slots, up to one per worker thread, and keeps that
+        many hashes in flight, so a bulk import runs in parallel without
+        crowding out logins waiting in the queue.
+
+        Raises:
+            PasswordHasherBusy: If no slot is free
+        """
+        slots = 0
+        while slots < self.max_workers and self._slots.acquire(blocking=False):
+            slots += 1
+        if not slots:
+            raise PasswordHasherBusy()
+        try:
+            executor = self._get_executor()
+            hashes = []
+            for start in range(0, len(passwords), slots):
+                futures = [
+                    executor.submit(generate_password_hash, password, self.method, self.salt_length)
+                    for password in passwords[start:start + slots]
+                ]
+                hashes.extend(future.result() for future in futures)
+            return hashes
+        finally:
+            for _ in range(slots):
+                self._slots.release()
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with different parameters than configured"""
+        return password_hash.split('$', 1)[0] != self.method
+
+def init_password_hasher(app):
+    app.extensions['password_hasher'] = PasswordHasher(app)
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
+
+def hash_password(password):
+    """
+    Hash a password with the configured parameters
+
+    Raises:
+        PasswordHasherBusy: If the hashing queue is full
+    """
+    return get_password_hasher().hash(password)
+
+def verify_password(user, password):
+    """
+    Check a user's password, upgrading the stored hash if parameters changed
+
+    The rehash reuses the plaintext we already have, so users move to new
+    parameters on their next successful login. The caller commits.
+
+    Raises:
+        PasswordHasherBusy: If the hashing queue is full
+    """
+    hasher = get_password_hasher()
+    if not hasher.verify(user.password_hash, password):
+        return False
+
+    if hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hasher.hash(password)
+        except PasswordHasherBusy:
+            # Not worth failing the login for; the next one will retry
+            pass
+    return True
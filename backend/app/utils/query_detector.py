@@ -0,0 +1,240 @@
+import functools
+import os
+import re
+import threading
+import traceback
+from contextlib import contextmanager
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<!\$)\b\d+(?:\.\d+)?\b')
+# qmark, format, pyformat (psycopg2), named and numeric paramstyles
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)'
+_PLACEHOLDER_LIST = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block or route runs more queries than its budget"""
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(statement):
+    """
+    Reduce a SQL statement to its shape
+
+    Literals become ? and IN lists of literals or bound parameters, in any
+    DB-API paramstyle, collapse to (?) whatever their length, so the lazy
+    load of one row's relationship matches that of every other row.
+    """
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+def _origin():
+    """The innermost frame in app code outside this module, as path:line"""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(APP_ROOT) and frame.filename != __file__:
+            return f'{os.path.relpath(frame.filename, APP_ROOT)}:{frame.lineno} in {frame.name}'
+    return None
+
+class QueryDetector:
+    """
+    Development-mode N+1 detector
+
+    Fingerprints every SQL statement run during a request. When one shape
+    runs QUERY_DETECTOR_THRESHOLD times or more, the route, the lazy
+    loaded relationship (e.g. Community.members) and the app code line
+    that triggered it are logged and kept in report(). Routes listed in
+    QUERY_BUDGETS ({endpoint: max statements}) are checked as well.
+
+    With QUERY_DETECTOR_RAISE set, findings raise QueryBudgetExceeded,
+    which fails the request and any test that made it.
+    """
+
+    def __init__(self, app):
+        self.threshold = app.config.get('QUERY_DETECTOR_THRESHOLD', 5)
+        self.raise_on_finding = app.config.get('QUERY_DETECTOR_RAISE', False)
+        self.budgets = dict(app.config.get('QUERY_BUDGETS') or {})
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement):
+        state = g.get('query_detector')
+        if state is None:
+            return
+        shape = fingerprint(statement)
+        attributes = g.get('query_detector_attributes')
+        seen = state['shapes'].get(shape)
+        if seen is None:
+            seen = state['shapes'][shape] = {'count': 0, 'attribute': None, 'origin': None}
+        if attributes and seen['attribute'] is None:
+            seen['attribute'] = attributes[-1]
+        seen['count'] += 1
+        state['total'] += 1
+        # The stack is only walked once per repeated shape
+        if seen['count'] == self.threshold:
+            seen['origin'] = _origin()
+
+    def finish(self, endpoint):
+        """Check the current request's statements; returns the findings"""
+        state = g.pop('query_detector', None)
+        if state is None:
+            return []
+
+        findings = []
+        for shape, seen in state['shapes'].items():
+            if seen['count'] >= self.threshold:
+                findings.append(dict(seen, statement=shape))
+
+        budget = self.budgets.get(endpoint)
+        over_budget = budget is not None and state['total'] > budget
+
+        with self._lock:
+            route = self._reports.setdefault(endpoint, {'requests': 0, 'max_queries': 0, 'repeated': {}})
+            route['requests'] += 1
+            route['max_queries'] = max(route['max_queries'], state['total'])
+            for finding in findings:
+                previous = route['repeated'].get(finding['statement'])
+                if previous is None or previous['count'] < finding['count']:
+                    route['repeated'][finding['statement']] = finding
+
+        for finding in findings:
+            current_app.logger.warning(
+                f"N+1 query on {endpoint}: {finding['count']}x {finding['statement'][:200]}"
+                f" (attribute: {finding['attribute'] or 'unknown'}, from: {finding['origin'] or 'unknown'})"
+            )
+        if over_budget:
+            current_app.logger.warning(f'{endpoint} ran {state["total"]} queries, budget is {budget}')
+
+        if self.raise_on_finding and (findings or over_budget):
+            details = [f"{finding['count']}x {finding['attribute'] or finding['statement']}" for finding in findings]
+            if over_budget:
+                details.append(f'{state["total"]} queries, budget {budget}')
+            raise QueryBudgetExceeded(f'{endpoint}: ' + '; '.join(details))
+        return findings
+
+    def report(self):
+        """Per-route summary of every request seen since startup or reset()"""
+        with self._lock:
+            return {
+                endpoint: {
+                    'requests': route['requests'],
+                    'max_queries': route['max_queries'],
+                    'repeated': sorted(route['repeated'].values(), key=lambda f: -f['count']),
+                }
+                for endpoint, route in self._reports.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._reports.clear()
+
+_listening = False
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        detector = current_app.extensions.get('query_detector')
+        if detector is not None:
+            detector.record(statement)
+
+def _do_orm_execute(orm_execute_state):
+    # Label lazy loads with the relationship they load, and refreshes of
+    # expired objects with the model being refreshed
+    if not has_request_context():
+        return None
+    if orm_execute_state.is_relationship_load:
+        path = orm_execute_state.loader_strategy_path
+        attribute = str(path[-1]) if path is not None and len(path) else None
+    elif orm_execute_state.is_column_load and orm_execute_state.bind_mapper is not None:
+        attribute = f'{orm_execute_state.bind_mapper.class_.__name__} (expired refresh)'
+    else:
+        return None
+    attributes = g.setdefault('query_detector_attributes', [])
+    attributes.append(attribute)
+    try:
+        return orm_execute_state.invoke_statement()
+    finally:
+        attributes.pop()
+
+def _start_request():
+    g.query_detector = {'shapes': {}, 'total': 0}
+
+def _finish_request(response):
+    detector = current_app.extensions['query_detector']
+    findings = detector.finish(request.endpoint or '<unmatched>')
+    if findings:
+        response.headers['X-N-Plus-One'] = str(len(findings))
+    return response
+
+def init_query_detector(app):
+    """Install the N+1 detector when QUERY_DETECTOR_ENABLED is set"""
+    global _listening
+
+    if not app.config.get('QUERY_DETECTOR_ENABLED'):
+        return
+
+    app.extensions['query_detector'] = QueryDetector(app)
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
+        _listening = True
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+def get_query_detector():
+    return current_app.extensions.get('query_detector')
+
+@contextmanager
+def query_budget(max_queries=None, max_repeats=None, engine=None):
+    """
+    Fail if the block runs more SQL than allowed
+
+    Usable in tests and scripts independently of the request detector:
+
+        with query_budget(max_queries=6, max_repeats=2):
+            client.get('/api/posts/')
+
+    Args:
+        max_queries: Most statements the block may run
+        max_repeats: Most times any one statement shape may run
+        engine: Engine to watch; defaults to db.engine
+
+    Yields the list of statements run so far.
+
+    Raises:
+        QueryBudgetExceeded: When either limit is exceeded
+    """
+    if engine is None:
+        from app import db
+        engine = db.engine
+
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', collect)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', collect)
+
+    problems = []
+    if max_queries is not None and len(statements) > max_queries:
+        problems.append(f'{len(statements)} queries, budget {max_queries}')
+    if max_repeats is not None:
+        shapes = {}
+        for statement in statements:
+            shape = fingerprint(statement)
+            shapes[shape] = shapes.get(shape, 0) + 1
+        for shape, count in shapes.items():
+            if count > max_repeats:
+                problems.append(f'{count}x {shape[:200]}')
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems))
@@ -0,0 +1,159 @@
+import itertools
+import json
+import queue
+import threading
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from flask import current_app, request
+from flask_jwt_extended import create_access_token
+from werkzeug.utils import import_string
+
+# Claim that marks a token as good only for opening the message stream
+STREAM_SCOPE = 'message_stream'
+
+class Subscription:
+    """
+    A single connected client listening on one channel
+    """
+
+    def __init__(self, channel, max_queue=100):
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=max_queue)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Slow consumer: drop the oldest event rather than block publishers
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def get(self, timeout=None):
+        """
+        Wait for the next event
+
+        Returns:
+            dict: The event, or None if the timeout elapsed
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class Broker(ABC):
+    """
+    Pub/sub backend interface used by the message stream
+
+    Implementations must be safe to call from any request thread. A
+    multi-worker deployment can plug in a broker backed by e.g. Redis or
+    PostgreSQL LISTEN/NOTIFY through the MESSAGE_BROKER setting.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+
+    @abstractmethod
+    def publish(self, channel, event, data):
+        """Deliver an event to every subscription on the channel"""
+
+    @abstractmethod
+    def subscribe(self, channel):
+        """Return a Subscription that receives the channel's events"""
+
+    @abstractmethod
+    def unsubscribe(self, subscription):
+        """Stop delivering events to a subscription"""
+
+class InProcessBroker(Broker):
+    """
+    Broker that delivers events to subscribers in the same process
+    """
+
+    def __init__(self, app=None):
+        super().__init__(app)
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._ids = itertools.count(1)
+        self._max_queue = app.config.get('SSE_QUEUE_SIZE', 100) if app else 100
+
+    def publish(self, channel, event, data):
+        message = {'id': next(self._ids), 'event': event, 'data': data}
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel, max_queue=self._max_queue)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+def init_broker(app):
+    """
+    Create the configured broker and attach it to the app
+    """
+    broker_class = app.config.get('MESSAGE_BROKER', InProcessBroker)
+    if isinstance(broker_class, str):
+        broker_class = import_string(broker_class)
+    app.extensions['message_broker'] = broker_class(app)
+
+def get_broker():
+    return current_app.extensions['message_broker']
+
+def publish(channel, event, data):
+    """
+    Publish an event to everyone subscribed to a channel
+
+    Channels are user public_ids. Call only after the related write has
+    been committed so clients never see rolled-back data.
+    """
+    try:
+        get_broker().publish(channel, event, data)
+    except Exception as e:
+        # Real-time delivery is best effort; clients can still fetch over HTTP
+        current_app.logger.error(f'Publish error: {str(e)}')
+
+def create_stream_token(public_id):
+    """
+    Issue a short-lived token for opening the message stream
+
+    EventSource cannot set headers, so the stream takes its token in the
+    query string, where proxies and access logs record it. A stream token
+    expires after SSE_TOKEN_EXPIRES and no other endpoint accepts it.
+    """
+    return create_access_token(
+        identity=public_id,
+        expires_delta=current_app.config.get('SSE_TOKEN_EXPIRES', timedelta(minutes=1)),
+        additional_claims={'scope': STREAM_SCOPE}
+    )
+
+def verify_token_scope(jwt_header, jwt_data):
+    """
+    Accept stream tokens on the stream endpoint only, and only them there
+    """
+    return (jwt_data.get('scope') == STREAM_SCOPE) == (request.endpoint == 'messages.stream')
+
+def format_sse(message):
+    """
+    Format a broker message as a Server-Sent Events frame
+    """
+    return (
+        f"id: {message['id']}\n"
+        f"event: {message['event']}\n"
+        f"data: {json.dumps(message['data'])}\n\n"
+    )
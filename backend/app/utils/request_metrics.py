@@ -0,0 +1,107 @@
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.utils.metrics import Counter, Histogram
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+REQUESTS = Counter(
+    'http_requests_total',
+    'Requests handled, by endpoint and status',
+    ('blueprint', 'endpoint', 'method', 'status')
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time from the start of the request to the response being ready',
+    ('blueprint', 'endpoint', 'method')
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Response body size for responses with a known length',
+    ('blueprint', 'endpoint'),
+    buckets=SIZE_BUCKETS
+)
+SQL_QUERIES = Histogram(
+    'http_request_sql_queries',
+    'SQL statements executed per request',
+    ('blueprint', 'endpoint'),
+    buckets=QUERY_BUCKETS
+)
+SQL_TIME = Histogram(
+    'http_request_sql_seconds',
+    'Time spent executing SQL per request',
+    ('blueprint', 'endpoint')
+)
+
+_listening = False
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('request_metrics_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    started = conn.info.get('request_metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    g.sql_queries = g.get('sql_queries', 0) + 1
+    g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not run for failed statements
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('request_metrics_started'):
+        connection.info['request_metrics_started'].pop()
+
+def _labels():
+    # Unmatched URLs share one label so 404 scans cannot blow up cardinality
+    endpoint = request.endpoint or '<unmatched>'
+    return request.blueprint or '', endpoint
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+def _record(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+
+    blueprint, endpoint = _labels()
+    LATENCY.observe(time.perf_counter() - started, blueprint, endpoint, request.method)
+    REQUESTS.inc(blueprint, endpoint, request.method, str(response.status_code))
+
+    # Streamed responses (the message stream) have no length up front
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, blueprint, endpoint)
+
+    SQL_QUERIES.observe(g.get('sql_queries', 0), blueprint, endpoint)
+    SQL_TIME.observe(g.get('sql_seconds', 0.0), blueprint, endpoint)
+    return response
+
+def init_request_metrics(app):
+    """
+    Record latency, response size and SQL usage for every request
+
+    Values land in the per-thread shards of app.utils.metrics, so the
+    hooks take no locks; they are served by the /metrics blueprint.
+    Disable with REQUEST_METRICS_ENABLED = False.
+    """
+    global _listening
+
+    if not app.config.get('REQUEST_METRICS_ENABLED', True):
+        return
+
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listening = True
+
+    app.before_request(_start_timer)
+    app.after_request(_record)
@@ -0,0 +1,255 @@
+import html
+import re
+from flask import current_app
+from sqlalchemy import DDL, column, event, func, literal_column, table, text
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import User, Post
+
+# FTS5 weights and tsvector labels map from the same A-D scale
+BM25_WEIGHTS = {'A': 10.0, 'B': 5.0, 'C': 2.0, 'D': 1.0}
+
+# Match delimiters used inside SQL; replaced by <mark> after HTML escaping
+MATCH_START = '\x02'
+MATCH_STOP = '\x03'
+
+class SearchIndex:
+    """
+    A maintained full-text index over some columns of a model's table
+
+    On PostgreSQL this is a GIN expression index over a weighted
+    tsvector, kept current by PostgreSQL itself. On SQLite it is an FTS5
+    external-content table kept current by triggers. Other databases
+    fall back to ILIKE scans.
+
+    Args:
+        model: Model class whose table is indexed
+        columns: List of (column name, weight) tuples, weight in A-D
+        pg_expressions: Optional mapping of column name to the SQL used
+            for it inside the tsvector, e.g. to cast JSON to text
+    """
+
+    def __init__(self, model, columns, pg_expressions=None):
+        self.model = model
+        self.table = model.__tablename__
+        self.columns = columns
+        self.pg_expressions = pg_expressions or {}
+        self.fts_table = f'{self.table}_fts'
+        self.pg_index = f'ix_{self.table}_search'
+
+    # PostgreSQL
+
+    def pg_vector(self):
+        parts = []
+        for name, weight in self.columns:
+            expression = self.pg_expressions.get(name, name)
+            parts.append(f"setweight(to_tsvector('simple', coalesce({expression}, '')), '{weight}')")
+        return ' || '.join(parts)
+
+    def pg_ddl(self):
+        return [
+            f'CREATE INDEX IF NOT EXISTS {self.pg_index} ON {self.table} '
+            f'USING GIN (({self.pg_vector()}))'
+        ]
+
+    # SQLite
+
+    def sqlite_ddl(self):
+        names = [name for name, _ in self.columns]
+        column_list = ', '.join(names)
+        new_values = ', '.join(f'new.{name}' for name in names)
+        old_values = ', '.join(f'old.{name}' for name in names)
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+            f"{column_list}, content='{self.table}', content_rowid='id', prefix='2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ai AFTER INSERT ON {self.table} BEGIN "
+            f"INSERT INTO {self.fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ad AFTER DELETE ON {self.table} BEGIN "
+            f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, {column_list}) "
+            f"VALUES ('delete', old.id, {old_values}); END",
+            # Only indexed columns fire the update trigger, so counter updates stay cheap
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_au AFTER UPDATE OF {column_list} "
+            f"ON {self.table} BEGIN "
+            f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, {column_list}) "
+            f"VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {self.fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        ]
+
+    def bm25(self):
+        weights = ', '.join(str(BM25_WEIGHTS[weight]) for _, weight in self.columns)
+        return literal_column(f'bm25({self.fts_table}, {weights})')
+
+    # Lifecycle
+
+    def install(self):
+        """Create the index objects whenever the table is created"""
+        for statement in self.pg_ddl():
+            event.listen(self.model.__table__, 'after_create',
+                         DDL(statement).execute_if(dialect='postgresql'))
+        for statement in self.sqlite_ddl():
+            event.listen(self.model.__table__, 'after_create',
+                         DDL(statement).execute_if(dialect='sqlite'))
+
+    def rebuild(self):
+        """Create missing index objects and repopulate the index from the table"""
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            for statement in self.pg_ddl():
+                db.session.execute(text(statement))
+            db.session.execute(text(f'REINDEX INDEX {self.pg_index}'))
+        elif dialect == 'sqlite':
+            for statement in self.sqlite_ddl():
+                db.session.execute(text(statement))
+            db.session.execute(text(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"))
+        db.session.commit()
+
+    def backend(self):
+        """Name of the search strategy available on the current database"""
+        cache = current_app.extensions.setdefault('search_backends', {})
+        if self.table not in cache:
+            dialect = db.engine.dialect.name
+            if dialect == 'postgresql':
+                cache[self.table] = 'postgresql'
+            elif dialect == 'sqlite' and self._sqlite_fts_available():
+                cache[self.table] = 'fts5'
+            else:
+                cache[self.table] = 'like'
+        return cache[self.table]
+
+    def _sqlite_fts_available(self):
+        try:
+            with db.engine.connect() as connection:
+                return connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': self.fts_table}
+                ).first() is not None
+        except SQLAlchemyError:
+            return False
+
+    def search(self, query, terms):
+        """
+        Restrict a query to rows matching all terms and order by relevance
+
+        Every term is matched as a prefix so partially typed words work.
+
+        Args:
+            query: Query over self.model, possibly already filtered
+            terms: Tokens returned by tokenize()
+
+        Returns:
+            Query: The filtered and ranked query
+        """
+        backend = self.backend()
+
+        if backend == 'postgresql':
+            ts_query = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+            vector = literal_column(f'({self.pg_vector()})')
+            return query.filter(vector.op('@@')(ts_query)).order_by(
+                func.ts_rank(vector, ts_query).desc(), self.model.id.desc()
+            )
+
+        if backend == 'fts5':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            fts = table(self.fts_table, column('rowid'))
+            return query.join(fts, fts.c.rowid == self.model.id).filter(
+                literal_column(self.fts_table).op('MATCH')(match)
+            ).order_by(self.bm25(), self.model.id.desc())
+
+        for term in terms:
+            query = query.filter(db.or_(*[
+                db.cast(getattr(self.model, name), db.String).ilike(f'%{term}%')
+                for name, _ in self.columns
+            ]))
+        return query.order_by(self.model.id.desc())
+
+    def highlights(self, terms, snippet_words=24):
+        """
+        Build SQL expressions returning match-highlighted text per column
+
+        Only available on the indexed backends; the ILIKE fallback returns
+        an empty dict and callers build excerpts with make_snippet().
+
+        Args:
+            terms: Tokens returned by tokenize()
+            snippet_words: Approximate length of each excerpt
+
+        Returns:
+            dict: Column name to labelled SQL expression
+        """
+        backend = self.backend()
+        expressions = {}
+
+        if backend == 'postgresql':
+            ts_query = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+            options = (
+                f'StartSel={MATCH_START}, StopSel={MATCH_STOP}, '
+                f'MaxWords={snippet_words}, MinWords={snippet_words // 2}'
+            )
+            for name, _ in self.columns:
+                expression = literal_column(self.pg_expressions.get(name, name))
+                expressions[name] = func.ts_headline(
+                    'simple', func.coalesce(expression, ''), ts_query, options
+                ).label(f'{name}_highlight')
+
+        elif backend == 'fts5':
+            for position, (name, _) in enumerate(self.columns):
+                expressions[name] = func.snippet(
+                    literal_column(self.fts_table), position,
+                    MATCH_START, MATCH_STOP, '…', snippet_words
+                ).label(f'{name}_highlight')
+
+        return expressions
+
+def render_highlight(value):
+    """
+    HTML-escape highlighted text and turn the match delimiters into <mark> tags
+    """
+    if value is None:
+        return None
+    return html.escape(value).replace(MATCH_START, '<mark>').replace(MATCH_STOP, '</mark>')
+
+def make_snippet(value, terms, width=120):
+    """
+    Build a highlighted excerpt in Python, for databases without a search index
+    """
+    value = value or ''
+    lowered = value.lower()
+    positions = [lowered.find(term) for term in terms if term in lowered]
+    start = max(min(positions) - width // 4, 0) if positions else 0
+    excerpt = value[start:start + width]
+
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE) if terms else None
+    if pattern:
+        excerpt = pattern.sub(lambda m: f'{MATCH_START}{m.group(0)}{MATCH_STOP}', excerpt)
+
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + width < len(value) else ''
+    return render_highlight(prefix + excerpt + suffix)
+
+def tokenize(value, max_terms=8):
+    """
+    Split user input into search terms
+
+    Only word characters are kept, so query syntax from either engine can
+    never be injected through the search box.
+    """
+    return re.findall(r'\w+', (value or '').lower())[:max_terms]
+
+user_index = SearchIndex(User, [
+    ('username', 'A'),
+    ('full_name', 'A'),
+    ('expertise_area', 'B'),
+    ('bio', 'C'),
+])
+
+post_index = SearchIndex(Post, [
+    ('title', 'A'),
+    ('tags', 'B'),
+    ('content', 'C'),
+], pg_expressions={'tags': 'tags::text'})
+
+SEARCH_INDEXES = [user_index, post_index]
+
+# Registered at import so db.create_all() builds the indexes with the tables
+for _index in SEARCH_INDEXES:
+    _index.install()
@@ -0,0 +1,173 @@
+from sqlalchemy import func
+from app import db
+from app.models import User, CommunityMember
+from app.utils.loaders import loader
+from app.utils.fields import field_selection, serialize_nested_users
+
+# Passed to to_dict() for a nested object the client left out of ?fields=,
+# so the model does not lazy load it; the key is dropped by apply()
+OMITTED = {}
+
+def serialize_users(users):
+    """
+    Serialize a list of users
+
+    Args:
+        users: List of User objects
+
+    Returns:
+        list: User dicts in the same order as the input, limited to the
+            request's ?fields=
+    """
+    selection = field_selection()
+    return [selection.apply(user.to_dict()) for user in users]
+
+def serialize_posts(posts):
+    """
+    Serialize a list of posts with their authors
+
+    All authors of the page are loaded with a single IN query through the
+    request's user loader instead of one lazy load per post. Author
+    counters are denormalized columns, so the number of queries does not
+    grow with the number of posts. Authors are embedded in the form the
+    request's ?fields= / ?expand= ask for, and not loaded at all when left
+    out.
+
+    Args:
+        posts: List of Post objects
+
+    Returns:
+        list: Post dicts in the same order as the input
+    """
+    if not posts:
+        return []
+
+    selection = field_selection()
+    form = selection.nested_form('author')
+    author_data = {}
+    if form:
+        authors = loader(User).load_many({post.author_id for post in posts})
+        author_data = serialize_nested_users(authors, form)
+
+    return [
+        selection.apply(post.to_dict(author=author_data.get(post.author_id) if form else OMITTED))
+        for post in posts
+    ]
+
+def serialize_post(post):
+    """
+    Serialize a single post through the batched path
+    """
+    return serialize_posts([post])[0]
+
+def serialize_comments(comments):
+    """
+    Serialize a list of comments with their authors
+
+    Works like serialize_posts(): one IN query for all commenters, in the
+    form the request asks for.
+
+    Args:
+        comments: List of Comment objects
+
+    Returns:
+        list: Comment dicts in the same order as the input
+    """
+    if not comments:
+        return []
+
+    selection = field_selection()
+    form = selection.nested_form('user')
+    user_data = {}
+    if form:
+        users = loader(User).load_many({comment.user_id for comment in comments})
+        user_data = serialize_nested_users(users, form)
+
+    return [
+        selection.apply(comment.to_dict(user=user_data.get(comment.user_id) if form else OMITTED))
+        for comment in comments
+    ]
+
+def serialize_messages(messages):
+    """
+    Serialize a list of messages with their senders and receivers
+
+    Args:
+        messages: List of Message objects
+
+    Returns:
+        list: Message dicts in the same order as the input
+    """
+    if not messages:
+        return []
+
+    selection = field_selection()
+    sender_form = selection.nested_form('sender')
+    receiver_form = selection.nested_form('receiver')
+
+    user_ids = set()
+    if sender_form:
+        user_ids.update(message.sender_id for message in messages)
+    if receiver_form:
+        user_ids.update(message.receiver_id for message in messages)
+    users = loader(User).load_many(user_ids)
+    senders = serialize_nested_users(users, sender_form) if sender_form else {}
+    receivers = serialize_nested_users(users, receiver_form) if receiver_form else {}
+
+    return [
+        selection.apply(message.to_dict(
+            sender=senders.get(message.sender_id) if sender_form else OMITTED,
+            receiver=receivers.get(message.receiver_id) if receiver_form else OMITTED
+        ))
+        for message in messages
+    ]
+
+def serialize_users_by_id(user_ids):
+    """
+    Serialize users referenced by id, e.g. from a page of join rows
+
+    Args:
+        user_ids: List of user ids
+
+    Returns:
+        list: User dicts in the order of user_ids, skipping missing users
+    """
+    return serialize_users(loader(User).load_many(user_ids))
+
+def serialize_communities(communities):
+    """
+    Serialize a list of communities with their admins and member counts
+
+    Admins come from the request's user loader and member counts from one
+    grouped COUNT, instead of loading every membership row per community.
+
+    Args:
+        communities: List of Community objects
+
+    Returns:
+        list: Community dicts in the same order as the input
+    """
+    if not communities:
+        return []
+
+    selection = field_selection()
+    form = selection.nested_form('admin')
+    admins = {}
+    if form:
+        admins = serialize_nested_users(
+            loader(User).load_many({community.admin_id for community in communities}), form
+        )
+    member_counts = dict(
+        db.session.query(CommunityMember.community_id, func.count(CommunityMember.id))
+        .filter(CommunityMember.community_id.in_([community.id for community in communities]))
+        .group_by(CommunityMember.community_id)
+        .all()
+    )
+
+    return [
+        selection.apply(community.to_dict(
+            admin=admins.get(community.admin_id) if form else OMITTED,
+            member_count=member_counts.get(community.id, 0)
+        ))
+        for community in communities
+    ]
@@ -0,0 +1,267 @@
+import heapq
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from flask import current_app
+from sqlalchemy import func
+from werkzeug.utils import import_string
+from app import db
+from app.models import User, Post, Follow, Community, CommunityMember
+
+class TimelineStore(ABC):
+    """
+    Storage interface for per-user home timelines
+
+    A timeline is a newest-first list of (created_at, post_id) entries,
+    stored with the feed sources it was built from (see _feed_sources) so
+    reads do not reload the user's follows and memberships. get() returns
+    None for a cold timeline, which makes the reader rebuild it from the
+    database. Multi-worker deployments should plug in a shared store
+    through the TIMELINE_STORE setting; the in-process store relies on a
+    short TTL to pick up fan-out done by other workers.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+
+    @abstractmethod
+    def get(self, user_id):
+        """Return (sources, entries), or None if the timeline is cold"""
+
+    @abstractmethod
+    def set(self, user_id, sources, entries):
+        """Replace a user's timeline"""
+
+    @abstractmethod
+    def push(self, user_ids, entry):
+        """Prepend an entry to the warm timelines of the given users"""
+
+    @abstractmethod
+    def discard(self, user_id):
+        """Drop a user's timeline and sources"""
+
+class InProcessTimelineStore(TimelineStore):
+    """
+    Bounded in-memory timeline store
+
+    Each timeline keeps at most TIMELINE_LENGTH entries and at most
+    TIMELINE_MAX_USERS timelines are kept, evicting the least recently
+    read one. Timelines expire after TIMELINE_TTL_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        super().__init__(app)
+        config = app.config if app else {}
+        self.length = config.get('TIMELINE_LENGTH', 800)
+        self.max_users = config.get('TIMELINE_MAX_USERS', 10000)
+        self.ttl = config.get('TIMELINE_TTL_SECONDS', 60)
+        self._lock = threading.Lock()
+        self._timelines = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._timelines.get(user_id)
+            if item is None:
+                return None
+            expires_at, sources, entries = item
+            if expires_at < time.monotonic():
+                del self._timelines[user_id]
+                return None
+            self._timelines.move_to_end(user_id)
+            return sources, list(entries)
+
+    def set(self, user_id, sources, entries):
+        timeline = deque(entries, maxlen=self.length)
+        with self._lock:
+            self._timelines[user_id] = (time.monotonic() + self.ttl, sources, timeline)
+            self._timelines.move_to_end(user_id)
+            while len(self._timelines) > self.max_users:
+                self._timelines.popitem(last=False)
+
+    def push(self, user_ids, entry):
+        with self._lock:
+            for user_id in user_ids:
+                item = self._timelines.get(user_id)
+                # Cold timelines are rebuilt on read, so only warm ones are updated
+                if item is not None:
+                    item[2].appendleft(entry)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._timelines.pop(user_id, None)
+
+def init_timelines(app):
+    """
+    Create the configured timeline store and attach it to the app
+    """
+    store_class = app.config.get('TIMELINE_STORE', InProcessTimelineStore)
+    if isinstance(store_class, str):
+        store_class = import_string(store_class)
+    app.extensions['timeline_store'] = store_class(app)
+
+def get_store():
+    return current_app.extensions['timeline_store']
+
+def _threshold():
+    return current_app.config.get('FEED_FANOUT_THRESHOLD', 5000)
+
+def _community_sizes(names):
+    """Member counts for the communities whose names are given"""
+    if not names:
+        return {}
+    rows = db.session.query(Community.name, func.count(CommunityMember.id)).join(
+        CommunityMember, CommunityMember.community_id == Community.id
+    ).filter(Community.name.in_(names)).group_by(Community.name)
+    return dict(rows)
+
+def _feed_sources(user_id):
+    """
+    Split what a user follows into fan-out (pushed) and fan-in (pulled) sources
+
+    Returns:
+        tuple: (pushed_authors, pushed_categories, pulled_authors, pulled_categories)
+    """
+    threshold = _threshold()
+
+    followed = db.session.query(User.id, User.follower_count).join(
+        Follow, Follow.following_id == User.id
+    ).filter(Follow.follower_id == user_id).all()
+
+    community_names = [
+        name for (name,) in db.session.query(Community.name).join(
+            CommunityMember, CommunityMember.community_id == Community.id
+        ).filter(CommunityMember.user_id == user_id)
+    ]
+    sizes = _community_sizes(community_names)
+
+    pushed_authors = [uid for uid, count in followed if (count or 0) <= threshold]
+    pulled_authors = [uid for uid, count in followed if (count or 0) > threshold]
+    pushed_categories = [name for name in community_names if sizes.get(name, 0) <= threshold]
+    pulled_categories = [name for name in community_names if sizes.get(name, 0) > threshold]
+
+    return pushed_authors, pushed_categories, pulled_authors, pulled_categories
+
+def _source_query(author_ids, categories, before=None):
+    """(created_at, id) pairs of posts from the given authors or communities"""
+    if not author_ids and not categories:
+        return None
+
+    conditions = []
+    if author_ids:
+        conditions.append(Post.author_id.in_(author_ids))
+    if categories:
+        conditions.append(Post.category.in_(categories))
+
+    query = db.session.query(Post.created_at, Post.id).filter(db.or_(*conditions))
+    if before:
+        created_at, post_id = before
+        query = query.filter(
+            (Post.created_at < created_at) |
+            ((Post.created_at == created_at) & (Post.id < post_id))
+        )
+    return query.order_by(Post.created_at.desc(), Post.id.desc())
+
+def _rebuild(user_id):
+    sources = _feed_sources(user_id)
+    pushed_authors, pushed_categories = sources[:2]
+    query = _source_query(pushed_authors, pushed_categories)
+    length = current_app.config.get('TIMELINE_LENGTH', 800)
+    entries = [tuple(row) for row in query.limit(length)] if query is not None else []
+    get_store().set(user_id, sources, entries)
+    return sources, entries
+
+def fan_out_post(post):
+    """
+    Push a newly created post onto the timelines of its audience
+
+    Authors and communities above FEED_FANOUT_THRESHOLD are skipped; their
+    posts are pulled at read time instead. Call after the post commits.
+    """
+    try:
+        threshold = _threshold()
+        entry = (post.created_at, post.id)
+        store = get_store()
+
+        author = db.session.get(User, post.author_id)
+        if author and (author.follower_count or 0) <= threshold:
+            follower_ids = [
+                follower_id for (follower_id,) in db.session.query(Follow.follower_id).filter(
+                    Follow.following_id == post.author_id
+                )
+            ]
+            store.push(follower_ids, entry)
+
+        if post.category:
+            community = Community.query.filter_by(name=post.category).first()
+            if community and _community_sizes([community.name]).get(community.name, 0) <= threshold:
+                member_ids = [
+                    member_id for (member_id,) in db.session.query(CommunityMember.user_id).filter(
+                        CommunityMember.community_id == community.id,
+                        CommunityMember.user_id != post.author_id
+                    )
+                ]
+                store.push(member_ids, entry)
+    except Exception as e:
+        # A missed fan-out is repaired when the timeline expires and is rebuilt
+        current_app.logger.error(f'Timeline fan-out error: {str(e)}')
+
+def invalidate_timeline(user_id):
+    """
+    Drop a user's cached timeline and feed sources after they follow,
+    unfollow, join or leave
+    """
+    get_store().discard(user_id)
+
+def get_feed_page(user_id, per_page, before=None):
+    """
+    Return one page of a user's home feed
+
+    Merges the cached timeline (fan-out-on-write sources) with a query for
+    the high-follower authors and large communities (fan-in-on-read). Pages
+    older than the cached timeline fall back to querying all sources.
+    The split into sources is cached with the timeline, so an author or
+    community crossing FEED_FANOUT_THRESHOLD is picked up when the
+    timeline expires.
+
+    Args:
+        user_id: Id of the reading user
+        per_page: Page size
+        before: Optional (created_at, post_id) to start after
+
+    Returns:
+        tuple: (post ids newest first, has_more)
+    """
+    cached = get_store().get(user_id)
+    if cached is None:
+        cached = _rebuild(user_id)
+    sources, timeline = cached
+    pushed_authors, pushed_categories, pulled_authors, pulled_categories = sources
+
+    want = per_page + 1
+    pushed = [entry for entry in timeline if before is None or entry < before]
+
+    length = current_app.config.get('TIMELINE_LENGTH', 800)
+    if len(pushed) < want and len(timeline) >= length:
+        # The page reaches past the bounded timeline, query older posts directly
+        oldest = min(timeline[-1], before) if before else timeline[-1]
+        query = _source_query(pushed_authors, pushed_categories, before=oldest)
+        if query is not None:
+            pushed += [tuple(row) for row in query.limit(want - len(pushed))]
+
+    pulled = []
+    query = _source_query(pulled_authors, pulled_categories, before=before)
+    if query is not None:
+        pulled = [tuple(row) for row in query.limit(want)]
+
+    merged = []
+    seen = set()
+    for entry in heapq.merge(pushed, pulled, reverse=True):
+        if entry[1] not in seen:
+            seen.add(entry[1])
+            merged.append(entry)
+        if len(merged) == want:
+            break
+
+    has_more = len(merged) > per_page
+    return merged[:per_page], has_more
@@ -0,0 +1,347 @@
+"""
+Reproducible synthetic dataset for benchmarks
+
+Builds users with realistic user_type and location mixes, a power-law
+follow graph (a few very popular accounts, a long tail of small ones),
+posts with categories and tags, comments, likes, message threads and
+communities. The same --seed always produces the same rows.
+
+Rows are written with multi-row INSERTs in chunks, bypassing the ORM, so
+the denormalized counters and the conversations inbox are rebuilt at the
+end with the app's own reconcile functions.
+
+    python benchmarks/generate_dataset.py --users 10k --database-url sqlite:////tmp/bench.db
+    python benchmarks/generate_dataset.py --users 1M --database-url postgresql://localhost/agri_bench
+
+Row counts per user (defaults): 1 post, 2 comments, 5 likes, ~15 follows,
+2 messages, and one community per 200 users. The target database must be
+empty; its tables are created if missing.
+"""
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+PASSWORD = 'Harvest2024'
+
+USER_TYPES = [('farmer', 70), ('expert', 12), ('buyer', 10), ('supplier', 8)]
+LOCATIONS = [
+    ('Nairobi', 18), ('Nakuru', 10), ('Kiambu', 9), ('Meru', 8), ('Eldoret', 8),
+    ('Kisumu', 7), ('Nyeri', 6), ('Machakos', 6), ('Kakamega', 6), ('Kericho', 5),
+    ('Embu', 4), ('Bungoma', 4), ('Kitale', 4), ('Mombasa', 3), ('Garissa', 2),
+]
+CATEGORIES = [
+    ('crops', 30), ('livestock', 20), ('soil', 10), ('pests', 10), ('irrigation', 8),
+    ('market', 8), ('equipment', 6), ('weather', 5), ('finance', 3),
+]
+TAGS = [
+    'maize', 'beans', 'coffee', 'tea', 'dairy', 'poultry', 'avocado', 'tomatoes',
+    'potatoes', 'fertilizer', 'compost', 'drip', 'rainfall', 'prices', 'seeds',
+    'organic', 'goats', 'bees', 'fish', 'storage',
+]
+WORDS = (
+    'harvest yield season rain soil seed plant crop field market price farm '
+    'cattle milk feed water pest disease spray acre fertilizer organic cooperative '
+    'storage drying transport buyer weather planting weeding irrigation greenhouse'
+).split()
+
+SCALES = {'k': 1000, 'm': 1000000}
+
+def parse_count(value):
+    value = value.strip().lower()
+    if value[-1:] in SCALES:
+        return int(float(value[:-1]) * SCALES[value[-1]])
+    return int(value)
+
+class Dataset:
+    """Seeded row generators; ids are assigned explicitly from 1"""
+
+    def __init__(self, users, seed, ratios, now=None):
+        self.users = users
+        self.rng = random.Random(seed)
+        self.ratios = ratios
+        self.now = now or datetime(2025, 1, 1)
+        self.start = self.now - timedelta(days=365)
+        self.posts = max(1, int(users * ratios['posts']))
+        self.communities = max(1, users // ratios['users_per_community'])
+        # Zipf-like popularity: rank r gets weight 1 / r^0.9, over shuffled ids
+        order = list(range(1, users + 1))
+        self.rng.shuffle(order)
+        self.by_popularity = order
+        self.popularity_cdf = list(itertools.accumulate(1 / rank ** 0.9 for rank in range(1, users + 1)))
+        self.post_created = {}
+
+    def _uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _timestamp(self, after=None):
+        start = after or self.start
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def _weighted(self, choices):
+        return self.rng.choices([value for value, _ in choices], [weight for _, weight in choices])[0]
+
+    def _sentence(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high))).capitalize()
+
+    def _popular_user(self):
+        index = bisect.bisect_left(self.popularity_cdf, self.rng.random() * self.popularity_cdf[-1])
+        return self.by_popularity[min(index, self.users - 1)]
+
+    def _heavy_tail(self, mean, cap):
+        # Pareto with alpha 2 has mean 2 * scale
+        return min(cap, int(self.rng.paretovariate(2.0) * mean / 2))
+
+    def users_rows(self, password_hash):
+        for user_id in range(1, self.users + 1):
+            user_type = self._weighted(USER_TYPES)
+            yield {
+                'id': user_id,
+                'public_id': self._uuid(),
+                'username': f'user{user_id}',
+                'email': f'user{user_id}@example.com',
+                'password_hash': password_hash,
+                'user_type': user_type,
+                'full_name': f'User {user_id}',
+                'bio': self._sentence(5, 20),
+                'location': self._weighted(LOCATIONS),
+                'expertise_area': self._weighted(CATEGORIES) if user_type == 'expert' else None,
+                'is_active': True,
+                'created_at': self._timestamp(),
+                'updated_at': self.now,
+                'post_count': 0,
+                'follower_count': 0,
+                'following_count': 0,
+            }
+
+    def follows_rows(self):
+        follow_id = itertools.count(1)
+        for follower_id in range(1, self.users + 1):
+            wanted = min(self.users - 1, self._heavy_tail(self.ratios['follows'], 5000))
+            targets = set()
+            attempts = 0
+            while len(targets) < wanted and attempts < wanted * 4:
+                attempts += 1
+                target = self._popular_user()
+                if target != follower_id:
+                    targets.add(target)
+            for following_id in sorted(targets):
+                yield {
+                    'id': next(follow_id),
+                    'follower_id': follower_id,
+                    'following_id': following_id,
+                    'created_at': self._timestamp(),
+                }
+
+    def posts_rows(self):
+        for post_id in range(1, self.posts + 1):
+            # Popular accounts also post more
+            author_id = self._popular_user() if self.rng.random() < 0.5 else self.rng.randint(1, self.users)
+            created_at = self._timestamp()
+            self.post_created[post_id] = created_at
+            yield {
+                'id': post_id,
+                'public_id': self._uuid(),
+                'title': self._sentence(3, 8),
+                'content': self._sentence(20, 80),
+                'author_id': author_id,
+                'category': self._weighted(CATEGORIES),
+                'tags': self.rng.sample(TAGS, self.rng.randint(0, 4)),
+                'image_urls': [],
+                'image_status': 'none',
+                'like_count': 0,
+                'comment_count': 0,
+                'created_at': created_at,
+                'updated_at': created_at,
+            }
+
+    def comments_rows(self):
+        total = int(self.posts * self.ratios['comments'])
+        for comment_id in range(1, total + 1):
+            post_id = self.rng.randint(1, self.posts)
+            created_at = self._timestamp(after=self.post_created.get(post_id))
+            yield {
+                'id': comment_id,
+                'public_id': self._uuid(),
+                'post_id': post_id,
+                'user_id': self.rng.randint(1, self.users),
+                'content': self._sentence(4, 30),
+                'created_at': created_at,
+                'updated_at': created_at,
+            }
+
+    def likes_rows(self):
+        like_id = itertools.count(1)
+        for post_id in range(1, self.posts + 1):
+            wanted = min(self.users, self._heavy_tail(self.ratios['likes'], 20000))
+            users = set()
+            while len(users) < wanted:
+                users.add(self._popular_user() if self.rng.random() < 0.3 else self.rng.randint(1, self.users))
+            for user_id in sorted(users):
+                yield {
+                    'id': next(like_id),
+                    'post_id': post_id,
+                    'user_id': user_id,
+                    'created_at': self._timestamp(after=self.post_created.get(post_id)),
+                }
+
+    def messages_rows(self):
+        total = int(self.users * self.ratios['messages'])
+        message_id = 1
+        while message_id <= total:
+            # A thread is a short back-and-forth between two users
+            a = self.rng.randint(1, self.users)
+            b = self._popular_user()
+            if a == b:
+                continue
+            sent_at = self._timestamp()
+            for _ in range(min(self.rng.randint(1, 12), total - message_id + 1)):
+                sent_at += timedelta(minutes=self.rng.randint(1, 600))
+                sender, receiver = (a, b) if self.rng.random() < 0.5 else (b, a)
+                yield {
+                    'id': message_id,
+                    'public_id': self._uuid(),
+                    'sender_id': sender,
+                    'receiver_id': receiver,
+                    'content': self._sentence(3, 25),
+                    'is_read': self.rng.random() < 0.8,
+                    'created_at': min(sent_at, self.now),
+                }
+                message_id += 1
+
+    def communities_rows(self):
+        for community_id in range(1, self.communities + 1):
+            created_at = self._timestamp()
+            yield {
+                'id': community_id,
+                'public_id': self._uuid(),
+                'name': f'{self._weighted(LOCATIONS)} {self._weighted(CATEGORIES)} group {community_id}',
+                'description': self._sentence(10, 30),
+                'admin_id': self._popular_user(),
+                'is_public': self.rng.random() < 0.9,
+                'created_at': created_at,
+                'updated_at': created_at,
+            }
+
+    def members_rows(self, admins):
+        member_id = itertools.count(1)
+        for community_id in range(1, self.communities + 1):
+            members = {admins[community_id]}
+            wanted = min(self.users, self._heavy_tail(60, 50000))
+            while len(members) < wanted:
+                members.add(self.rng.randint(1, self.users))
+            for user_id in sorted(members):
+                yield {
+                    'id': next(member_id),
+                    'community_id': community_id,
+                    'user_id': user_id,
+                    'joined_at': self._timestamp(),
+                }
+
+def write(connection, table, rows, chunk_size):
+    """Insert rows in chunks of chunk_size; returns the row count"""
+    written = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return written
+        connection.execute(table.insert(), chunk)
+        written += len(chunk)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', default='10k', help='Number of users: 10k, 100k, 1M, ...')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help='Target database; defaults to DATABASE_URL')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per INSERT')
+    parser.add_argument('--posts', type=float, default=1.0, help='Posts per user')
+    parser.add_argument('--comments', type=float, default=2.0, help='Comments per post')
+    parser.add_argument('--likes', type=float, default=5.0, help='Mean likes per post')
+    parser.add_argument('--follows', type=float, default=15.0, help='Mean follows per user')
+    parser.add_argument('--messages', type=float, default=2.0, help='Messages per user')
+    parser.add_argument('--users-per-community', type=int, default=200)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error('--database-url or DATABASE_URL is required')
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['AUTO_INIT_DB'] = 'false'
+
+    from app import create_app, db
+    from app.models import User, Post, Comment, Like, Follow, Community, CommunityMember, Message
+    from app.utils.counters import reconcile_user_counters, reconcile_post_counters
+    from app.utils.conversations import rebuild_conversations
+    from app.utils.passwords import get_password_hasher
+
+    dataset = Dataset(parse_count(args.users), args.seed, {
+        'posts': args.posts,
+        'comments': args.comments,
+        'likes': args.likes,
+        'follows': args.follows,
+        'messages': args.messages,
+        'users_per_community': args.users_per_community,
+    })
+
+    app = create_app()
+    report = {'users': dataset.users, 'seed': args.seed, 'rows': {}, 'seconds': {}}
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            sys.exit('The target database already has users; generate into an empty one')
+
+        password_hash = get_password_hasher().hash(PASSWORD)
+        admins = {}
+
+        def communities():
+            for row in dataset.communities_rows():
+                admins[row['id']] = row['admin_id']
+                yield row
+
+        steps = [
+            (User, dataset.users_rows(password_hash)),
+            (Follow, dataset.follows_rows()),
+            (Post, dataset.posts_rows()),
+            (Comment, dataset.comments_rows()),
+            (Like, dataset.likes_rows()),
+            (Message, dataset.messages_rows()),
+            (Community, communities()),
+            (CommunityMember, None),
+        ]
+        for model, rows in steps:
+            started = time.perf_counter()
+            if rows is None:
+                rows = dataset.members_rows(admins)
+            with db.engine.begin() as connection:
+                count = write(connection, model.__table__, rows, args.chunk_size)
+                if connection.dialect.name == 'postgresql':
+                    # Explicit ids leave the serial sequence behind
+                    table = model.__tablename__
+                    connection.exec_driver_sql(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"(SELECT coalesce(max(id), 1) FROM {table}))"
+                    )
+            report['rows'][model.__tablename__] = count
+            report['seconds'][model.__tablename__] = round(time.perf_counter() - started, 2)
+            print(f'{model.__tablename__}: {count} rows', file=sys.stderr)
+
+        started = time.perf_counter()
+        reconcile_user_counters()
+        reconcile_post_counters()
+        report['rows']['conversations'] = rebuild_conversations()
+        report['seconds']['counters_and_conversations'] = round(time.perf_counter() - started, 2)
+
+    report['password'] = PASSWORD
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Concurrency benchmark for post likes
+
+Many threads like the same post at once through the Flask test client.
+Afterwards like_count must equal the number of Like rows and the number
+of likes sent: any difference is a lost update.
+
+    python benchmarks/like_concurrency.py --threads 16 --likes 25
+    python benchmarks/like_concurrency.py --mode buffered
+    DATABASE_URL=postgresql://... python benchmarks/like_concurrency.py
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--likes', type=int, default=25, help='Likes sent by each thread')
+    parser.add_argument('--mode', choices=['direct', 'buffered'], default='direct')
+    parser.add_argument('--flush-ms', type=int, default=50)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'likes.db')
+    os.environ['LIKE_COUNTER_MODE'] = args.mode
+    os.environ['LIKE_FLUSH_INTERVAL_MS'] = str(args.flush_ms)
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+    from app.models import User, Post, Like
+    from app.utils.like_buffer import get_like_buffer
+
+    app = create_app()
+
+    total = args.threads * args.likes
+    with app.app_context():
+        # Cheap password hashes: logins are not part of this benchmark
+        users = [
+            User(username=f'liker{i}', email=f'liker{i}@example.com', password_hash='x')
+            for i in range(total)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        post = Post(title='Viral post', content='Everyone likes this', author_id=users[0].id)
+        db.session.add(post)
+        db.session.commit()
+        post_id = post.public_id
+        post_pk = post.id
+        with app.test_request_context():
+            tokens = [create_access_token(identity=user.public_id) for user in users]
+
+    errors = []
+    barrier = threading.Barrier(args.threads)
+
+    def worker(index):
+        client = app.test_client()
+        barrier.wait()
+        for token in tokens[index * args.likes:(index + 1) * args.likes]:
+            response = client.post(f'/api/posts/{post_id}/like', headers={'Authorization': f'Bearer {token}'})
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        buffer = get_like_buffer()
+        if buffer is not None:
+            buffer.flush()
+        like_count = db.session.query(Post.like_count).filter_by(id=post_pk).scalar()
+        like_rows = Like.query.filter_by(post_id=post_pk).count()
+        database = db.engine.dialect.name
+
+    result = {
+        'mode': args.mode,
+        'database': database,
+        'threads': args.threads,
+        'likes_sent': total,
+        'errors': len(errors),
+        'like_rows': like_rows,
+        'like_count': like_count,
+        'lost_updates': like_rows - like_count,
+        'seconds': round(elapsed, 3),
+        'likes_per_second': round(total / elapsed, 1),
+    }
+    print(json.dumps(result, indent=2))
+    return 0 if like_count == like_rows == total - len(errors) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Login throughput benchmark
+
+Logs the same users in repeatedly from many client threads through the
+Flask test client and reports logins/second overall and per hashing
+worker (one worker per core by default), plus how many requests were
+turned away with 503 because the hashing queue was full.
+
+    python benchmarks/password_hashing.py --clients 32 --logins 200
+    python benchmarks/password_hashing.py --method scrypt:32768:8:1 --workers 2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent client threads')
+    parser.add_argument('--logins', type=int, default=200, help='Total login requests')
+    parser.add_argument('--method', default=None, help='PASSWORD_HASH_METHOD to benchmark')
+    parser.add_argument('--workers', type=int, default=None, help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--queue-size', type=int, default=16, help='PASSWORD_HASH_QUEUE_SIZE')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'logins.db')
+    if args.method:
+        os.environ['PASSWORD_HASH_METHOD'] = args.method
+    if args.workers:
+        os.environ['PASSWORD_HASH_WORKERS'] = str(args.workers)
+
+    from app import create_app, db
+    from app.models import User
+    from app.utils.passwords import get_password_hasher
+
+    app = create_app()
+    app.config['PASSWORD_HASH_QUEUE_SIZE'] = args.queue_size
+
+    password = 'Harvest2024'
+    with app.app_context():
+        # Rebuild the hasher so the queue size above applies
+        from app.utils.passwords import init_password_hasher
+        init_password_hasher(app)
+        hasher = get_password_hasher()
+        password_hash = hasher.hash(password)
+        for i in range(args.clients):
+            db.session.add(User(username=f'coop{i}', email=f'coop{i}@example.com', password_hash=password_hash))
+        db.session.commit()
+
+        started = time.perf_counter()
+        hasher.verify(password_hash, password)
+        single_hash_seconds = time.perf_counter() - started
+
+    statuses = []
+    lock = threading.Lock()
+    remaining = [args.logins]
+
+    def client_thread(index):
+        client = app.test_client()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            response = client.post('/api/auth/login', json={'email': f'coop{index}@example.com', 'password': password})
+            with lock:
+                statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=client_thread, args=(i,)) for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    succeeded = statuses.count(200)
+    result = {
+        'method': hasher.method,
+        'hash_workers': hasher.max_workers,
+        'clients': args.clients,
+        'requests': len(statuses),
+        'succeeded': succeeded,
+        'rejected_503': statuses.count(503),
+        'other_errors': len(statuses) - succeeded - statuses.count(503),
+        'single_verify_ms': round(single_hash_seconds * 1000, 1),
+        'seconds': round(elapsed, 3),
+        'logins_per_second': round(succeeded / elapsed, 1),
+        'logins_per_second_per_core': round(succeeded / elapsed / hasher.max_workers, 1),
+    }
+    print(json.dumps(result, indent=2))
+
+if __name__ == '__main__':
+    main()
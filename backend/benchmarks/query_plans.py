@@ -0,0 +1,163 @@
+"""
+Query-plan regression check
+
+Requests every benchmarked endpoint once against a generated dataset,
+captures the SELECT statements each one runs, and EXPLAINs them. Exits
+non-zero if any statement reads one of the large tables with a full
+scan instead of an index.
+
+    python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --database-url postgresql://localhost/agri_bench
+
+SQLite plans come from EXPLAIN QUERY PLAN. On PostgreSQL sequential scans
+are disabled for the EXPLAIN, so a Seq Scan in the plan means no usable
+index exists rather than that the table is small. Without
+--database-url a dataset is generated into a temporary SQLite file.
+
+tests/test_query_plans.py runs the same check against a small SQLite
+dataset as part of the test suite.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+from generate_dataset import PASSWORD
+from run_benchmarks import Sample, scenarios
+
+# Tables that grow with usage; a full scan of one is a regression
+LARGE_TABLES = {
+    'users', 'posts', 'comments', 'likes', 'follows', 'messages',
+    'conversations', 'community_members',
+}
+
+# Scans that are expected: (endpoint, table)
+ALLOWED_SCANS = {
+    # Substring match on location cannot use a b-tree index
+    ('users.search_users', 'users'),
+}
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?! USING)(?!.*COVERING INDEX)')
+
+def sqlite_scans(connection, statement, parameters):
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    scans = []
+    for row in rows:
+        match = SQLITE_SCAN.match(row[-1])
+        if match:
+            scans.append(match.group(1))
+    return scans, [row[-1] for row in rows]
+
+def postgresql_scans(connection, statement, parameters):
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans, nodes = [], []
+
+    def walk(node):
+        nodes.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return scans, nodes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--users', default='5k', help='Size of the generated dataset')
+    parser.add_argument('--verbose', action='store_true', help='Print every plan')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        args.database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'plans.db')
+        subprocess.run(
+            [sys.executable, os.path.join(BACKEND, 'benchmarks', 'generate_dataset.py'),
+             '--users', args.users, '--database-url', args.database_url],
+            check=True, stdout=subprocess.DEVNULL
+        )
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['AUTO_INIT_DB'] = 'false'
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.models import User, Post, Community
+
+    app = create_app()
+    captured = []
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # Give the planner table statistics, as autovacuum does on PostgreSQL
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ANALYZE')
+
+        viewer = User.query.order_by(User.follower_count.desc()).first()
+        users = [tuple(row) for row in db.session.query(User.public_id, User.email).limit(200)]
+        posts = [row[0] for row in db.session.query(Post.public_id).order_by(Post.id.desc()).limit(200)]
+        communities = [row[0] for row in db.session.query(Community.public_id).limit(50)]
+        with app.test_request_context():
+            headers = {'Authorization': f'Bearer {create_access_token(identity=viewer.public_id)}'}
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+
+    sample = Sample(1, users, posts, communities, PASSWORD)
+    client = app.test_client()
+    explain = postgresql_scans if args.database_url.startswith('postgres') else sqlite_scans
+    failures = []
+    checked = 0
+
+    for blueprint, name, method, path, body, authenticated in scenarios(sample):
+        endpoint = f'{blueprint}.{name}'
+        captured.clear()
+        response = client.open(
+            path(), method=method, json=body() if body else None,
+            headers=headers if authenticated else None
+        )
+        if response.status_code >= 400:
+            failures.append({'endpoint': endpoint, 'error': f'HTTP {response.status_code}'})
+            continue
+
+        statements = list(captured)
+        with app.app_context():
+            with db.engine.connect() as connection:
+                for statement, parameters in statements:
+                    with connection.begin():
+                        scans, plan = explain(connection, statement, parameters)
+                    checked += 1
+                    bad = sorted(
+                        table for table in set(scans)
+                        if table in LARGE_TABLES and (endpoint, table) not in ALLOWED_SCANS
+                    )
+                    if args.verbose:
+                        print(f'{endpoint}: {" ".join(statement.split())[:160]}\n  ' + '\n  '.join(plan),
+                              file=sys.stderr)
+                    if bad:
+                        failures.append({
+                            'endpoint': endpoint,
+                            'full_scans': bad,
+                            'statement': ' '.join(statement.split()),
+                            'plan': plan,
+                        })
+
+    print(json.dumps({'statements_checked': checked, 'failures': failures}, indent=2))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Endpoint benchmark suite
+
+Drives the read endpoints of every blueprint through the Flask test
+client against a generated dataset and reports, per endpoint, p50/p95/p99
+latency, SQL statements per request and requests/second. Results are
+saved as JSON together with the git commit so runs can be compared.
+
+    python benchmarks/generate_dataset.py --users 10k --database-url sqlite:////tmp/bench.db
+    python benchmarks/run_benchmarks.py --database-url sqlite:////tmp/bench.db --output results.json
+    python benchmarks/run_benchmarks.py --database-url sqlite:////tmp/bench.db --compare results.json
+
+Without --database-url a small dataset is generated into a temporary
+SQLite file first. The response cache is off unless --with-cache is
+given, so every request does its full work.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+from generate_dataset import PASSWORD, LOCATIONS, CATEGORIES, WORDS
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def scenarios(sample):
+    """(blueprint, name, method, path factory, json body factory, authenticated)"""
+    return [
+        ('auth', 'login', 'POST', lambda: '/api/auth/login',
+         lambda: {'email': sample.email(), 'password': sample.password}, False),
+        ('auth', 'me', 'GET', lambda: '/api/auth/me', None, True),
+        ('users', 'get_user', 'GET', lambda: f'/api/users/{sample.user()}', None, False),
+        ('users', 'search_users', 'GET', lambda: f'/api/users/search?location={sample.location()}', None, False),
+        ('posts', 'get_posts', 'GET', lambda: '/api/posts/', None, False),
+        ('posts', 'get_posts_by_category', 'GET', lambda: f'/api/posts/?category={sample.category()}', None, False),
+        ('posts', 'get_feed', 'GET', lambda: '/api/posts/feed', None, True),
+        ('posts', 'search_posts', 'GET', lambda: f'/api/posts/search?q={sample.word()}', None, False),
+        ('posts', 'get_post', 'GET', lambda: f'/api/posts/{sample.post()}', None, False),
+        ('comments', 'get_comments', 'GET', lambda: f'/api/comments/post/{sample.post()}', None, False),
+        ('messages', 'get_conversations', 'GET', lambda: '/api/messages/conversations', None, True),
+        ('messages', 'get_messages', 'GET', lambda: f'/api/messages/user/{sample.user()}', None, True),
+        ('messages', 'get_unread_count', 'GET', lambda: '/api/messages/unread/count', None, True),
+        ('follows', 'get_following', 'GET', lambda: '/api/follows/following', None, True),
+        ('follows', 'get_followers', 'GET', lambda: '/api/follows/followers', None, True),
+        ('follows', 'check_follow', 'GET', lambda: f'/api/follows/check/{sample.user()}', None, True),
+        ('communities', 'get_communities', 'GET', lambda: '/api/communities/', None, False),
+        ('communities', 'get_community', 'GET', lambda: f'/api/communities/{sample.community()}', None, False),
+        ('communities', 'get_members', 'GET', lambda: f'/api/communities/{sample.community()}/members', None, False),
+        ('communities', 'get_joined', 'GET', lambda: '/api/communities/user/joined', None, True),
+    ]
+
+class Sample:
+    """Random ids drawn from the dataset, seeded so runs are comparable"""
+
+    def __init__(self, seed, users, posts, communities, password):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.posts = posts
+        self.communities = communities
+        self.password = password
+
+    def user(self):
+        return self.rng.choice(self.users)[0]
+
+    def email(self):
+        return self.rng.choice(self.users)[1]
+
+    def post(self):
+        return self.rng.choice(self.posts)
+
+    def community(self):
+        return self.rng.choice(self.communities)
+
+    def location(self):
+        return self.rng.choice(LOCATIONS)[0]
+
+    def category(self):
+        return self.rng.choice(CATEGORIES)[0]
+
+    def word(self):
+        return self.rng.choice(WORDS)
+
+def compare(current, baseline):
+    """Print p50/p95 and query deltas against an earlier results file"""
+    rows = []
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        rows.append(
+            f"{name:40s} p50 {before['p50_ms']:8.2f} -> {result['p50_ms']:8.2f} ms   "
+            f"p95 {before['p95_ms']:8.2f} -> {result['p95_ms']:8.2f} ms   "
+            f"queries {before['queries_per_request']:6.1f} -> {result['queries_per_request']:6.1f}"
+        )
+    print(f"Compared with {baseline.get('commit')}:", file=sys.stderr)
+    print('\n'.join(rows), file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per endpoint')
+    parser.add_argument('--only', action='append', help='Blueprint or endpoint name to run; repeatable')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--with-cache', action='store_true', help='Leave the response cache on')
+    parser.add_argument('--output', help='Write the results JSON here')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        args.database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        subprocess.run(
+            [sys.executable, os.path.join(BACKEND, 'benchmarks', 'generate_dataset.py'),
+             '--users', '2k', '--database-url', args.database_url],
+            check=True, stdout=subprocess.DEVNULL
+        )
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['AUTO_INIT_DB'] = 'false'
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'true' if args.with_cache else 'false'
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event, func
+    from app import create_app, db
+    from app.models import User, Post, Community, Follow
+
+    app = create_app()
+
+    with app.app_context():
+        # Benchmark as an active user: the one following the most accounts
+        viewer = db.session.query(User).join(Follow, Follow.follower_id == User.id).group_by(User.id).order_by(
+            func.count(Follow.id).desc()
+        ).first() or User.query.first()
+        users = [tuple(row) for row in db.session.query(User.public_id, User.email).limit(2000)]
+        posts = [row[0] for row in db.session.query(Post.public_id).order_by(Post.id.desc()).limit(2000)]
+        communities = [row[0] for row in db.session.query(Community.public_id).limit(500)]
+        with app.test_request_context():
+            headers = {'Authorization': f'Bearer {create_access_token(identity=viewer.public_id)}'}
+
+        statements = [0]
+
+        def count_statement(*_):
+            statements[0] += 1
+
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+
+    sample = Sample(args.seed, users, posts, communities, PASSWORD)
+    client = app.test_client()
+    results = {}
+
+    for blueprint, name, method, path, body, authenticated in scenarios(sample):
+        if args.only and blueprint not in args.only and name not in args.only:
+            continue
+
+        def request_once():
+            return client.open(
+                path(), method=method, json=body() if body else None,
+                headers=headers if authenticated else None
+            )
+
+        for _ in range(args.warmup):
+            request_once()
+
+        latencies = []
+        queries = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            statements[0] = 0
+            request_started = time.perf_counter()
+            response = request_once()
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            queries.append(statements[0])
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+
+        results[f'{blueprint}.{name}'] = {
+            'requests': args.requests,
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'queries_per_request': round(statistics.fmean(queries), 2),
+            'max_queries': max(queries),
+            'requests_per_second': round(args.requests / elapsed, 1),
+        }
+        print(f'{blueprint}.{name}: p50 {results[f"{blueprint}.{name}"]["p50_ms"]} ms', file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'database': args.database_url.split(':', 1)[0],
+        'cache': args.with_cache,
+        'requests_per_endpoint': args.requests,
+        'endpoints': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Response serialization benchmark
+
+Requests list endpoints against a generated dataset with Flask's stdlib
+JSON provider and with FastJSONProvider, in full and with sparse
+fieldsets, and reports payload size, SQL statements, request latency and
+the time spent encoding the payload alone.
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --database-url sqlite:////tmp/bench.db --requests 500
+
+Without --database-url a small dataset is generated into a temporary
+SQLite file first. The response cache is off so every request encodes.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+from run_benchmarks import percentile
+
+# (name, path) per endpoint and fieldset
+VARIANTS = [
+    ('posts', '/api/posts/?per_page=20'),
+    ('posts summary authors', '/api/posts/?per_page=20&expand='),
+    ('posts title only', '/api/posts/?per_page=20&fields=title,like_count,created_at'),
+    ('search', '/api/users/search?type=farmer'),
+    ('search names only', '/api/users/search?type=farmer&fields=username,full_name'),
+    ('communities', '/api/communities/'),
+    ('communities summary admins', '/api/communities/?expand='),
+]
+
+PROVIDERS = [
+    ('stdlib', 'flask.json.provider.DefaultJSONProvider'),
+    ('fast', 'app.utils.json_provider.FastJSONProvider'),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per variant')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per variant')
+    parser.add_argument('--output', help='Write the results JSON here')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        args.database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        subprocess.run(
+            [sys.executable, os.path.join(BACKEND, 'benchmarks', 'generate_dataset.py'),
+             '--users', '2k', '--database-url', args.database_url],
+            check=True, stdout=subprocess.DEVNULL
+        )
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['AUTO_INIT_DB'] = 'false'
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+
+    from sqlalchemy import event
+    from werkzeug.utils import import_string
+    from app import create_app, db
+
+    app = create_app()
+    statements = [0]
+
+    def count_statement(*_):
+        statements[0] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+
+    client = app.test_client()
+    results = {}
+
+    for provider_name, provider in PROVIDERS:
+        app.json = import_string(provider)(app)
+
+        for name, path in VARIANTS:
+            for _ in range(args.warmup):
+                client.get(path)
+
+            latencies = []
+            queries = []
+            for _ in range(args.requests):
+                statements[0] = 0
+                started = time.perf_counter()
+                response = client.get(path)
+                latencies.append((time.perf_counter() - started) * 1000)
+                queries.append(statements[0])
+                if response.status_code != 200:
+                    raise SystemExit(f'{path}: HTTP {response.status_code}')
+
+            # Encoding alone, on the payload the endpoint returned
+            payload = json.loads(response.data)
+            encode = []
+            with app.app_context():
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    app.json.dumps(payload)
+                    encode.append((time.perf_counter() - started) * 1000)
+
+            results[f'{provider_name}: {name}'] = {
+                'bytes': len(response.data),
+                'queries_per_request': round(statistics.mean(queries), 2),
+                'p50_ms': round(percentile(latencies, 0.50), 3),
+                'p95_ms': round(percentile(latencies, 0.95), 3),
+                'encode_median_ms': round(statistics.median(encode), 4),
+            }
+
+    width = max(len(name) for name in results)
+    print(f'{"variant":<{width}}  {"bytes":>8}  {"queries":>7}  {"p50 ms":>8}  {"p95 ms":>8}  {"encode ms":>9}')
+    for name, row in results.items():
+        print(
+            f'{name:<{width}}  {row["bytes"]:>8}  {row["queries_per_request"]:>7}  '
+            f'{row["p50_ms"]:>8.3f}  {row["p95_ms"]:>8.3f}  {row["encode_median_ms"]:>9.4f}'
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
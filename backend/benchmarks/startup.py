@@ -0,0 +1,76 @@
+"""
+Cold-start benchmark for a web worker
+
+Starts fresh interpreters that import the app and call create_app(), the
+way each gunicorn worker does, and reports the median import time,
+create_app() time, whole-process time and the number of SQL statements
+run during startup for each config.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --config production
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Runs in the child interpreter
+PROBE = '''
+import json, time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+import_started = time.perf_counter()
+from app import create_app
+from config import config
+imported = time.perf_counter()
+create_app(config[{config_name!r}])
+created = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - import_started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'statements': len(statements),
+}}))
+'''
+
+def run_once(config_name, env):
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(config_name=config_name)],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    elapsed = (time.perf_counter() - started) * 1000
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = elapsed
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--config', action='append', choices=['development', 'production'],
+                        help='Config to measure; repeatable, both by default')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db'))
+    env.pop('AUTO_INIT_DB', None)
+
+    report = {}
+    for config_name in args.config or ['development', 'production']:
+        runs = [run_once(config_name, env) for _ in range(args.runs)]
+        report[config_name] = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in ('import_ms', 'create_app_ms', 'process_ms', 'statements')
+        }
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
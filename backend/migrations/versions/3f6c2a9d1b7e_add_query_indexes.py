@@ -0,0 +1,50 @@
+"""add composite indexes for route queries
+
+Revision ID: 3f6c2a9d1b7e
+Revises: 8d2f4a6c1e35
+Create Date: 2026-10-18 21:30:00.000000
+
+Databases created with `flask init-db` already have these indexes; mark
+them with `flask db stamp head`. Existing databases get them with
+`flask db upgrade`. On PostgreSQL the indexes are built CONCURRENTLY so
+writes keep flowing while they build.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6c2a9d1b7e'
+down_revision = '8d2f4a6c1e35'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_posts_created', 'posts', ['created_at', 'id']),
+    ('ix_posts_author_created', 'posts', ['author_id', 'created_at', 'id']),
+    ('ix_posts_category_created', 'posts', ['category', 'created_at', 'id']),
+    ('ix_comments_post_created', 'comments', ['post_id', 'created_at', 'id']),
+    ('ix_follows_follower_created', 'follows', ['follower_id', 'created_at', 'id']),
+    ('ix_follows_following_created', 'follows', ['following_id', 'created_at', 'id']),
+    ('ix_communities_created', 'communities', ['created_at']),
+    ('ix_community_members_community_joined', 'community_members', ['community_id', 'joined_at', 'id']),
+    ('ix_community_members_user', 'community_members', ['user_id', 'community_id']),
+    ('ix_messages_pair_created', 'messages', ['sender_id', 'receiver_id', 'created_at', 'id']),
+    ('ix_messages_pair_unread', 'messages', ['sender_id', 'receiver_id', 'is_read']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,33 @@
+"""add denormalized counters to users
+
+Revision ID: 5c8e2b4f6a13
+Revises: 1a5e0c7d9b24
+Create Date: 2026-10-18 22:05:00.000000
+
+The columns start at 0 for every existing user. Backfill them once after
+upgrading with `flask reconcile-counters`, which recomputes post,
+follower and following counts in batches and can be re-run at any time.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e2b4f6a13'
+down_revision = '1a5e0c7d9b24'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ['post_count', 'follower_count', 'following_count']
+
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        for name in COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        for name in reversed(COLUMNS):
+            batch_op.drop_column(name)
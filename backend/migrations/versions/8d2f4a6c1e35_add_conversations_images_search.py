@@ -0,0 +1,127 @@
+"""add conversations, stored images and full-text search
+
+Revision ID: 8d2f4a6c1e35
+Revises: 5c8e2b4f6a13
+Create Date: 2026-10-18 23:10:00.000000
+
+Adds the conversations inbox table, content-addressed image storage with
+the per-post variant columns, and the full-text search objects: FTS5
+tables kept current by triggers on SQLite, GIN expression indexes on
+PostgreSQL (built CONCURRENTLY). The FTS5 tables are populated here; the
+inbox starts empty, so fill it once after upgrading with
+`flask rebuild-conversations`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f4a6c1e35'
+down_revision = '5c8e2b4f6a13'
+branch_labels = None
+depends_on = None
+
+# (table, [(column, weight)], PostgreSQL expression per column)
+SEARCH_INDEXES = [
+    ('users', [('username', 'A'), ('full_name', 'A'), ('expertise_area', 'B'), ('bio', 'C')], {}),
+    ('posts', [('title', 'A'), ('tags', 'B'), ('content', 'C')], {'tags': 'tags::text'}),
+]
+
+
+def _sqlite_search_ddl(table, columns):
+    names = [name for name, _ in columns]
+    column_list = ', '.join(names)
+    new_values = ', '.join(f'new.{name}' for name in names)
+    old_values = ', '.join(f'old.{name}' for name in names)
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} "
+        f"ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _pg_search_ddl(table, columns, expressions):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('simple', coalesce({expressions.get(name, name)}, '')), '{weight}')"
+        for name, weight in columns
+    )
+    return f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_search ON {table} USING GIN (({vector}))'
+
+
+def upgrade():
+    op.create_table(
+        'conversations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_a_id', sa.Integer(), nullable=False),
+        sa.Column('user_b_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_updated', sa.DateTime(), nullable=False),
+        sa.Column('unread_a', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('unread_b', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_a_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['user_b_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['last_message_id'], ['messages.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_a_id', 'user_b_id', name='unique_conversation'),
+    )
+    op.create_index('ix_conversations_user_a_updated', 'conversations', ['user_a_id', 'last_updated', 'id'])
+    op.create_index('ix_conversations_user_b_updated', 'conversations', ['user_b_id', 'last_updated', 'id'])
+
+    op.create_table(
+        'stored_images',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('extension', sa.String(length=10), nullable=False),
+        sa.Column('ref_count', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('variants', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash'),
+    )
+
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.add_column(sa.Column('image_variants', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('image_status', sa.String(length=20), nullable=True))
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for table, columns, expressions in SEARCH_INDEXES:
+                op.execute(_pg_search_ddl(table, columns, expressions))
+    elif dialect == 'sqlite':
+        for table, columns, _ in SEARCH_INDEXES:
+            for statement in _sqlite_search_ddl(table, columns):
+                op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, _, _ in reversed(SEARCH_INDEXES):
+        if dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search')
+        elif dialect == 'sqlite':
+            for suffix in ('au', 'ad', 'ai'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
+
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.drop_column('image_status')
+        batch_op.drop_column('image_variants')
+
+    op.drop_table('stored_images')
+    op.drop_index('ix_conversations_user_b_updated', table_name='conversations')
+    op.drop_index('ix_conversations_user_a_updated', table_name='conversations')
+    op.drop_table('conversations')
@@ -1,6 +1,10 @@
+import os
 from app import create_app
+from config import Config, config
 
-app = create_app()
+# FLASK_CONFIG=production skips table creation and seeding at startup
+config_name = os.environ.get('FLASK_CONFIG')
+app = create_app(config[config_name] if config_name else Config)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
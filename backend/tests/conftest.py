@@ -0,0 +1,114 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from config import Config
+from app import create_app, db
+from app.models import User, Post, Comment, Follow, Community, CommunityMember
+
+@pytest.fixture
+def app_config():
+    """Extra config for the app fixture; override in a test module"""
+    return {}
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """
+    An app on a fresh SQLite database with its own upload folder
+
+    No app context stays pushed, so every test client request gets its
+    own context, session and g as it does in production. Set up data and
+    make assertions inside `with app.app_context():`.
+    """
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        AUTO_INIT_DB = False
+        RESPONSE_CACHE_ENABLED = False
+        IMAGE_PROCESSING = 'inline'
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+    for key, value in app_config.items():
+        setattr(TestConfig, key, value)
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def make_user(app):
+    """Create a user; extra keyword arguments become columns. Returns it detached."""
+    def make(username, **kwargs):
+        with app.app_context():
+            user = User(username=username, email=f'{username}@example.com', password_hash='unused', **kwargs)
+            db.session.add(user)
+            db.session.commit()
+            db.session.refresh(user)
+            db.session.expunge(user)
+        return user
+    return make
+
+@pytest.fixture
+def auth_headers(app):
+    """Authorization headers carrying an access token for a user"""
+    def headers(user):
+        with app.test_request_context():
+            return {'Authorization': f'Bearer {create_access_token(identity=user.public_id)}'}
+    return headers
+
+@pytest.fixture
+def statements(app):
+    """SQL statements sent to the database, collected while the test runs"""
+    collected = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        collected.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', collect)
+    yield collected
+    event.remove(engine, 'before_cursor_execute', collect)
+
+@pytest.fixture
+def network(app, auth_headers):
+    """60 users who follow and are followed by the first, with posts, comments and communities"""
+    with app.app_context():
+        return _build_network(auth_headers)
+
+def _build_network(auth_headers):
+    users = [
+        User(username=f'member{i}', email=f'member{i}@example.com', password_hash='x')
+        for i in range(60)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    me = users[0]
+
+    communities = [Community(name=f'Community {i}', admin_id=user.id) for i, user in enumerate(users)]
+    posts = [Post(title=f'Post {i}', content='Irrigation', author_id=user.id) for i, user in enumerate(users)]
+    db.session.add_all(communities + posts)
+    db.session.flush()
+
+    for user in users[1:]:
+        db.session.add(Follow(follower_id=me.id, following_id=user.id))
+        db.session.add(Follow(follower_id=user.id, following_id=me.id))
+        db.session.add(CommunityMember(community_id=communities[0].id, user_id=user.id))
+        db.session.add(Comment(post_id=posts[0].id, user_id=user.id, content='Agreed'))
+    for community in communities:
+        db.session.add(CommunityMember(community_id=community.id, user_id=me.id))
+    db.session.commit()
+
+    return {
+        'headers': auth_headers(me),
+        'user': users[1].public_id,
+        'post': posts[0].public_id,
+        'community': communities[0].public_id,
+    }
@@ -0,0 +1,69 @@
+import pytest
+from app import db
+from app.models import Post, User
+from app.utils.counters import reconcile_post_counters, reconcile_user_counters
+
+@pytest.fixture
+def post(app, make_user):
+    """Public id of a post by a fresh author"""
+    with app.app_context():
+        post = Post(title='Dairy', content='Milk yields', author_id=make_user('kamau').id)
+        db.session.add(post)
+        db.session.commit()
+        return post.public_id
+
+def post_row(app, public_id):
+    with app.app_context():
+        return db.session.query(Post.like_count, Post.updated_at).filter_by(public_id=public_id).one()
+
+def test_like_does_not_touch_updated_at(app, client, post, make_user, auth_headers):
+    _, edited_at = post_row(app, post)
+
+    response = client.post(f'/api/posts/{post}/like', headers=auth_headers(make_user('njeri')))
+    assert response.status_code == 200
+
+    assert post_row(app, post) == (1, edited_at)
+
+def test_user_etag_changes_when_a_recent_post_is_liked(app, client, post, make_user, auth_headers):
+    with app.app_context():
+        author = Post.query.filter_by(public_id=post).one().author.public_id
+    etag = client.get(f'/api/users/{author}').headers['ETag']
+
+    client.post(f'/api/posts/{post}/like', headers=auth_headers(make_user('njeri')))
+
+    response = client.get(f'/api/users/{author}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_reconcile_only_updates_users_with_wrong_counters(app, make_user):
+    with app.app_context():
+        correct = make_user('otieno')
+        wrong = make_user('achieng')
+        User.query.filter_by(id=wrong.id).update({'post_count': 5})
+        db.session.commit()
+        edited_at = db.session.get(User, correct.id).updated_at
+
+        assert reconcile_user_counters() == 1
+        assert db.session.get(User, wrong.id).post_count == 0
+        assert db.session.get(User, correct.id).updated_at == edited_at
+
+def test_reconcile_refuses_buffered_like_counters(app, post):
+    app.config['LIKE_COUNTER_MODE'] = 'buffered'
+
+    with app.app_context(), pytest.raises(RuntimeError):
+        reconcile_post_counters()
+
+    result = app.test_cli_runner().invoke(args=['reconcile-counters'])
+    assert result.exit_code != 0
+    assert 'LIKE_COUNTER_MODE' in result.output
+
+def test_like_is_not_hidden_by_if_modified_since(app, client, post, make_user, auth_headers):
+    first = client.get(f'/api/posts/{post}')
+    assert 'Last-Modified' not in first.headers
+
+    client.post(f'/api/posts/{post}/like', headers=auth_headers(make_user('njeri')))
+
+    response = client.get(f'/api/posts/{post}', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+    assert response.get_json()['post']['like_count'] == 1
+    assert response.headers['ETag'] != first.headers['ETag']
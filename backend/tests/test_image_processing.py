@@ -0,0 +1,74 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.utils import image_processing
+from app.utils.image_processing import ImageProcessor
+
+@pytest.fixture
+def processor(app, monkeypatch):
+    """A background processor whose 'pool' is threads running a stub job"""
+    app.config.update(IMAGE_PROCESSING='background', IMAGE_QUEUE_SIZE=1, IMAGE_BACKLOG_SIZE=1)
+    processor = ImageProcessor(app)
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(processor, '_get_executor', lambda: executor)
+
+    release = threading.Event()
+
+    def process_images(raw_filenames, upload_folder, variants=None):
+        release.wait(5)
+        return [{'medium': name} for name in raw_filenames]
+    monkeypatch.setattr(image_processing, 'process_images', process_images)
+
+    processor.release = release
+    processor.executor = executor
+    yield processor
+    release.set()
+    executor.shutdown(wait=True)
+
+def test_jobs_beyond_the_pool_wait_instead_of_running_inline(processor):
+    done = []
+    finished = threading.Event()
+
+    def on_done(results):
+        done.append(results)
+        if len(done) == 2:
+            finished.set()
+
+    processor.submit(['raw_a.jpg'], on_done)
+    # Returns at once even though the only slot is taken
+    processor.submit(['raw_b.jpg'], on_done)
+    assert done == []
+    assert not processor.accepting()
+
+    processor.release.set()
+    assert finished.wait(5)
+    # Let the last callback hand back its slot
+    processor.executor.shutdown(wait=True)
+    assert done == [[{'medium': 'raw_a.jpg'}], [{'medium': 'raw_b.jpg'}]]
+    assert processor.accepting()
+    assert processor._in_flight == 0
+
+def test_uploads_get_503_while_the_backlog_is_full(app, client, processor, make_user, auth_headers):
+    app.extensions['image_processor'] = processor
+    processor.submit(['raw_a.jpg'], lambda results: None)
+    processor.submit(['raw_b.jpg'], lambda results: None)
+
+    response = client.post(
+        '/api/posts/',
+        data={'title': 'Seedlings', 'content': 'Ready to transplant',
+              'images': (io.BytesIO(b'not read'), 'seedlings.jpg')},
+        headers=auth_headers(make_user('grower')),
+        content_type='multipart/form-data'
+    )
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+
+def test_pool_workers_are_spawned(app):
+    app.config['IMAGE_PROCESSING'] = 'background'
+    processor = ImageProcessor(app)
+    try:
+        assert processor._get_executor()._mp_context.get_start_method() == 'spawn'
+    finally:
+        processor.shutdown()
@@ -0,0 +1,146 @@
+import io
+import os
+from PIL import Image
+from app.models import Post, StoredImage
+
+def png_bytes(color='green'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def upload(data, name='photo.png'):
+    return (io.BytesIO(data), name)
+
+def create_post(client, headers, *images):
+    return client.post('/api/posts/', headers=headers, data={
+        'title': 'Harvest', 'content': 'Maize this season',
+        'images': [upload(data) for data in images]
+    }, content_type='multipart/form-data')
+
+def stored_files(app):
+    return sorted(os.listdir(app.config['UPLOAD_FOLDER']))
+
+def ref_counts(app):
+    with app.app_context():
+        return [image.ref_count for image in StoredImage.query]
+
+def test_duplicate_upload_in_one_post_is_released_on_delete(app, client, make_user, auth_headers):
+    headers = auth_headers(make_user('wanjiru'))
+    image = png_bytes()
+
+    response = create_post(client, headers, image, image)
+    assert response.status_code == 201
+    post_id = response.get_json()['post']['public_id']
+
+    with app.app_context():
+        image_urls = Post.query.filter_by(public_id=post_id).one().image_urls
+    assert len(image_urls) == 2
+    assert image_urls[0] == image_urls[1]
+    assert ref_counts(app) == [2]
+    assert stored_files(app)
+
+    response = client.delete(f'/api/posts/{post_id}', headers=headers)
+    assert response.status_code == 200
+    assert ref_counts(app) == []
+    assert stored_files(app) == []
+
+def test_shared_image_survives_until_last_post_is_deleted(app, client, make_user, auth_headers):
+    headers = auth_headers(make_user('otieno'))
+    image = png_bytes('yellow')
+
+    first = create_post(client, headers, image, image).get_json()['post']['public_id']
+    second = create_post(client, headers, image).get_json()['post']['public_id']
+    assert ref_counts(app) == [3]
+
+    client.delete(f'/api/posts/{first}', headers=headers)
+    assert ref_counts(app) == [1]
+    assert stored_files(app)
+
+    client.delete(f'/api/posts/{second}', headers=headers)
+    assert ref_counts(app) == []
+    assert stored_files(app) == []
+
+def test_reuploading_the_current_profile_image_keeps_one_reference(app, client, make_user, auth_headers):
+    headers = auth_headers(make_user('akinyi'))
+    image = png_bytes('brown')
+
+    for _ in range(2):
+        response = client.put('/api/users/profile', headers=headers, data={
+            'profile_image': upload(image)
+        }, content_type='multipart/form-data')
+        assert response.status_code == 200
+
+    assert ref_counts(app) == [1]
+
+def test_reencoded_copies_of_a_picture_share_one_image(app, client, make_user, auth_headers):
+    from PIL.PngImagePlugin import PngInfo
+
+    headers = auth_headers(make_user('njeri'))
+    picture = Image.new('RGB', (32, 32), 'orange')
+    copies = []
+    for level, comment in ((0, 'original'), (9, 'shared from a group chat')):
+        buffer = io.BytesIO()
+        info = PngInfo()
+        info.add_text('Comment', comment)
+        picture.save(buffer, 'PNG', compress_level=level, pnginfo=info)
+        copies.append(buffer.getvalue())
+    assert copies[0] != copies[1]
+
+    create_post(client, headers, copies[0])
+    create_post(client, headers, copies[1])
+
+    assert ref_counts(app) == [2]
+
+def test_unreadable_uploads_are_not_stored(app, client, make_user, auth_headers):
+    headers = auth_headers(make_user('kamau'))
+
+    response = create_post(client, headers, b'not an image')
+
+    assert response.status_code == 201
+    assert response.get_json()['post']['image_urls'] == []
+    assert ref_counts(app) == []
+
+def test_concurrent_syncs_release_failed_images_once(app, monkeypatch):
+    import threading
+    from app import db
+    from app.models import User
+    from app.utils import image_store
+
+    digest = 'f' * 64
+    with app.app_context():
+        author = User(username='wambui', email='wambui@example.com', password_hash='x')
+        db.session.add(author)
+        db.session.flush()
+        # A failed image shared with another post, pending on this one
+        db.session.add(StoredImage(content_hash=digest, extension='png', status='failed', ref_count=2))
+        db.session.add(Post(title='Pests', content='Fall armyworm', author_id=author.id,
+                            image_urls=[f'/uploads/{digest}_medium.jpg'], image_status='pending'))
+        db.session.commit()
+
+    # Run a second sync to completion after the first has read the
+    # pending posts but before it finishes them
+    hashes_in = image_store.hashes_in
+    raced = []
+
+    def racing_hashes_in(urls):
+        if not raced:
+            raced.append(True)
+
+            def other_run():
+                with app.app_context():
+                    image_store.sync_pending_posts()
+            thread = threading.Thread(target=other_run)
+            thread.start()
+            thread.join()
+        return hashes_in(urls)
+    monkeypatch.setattr(image_store, 'hashes_in', racing_hashes_in)
+
+    with app.app_context():
+        image_store.sync_pending_posts()
+
+    assert raced
+    assert ref_counts(app) == [1]
+    with app.app_context():
+        post = Post.query.one()
+        assert post.image_status == 'failed'
+        assert post.image_urls == []
@@ -0,0 +1,56 @@
+import io
+import pytest
+from app import db
+from app.models import User
+from app.utils import member_import
+
+CSV = (
+    'username,email,password,user_type\n'
+    'grower,grower@example.com,Password123,\n'
+    'agronomist,agronomist@example.com,Password123,expert\n'
+    'intruder,intruder@example.com,Password123,admin\n'
+    'wizard,wizard@example.com,Password123,wizard\n'
+)
+
+@pytest.fixture
+def admin_headers(make_user, auth_headers):
+    return auth_headers(make_user('root', user_type='admin'))
+
+def _upload(client, headers, body=CSV, query=''):
+    return client.post(
+        f'/api/users/import{query}',
+        data={'file': (io.BytesIO(body.encode()), 'members.csv')},
+        headers=headers,
+        content_type='multipart/form-data'
+    )
+
+def test_endpoint_hashes_with_the_password_hasher(app, client, admin_headers, monkeypatch):
+    def no_process_pool(*args, **kwargs):
+        raise AssertionError('the endpoint must not start a process pool')
+    monkeypatch.setattr(member_import, 'ProcessPoolExecutor', no_process_pool)
+
+    response = _upload(client, admin_headers)
+
+    assert response.status_code == 200, response.get_json()
+    report = response.get_json()
+    assert report['imported'] == 2
+    assert report['invalid'] == 2
+    assert [error['line'] for error in report['errors']] == [4, 5]
+    with app.app_context():
+        imported = dict(db.session.query(User.username, User.user_type).filter(User.username != 'root'))
+        password_hash = db.session.query(User.password_hash).filter_by(username='grower').scalar()
+    assert imported == {'grower': 'farmer', 'agronomist': 'expert'}
+    assert password_hash.startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+
+def test_unknown_default_user_type_is_rejected(client, admin_headers):
+    response = _upload(client, admin_headers, query='?user_type=admin')
+
+    assert response.status_code == 400
+    assert 'user_type' in response.get_json()['error']
+
+def test_rows_are_checked_against_the_allowed_types():
+    row = {'username': 'grower', 'email': 'grower@example.com', 'password': 'Password123'}
+
+    assert member_import.validate_member(dict(row, user_type='expert'))[1] is None
+    assert member_import.validate_member(dict(row, user_type='Admin'))[0] is None
+    assert member_import.validate_member(dict(row, user_type='wizard'))[0] is None
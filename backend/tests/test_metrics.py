@@ -0,0 +1,43 @@
+import threading
+from app.utils.metrics import Counter, Histogram, REGISTRY
+
+def _unregister(*metrics):
+    for metric in metrics:
+        REGISTRY.remove(metric)
+
+def test_finished_threads_fold_into_the_total():
+    requests = Counter('test_thread_requests_total', 'Requests', ('status',))
+    latency = Histogram('test_thread_latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    try:
+        def handle():
+            requests.inc('200')
+            latency.observe(0.5)
+
+        threads = [threading.Thread(target=handle) for _ in range(2000)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(requests._shards) == 0
+        assert len(latency._shards) == 0
+        assert requests.samples() == ['test_thread_requests_total{status="200"} 2000']
+        assert 'test_thread_latency_seconds_count 2000' in latency.samples()
+
+        # Live threads keep recording into their own shard
+        requests.inc('200')
+        assert len(requests._shards) == 1
+        assert requests.samples() == ['test_thread_requests_total{status="200"} 2001']
+    finally:
+        _unregister(requests, latency)
+
+def test_metrics_token(app, client):
+    assert client.get('/metrics').status_code == 200
+
+    app.config['METRICS_TOKEN'] = 'secret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+def test_production_requires_a_metrics_token(app, client):
+    app.config['METRICS_REQUIRE_TOKEN'] = True
+    assert client.get('/metrics').status_code == 403
@@ -0,0 +1,71 @@
+import pytest
+from app import db
+from app.utils.query_detector import QueryBudgetExceeded, fingerprint, query_budget
+
+# (path, endpoint, most statements per request); {n} is the page size.
+# Budgets include loading the current user on a cold identity cache.
+BUDGETS = [
+    ('/api/posts/?per_page={n}', 'posts.get_posts', 3),
+    ('/api/comments/post/{post}?per_page={n}', 'comments.get_comments', 6),
+    ('/api/users/search?type=farmer&per_page={n}', 'users.search_users', 1),
+    ('/api/follows/following?per_page={n}', 'follows.get_following', 4),
+    ('/api/follows/followers?per_page={n}', 'follows.get_followers', 4),
+    ('/api/communities/{community}/members?per_page={n}', 'communities.get_community_members', 4),
+    ('/api/communities/user/joined?per_page={n}', 'communities.get_user_communities', 6),
+    ('/api/communities/?per_page={n}', 'communities.get_communities', 4),
+]
+
+@pytest.fixture
+def app_config():
+    return {
+        'QUERY_DETECTOR_ENABLED': True,
+        'QUERY_DETECTOR_RAISE': True,
+        'QUERY_DETECTOR_THRESHOLD': 3,
+        'QUERY_BUDGETS': {endpoint: budget for _, endpoint, budget in BUDGETS},
+    }
+
+@pytest.fixture
+def engine(app):
+    with app.app_context():
+        return db.engine
+
+def _path(template, network):
+    return template.format(n=50, post=network['post'], community=network['community'])
+
+@pytest.mark.parametrize('template, endpoint, budget', BUDGETS)
+def test_list_routes_stay_within_budget(client, engine, network, template, endpoint, budget):
+    path = _path(template, network)
+
+    # The detector raises QueryBudgetExceeded from the request on an N+1
+    # or a route over its QUERY_BUDGETS entry
+    with query_budget(max_queries=budget, max_repeats=2, engine=engine):
+        response = client.get(path, headers=network['headers'])
+
+    assert response.status_code == 200, response.get_json()
+
+def test_detector_fails_requests_over_budget(app, client, network):
+    path = _path('/api/follows/following?per_page={n}', network)
+    app.extensions['query_detector'].budgets['follows.get_following'] = 1
+
+    with pytest.raises(QueryBudgetExceeded, match='budget 1'):
+        client.get(path, headers=network['headers'])
+
+def test_query_budget_counts_repeated_shapes(app, make_user):
+    users = [make_user(f'farmer{i}') for i in range(3)]
+
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match='3x'):
+            with query_budget(max_repeats=2):
+                for user in users:
+                    db.session.execute(db.text('SELECT username FROM users WHERE id = :id'), {'id': user.id})
+
+@pytest.mark.parametrize('statement', [
+    'SELECT * FROM users WHERE users.id IN (?, ?, ?)',
+    'SELECT * FROM users WHERE users.id IN (%s, %s)',
+    'SELECT * FROM users WHERE users.id IN (%(id_1_1)s, %(id_1_2)s)',
+    'SELECT * FROM users WHERE users.id IN (:id_1, :id_2)',
+    'SELECT * FROM users WHERE users.id IN ($1, $2, $3, $4)',
+    'SELECT * FROM users WHERE users.id IN (7, 8)',
+])
+def test_in_lists_collapse_in_every_paramstyle(statement):
+    assert fingerprint(statement) == 'SELECT * FROM users WHERE users.id IN (?)'
@@ -0,0 +1,31 @@
+import pytest
+
+# List endpoints; {n} is the page size
+ENDPOINTS = [
+    '/api/posts/?per_page={n}',
+    '/api/comments/post/{post}?per_page={n}',
+    '/api/users/search?type=farmer&per_page={n}',
+    '/api/follows/following?per_page={n}',
+    '/api/follows/followers?per_page={n}',
+    '/api/communities/{community}/members?per_page={n}',
+    '/api/communities/user/joined?per_page={n}',
+    '/api/communities/?per_page={n}',
+]
+
+def query_count(client, statements, path, headers):
+    # The first request warms the identity cache, so only the endpoint's own queries count
+    client.get(path, headers=headers)
+    statements.clear()
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_queries_do_not_grow_with_page_size(client, statements, network, endpoint):
+    def path(per_page):
+        return endpoint.format(n=per_page, post=network['post'], community=network['community'])
+
+    small = query_count(client, statements, path(5), network['headers'])
+    large = query_count(client, statements, path(50), network['headers'])
+
+    assert small == large
@@ -0,0 +1,133 @@
+import re
+import pytest
+from sqlalchemy import event
+from app import db
+
+# Tables that grow with usage; a full scan of one is a regression
+LARGE_TABLES = {
+    'users', 'posts', 'comments', 'likes', 'follows', 'messages',
+    'conversations', 'community_members',
+}
+
+# Scans that are expected: (route, table)
+ALLOWED_SCANS = {
+    # Substring match on location cannot use a b-tree index
+    ('/api/users/search?location=nairobi', 'users'),
+}
+
+# Routes whose ORDER BY no index can serve; everywhere else a sort means
+# a paged list lost the index that returns its rows in order
+ALLOWED_SORTS = {
+    # Ranked by bm25() over the FTS5 matches
+    '/api/users/search?q=member',
+    '/api/posts/search?q=irrigation',
+    # OR of two index ranges, each in order; the union is sorted
+    '/api/posts/feed',
+    '/api/messages/conversations',
+    '/api/messages/user/{user}',
+}
+
+# Read routes; {user}, {post} and {community} come from the network fixture
+ROUTES = [
+    '/api/auth/me',
+    '/api/users/{user}',
+    '/api/users/search?location=nairobi',
+    '/api/users/search?q=member',
+    '/api/posts/',
+    '/api/posts/?category=General',
+    '/api/posts/feed',
+    '/api/posts/search?q=irrigation',
+    '/api/posts/{post}',
+    '/api/comments/post/{post}',
+    '/api/messages/conversations',
+    '/api/messages/user/{user}',
+    '/api/messages/unread/count',
+    '/api/follows/following',
+    '/api/follows/followers',
+    '/api/follows/check/{user}',
+    '/api/communities/',
+    '/api/communities/{community}',
+    '/api/communities/{community}/members',
+    '/api/communities/user/joined',
+]
+
+# Index (or FTS5 table) each route's queries are built around; dropping
+# one rarely causes a full scan, as another index usually still matches
+EXPECTED_INDEXES = {
+    '/api/users/{user}': ['ix_posts_author_created'],
+    '/api/users/search?q=member': ['users_fts'],
+    '/api/posts/': ['ix_posts_created'],
+    '/api/posts/?category=General': ['ix_posts_category_created'],
+    '/api/posts/feed': ['ix_posts_author_created', 'ix_posts_category_created', 'ix_community_members_user'],
+    '/api/posts/search?q=irrigation': ['posts_fts'],
+    '/api/comments/post/{post}': ['ix_comments_post_created'],
+    '/api/messages/conversations': ['ix_conversations_user_a_updated', 'ix_conversations_user_b_updated'],
+    '/api/messages/unread/count': ['ix_conversations_user_a_updated', 'ix_conversations_user_b_updated'],
+    # Either messages pair index serves the thread queries, so only the
+    # full-scan check covers them
+    '/api/follows/following': ['ix_follows_follower_created'],
+    '/api/follows/followers': ['ix_follows_following_created'],
+    '/api/communities/': ['ix_communities_created'],
+    '/api/communities/{community}': ['ix_posts_category_created'],
+    '/api/communities/{community}/members': ['ix_community_members_community_joined'],
+    '/api/communities/user/joined': ['ix_community_members_user'],
+}
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?! USING)(?!.*COVERING INDEX)')
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+@pytest.fixture
+def selects(app):
+    """(statement, parameters) of every SELECT sent while the test runs"""
+    collected = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            collected.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', collect)
+    yield collected
+    event.remove(engine, 'before_cursor_execute', collect)
+
+def explain(connection, statement, parameters):
+    """The EXPLAIN QUERY PLAN steps for a statement"""
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return [row[-1] for row in rows]
+
+def full_scans(plan):
+    return {match.group(1) for match in map(SQLITE_SCAN.match, plan) if match}
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_route_queries_use_indexes(app, client, network, selects, route):
+    headers = network['headers']
+    client.post('/api/messages/send', json={'receiver_id': network['user'], 'content': 'Rain due'}, headers=headers)
+
+    path = route.format(**network)
+    selects.clear()
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert selects
+
+    failures = []
+    steps = []
+    with app.app_context():
+        with db.engine.connect() as connection:
+            for statement, parameters in selects:
+                plan = explain(connection, statement, parameters)
+                steps.extend(plan)
+                bad = sorted(
+                    f'full scan of {table}' for table in full_scans(plan)
+                    if table in LARGE_TABLES and (route, table) not in ALLOWED_SCANS
+                )
+                if SQLITE_SORT in plan and route not in ALLOWED_SORTS:
+                    bad.append('sort')
+                if bad:
+                    failures.append(f"{', '.join(bad)}: {' '.join(statement.split())}\n  " + '\n  '.join(plan))
+
+    for index in EXPECTED_INDEXES.get(route, []):
+        if not any(re.search(rf'\b{index}\b', step) for step in steps):
+            failures.append(f'{index} not used:\n  ' + '\n  '.join(steps))
+
+    assert not failures, '\n'.join(failures)
@@ -0,0 +1,32 @@
+from flask_jwt_extended import decode_token
+
+def stream_token(client, headers):
+    response = client.post('/api/messages/stream-token', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['stream_token']
+
+def test_stream_opens_with_a_short_lived_stream_token(app, client, make_user, auth_headers):
+    token = stream_token(client, auth_headers(make_user('wanjiru')))
+    with app.app_context():
+        claims = decode_token(token)
+    assert claims['exp'] - claims['iat'] == app.config['SSE_TOKEN_EXPIRES'].total_seconds()
+
+    response = client.get(f'/api/messages/stream?jwt={token}', buffered=False)
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+    finally:
+        response.close()
+
+def test_stream_rejects_access_tokens(client, make_user, auth_headers):
+    headers = auth_headers(make_user('wanjiru'))
+    access_token = headers['Authorization'].split()[1]
+
+    assert client.get(f'/api/messages/stream?jwt={access_token}').status_code != 200
+    assert client.get('/api/messages/stream', headers=headers).status_code != 200
+
+def test_stream_tokens_work_on_the_stream_only(client, make_user, auth_headers):
+    token = stream_token(client, auth_headers(make_user('wanjiru')))
+
+    response = client.get('/api/auth/me', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code != 200
@@ -0,0 +1,31 @@
+import pytest
+from app import db
+from app.models import Community
+
+@pytest.fixture
+def app_config():
+    return {'RESPONSE_CACHE_ENABLED': True}
+
+@pytest.fixture
+def community(app, make_user):
+    """(public id, admin) of a community whose admin can edit their profile"""
+    admin = make_user('mwangi', full_name='Peter Mwangi')
+    with app.app_context():
+        community = Community(name='Beekeepers', description='Hives and honey', admin_id=admin.id)
+        db.session.add(community)
+        db.session.commit()
+        return community.public_id, admin
+
+@pytest.mark.parametrize('path, admin_of', [
+    ('/api/communities/', lambda body: body['communities'][0]['admin']),
+    ('/api/communities/{community}', lambda body: body['community']['admin']),
+])
+def test_profile_edits_refresh_cached_community_admins(client, community, auth_headers, path, admin_of):
+    community_id, admin = community
+    path = path.format(community=community_id)
+    assert admin_of(client.get(path).get_json())['full_name'] == 'Peter Mwangi'
+
+    response = client.put('/api/users/profile', data={'full_name': 'Peter K. Mwangi'}, headers=auth_headers(admin))
+    assert response.status_code == 200
+
+    assert admin_of(client.get(path).get_json())['full_name'] == 'Peter K. Mwangi'
@@ -1,7 +1,9 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Outlet, Link, useNavigate } from 'react-router-dom';
 import { useDispatch, useSelector } from 'react-redux';
 import { logout } from '../store/slices/authSlice';
+import { getUnreadCount } from '../store/slices/messageSlice';
+import { subscribeToMessages } from '../services/realtime';
 import {
   AppBar,
   Box,
@@ -37,6 +39,16 @@ const Layout = () => {
   const navigate = useNavigate();
   const dispatch = useDispatch();
   const { isAuthenticated, user } = useSelector((state) => state.auth);
+  const { unreadCount } = useSelector((state) => state.messages);
+  
+  // Live message events while logged in, instead of polling
+  useEffect(() => {
+    if (!isAuthenticated) {
+      return undefined;
+    }
+    dispatch(getUnreadCount());
+    return subscribeToMessages(dispatch);
+  }, [isAuthenticated, dispatch]);
   
   const [mobileOpen, setMobileOpen] = useState(false);
   const [anchorElUser, setAnchorElUser] = useState(null);
@@ -63,7 +75,15 @@ const Layout = () => {
     { text: 'Feed', icon: <Home />, path: '/feed' },
     { text: 'Explore', icon: <Explore />, path: '/explore' },
     { text: 'Communities', icon: <Group />, path: '/communities' },
-    { text: 'Messages', icon: <Message />, path: '/messages' },
+    {
+      text: 'Messages',
+      icon: (
+        <Badge badgeContent={unreadCount} color="error">
+          <Message />
+        </Badge>
+      ),
+      path: '/messages',
+    },
   ];
   
   const drawer = (
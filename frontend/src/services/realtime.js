@@ -0,0 +1,73 @@
+import api from './api';
+import { messageReceived, messageRemoved, messagesRead, setUnreadCount } from '../store/slices/messageSlice';
+
+const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/api';
+
+// Matches the server's `retry:` hint
+const RECONNECT_DELAY_MS = 3000;
+
+// Opens the server-sent event stream for messages and feeds it into the store.
+// Returns a function that closes the connection.
+export const subscribeToMessages = (dispatch) => {
+  if (!localStorage.getItem('accessToken')) {
+    return () => {};
+  }
+
+  let source = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const reconnect = () => {
+    if (!closed) {
+      retryTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+    }
+  };
+
+  const connect = async () => {
+    // Stream tokens expire within a minute and work on the stream only, so
+    // the long-lived access token never appears in a URL. `api` refreshes
+    // the access token first if it has expired.
+    let token;
+    try {
+      const response = await api.post('/messages/stream-token');
+      token = response.data.stream_token;
+    } catch (error) {
+      reconnect();
+      return;
+    }
+    if (closed) {
+      return;
+    }
+
+    source = new EventSource(`${API_URL}/messages/stream?jwt=${encodeURIComponent(token)}`);
+
+    source.addEventListener('message', (event) => {
+      dispatch(messageReceived(JSON.parse(event.data)));
+    });
+    source.addEventListener('message_deleted', (event) => {
+      dispatch(messageRemoved(JSON.parse(event.data).message_id));
+    });
+    source.addEventListener('read', (event) => {
+      dispatch(messagesRead(JSON.parse(event.data)));
+    });
+    source.addEventListener('unread_count', (event) => {
+      dispatch(setUnreadCount(JSON.parse(event.data).unread_count));
+    });
+
+    // EventSource would retry with the same, by then expired, token
+    source.onerror = () => {
+      source.close();
+      reconnect();
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) {
+      source.close();
+    }
+  };
+};
@@ -86,6 +86,28 @@ const messageSlice = createSlice({
     addMessage: (state, action) => {
       state.messages.push(action.payload);
     },
+    messageReceived: (state, action) => {
+      const message = action.payload;
+      const inConversation = [message.sender?.public_id, message.receiver?.public_id]
+        .includes(state.currentConversation);
+      if (inConversation && !state.messages.some(m => m.public_id === message.public_id)) {
+        state.messages.push(message);
+      }
+    },
+    messageRemoved: (state, action) => {
+      state.messages = state.messages.filter(m => m.public_id !== action.payload);
+    },
+    messagesRead: (state, action) => {
+      const readIds = new Set(action.payload.message_ids);
+      state.messages.forEach((m) => {
+        if (readIds.has(m.public_id)) {
+          m.is_read = true;
+        }
+      });
+    },
+    setUnreadCount: (state, action) => {
+      state.unreadCount = action.payload;
+    },
     clearError: (state) => {
       state.error = null;
     },
@@ -115,5 +137,14 @@ const messageSlice = createSlice({
   },
 });
 
-export const { clearConversations, clearCurrentConversation, addMessage, clearError } = messageSlice.actions;
+export const {
+  clearConversations,
+  clearCurrentConversation,
+  addMessage,
+  messageReceived,
+  messageRemoved,
+  messagesRead,
+  setUnreadCount,
+  clearError,
+} = messageSlice.actions;
 export default messageSlice.reducer;
\ No newline at end of file